@@ -1,42 +1,73 @@
+import os
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+from order_metrics import MonthlyOrderMetrics
+from fulfillment import FulfillmentLatency, QUANTILES
+
 st.set_page_config(page_title="Streamlit BI x Claude Code Starter", layout="wide")
 
 st.title("Streamlit BI x Claude Code Starter")
-@st.cache_data
-def load_data():
-    orders_df = pd.read_csv("sample_data/orders.csv")
-    users_df = pd.read_csv("sample_data/users.csv")
-    return orders_df, users_df
+ORDERS_CSV = "sample_data/orders.csv"
+USERS_CSV = "sample_data/users.csv"
+PREVIEW_ROWS = 10
+
+# 列ごとの型（低カーディナリティ列はカテゴリ型、日時列はパース済みで読み込む）
+ORDERS_DTYPES = {
+    'order_id': 'int64',
+    'user_id': 'int64',
+    'status': 'category',
+    'gender': 'category',
+    'num_of_item': 'int64',
+}
+ORDERS_DATE_COLUMNS = ['created_at', 'returned_at', 'shipped_at', 'delivered_at']
+USERS_DTYPES = {'gender': 'category'}
 
 @st.cache_data
-def preprocess_orders_data(orders_df):
-    orders_df = orders_df.copy()
-    orders_df['created_at'] = pd.to_datetime(orders_df['created_at'])
-    orders_df['year_month'] = orders_df['created_at'].dt.to_period('M')
-    return orders_df
+def load_orders(columns=None, nrows=None):
+    # 必要な列・行だけを読み込む（columns=None は全列）
+    selected = list(ORDERS_DTYPES) + ORDERS_DATE_COLUMNS if columns is None else list(columns)
+    return pd.read_csv(
+        ORDERS_CSV,
+        usecols=selected,
+        dtype={col: dtype for col, dtype in ORDERS_DTYPES.items() if col in selected},
+        parse_dates=[col for col in ORDERS_DATE_COLUMNS if col in selected],
+        nrows=nrows,
+    )
 
 @st.cache_data
-def calculate_monthly_metrics(orders_df):
-    monthly_data = orders_df.groupby('year_month').agg({
-        'order_id': 'count',
-        'status': lambda x: (x == 'Cancelled').sum()
-    }).rename(columns={'order_id': 'total_orders', 'status': 'cancelled_orders'})
-    
-    monthly_data['cancel_rate'] = (monthly_data['cancelled_orders'] / monthly_data['total_orders'] * 100).round(2)
-    monthly_data.index = monthly_data.index.astype(str)
-    
-    return monthly_data
-
-orders_df, users_df = load_data()
-
-# データの前処理
-processed_orders = preprocess_orders_data(orders_df)
-monthly_metrics = calculate_monthly_metrics(processed_orders)
+def load_users(nrows=None):
+    # users.csv は任意（存在しない場合は None）
+    if not os.path.exists(USERS_CSV):
+        return None
+    return pd.read_csv(USERS_CSV, dtype=USERS_DTYPES, nrows=nrows)
+
+@st.cache_resource
+def get_monthly_metrics_engine():
+    return MonthlyOrderMetrics()
+
+def calculate_monthly_metrics():
+    # 追記された注文だけを読み込み、影響のある月のカウンタだけを更新する
+    engine = get_monthly_metrics_engine()
+    engine.refresh()
+    return engine.to_frame()
+
+@st.cache_resource
+def get_latency_engine():
+    return FulfillmentLatency()
+
+def calculate_latency_summaries():
+    # 追記された注文だけをスケッチに反映し、月別・ステータス別の分位点を返す
+    engine = get_latency_engine()
+    engine.refresh()
+    return engine.summary(by_status=False), engine.summary(by_status=True)
+
+# 月別集計（状態ファイルに保存されたカウンタを差分更新）
+monthly_metrics = calculate_monthly_metrics()
 
 # ダッシュボードのメイン部分
 st.header("📊 月別オーダー分析ダッシュボード")
@@ -44,13 +75,13 @@ st.header("📊 月別オーダー分析ダッシュボード")
 # KPIメトリクス表示
 col1, col2, col3, col4 = st.columns(4)
 with col1:
-    total_orders = len(processed_orders)
+    total_orders = int(monthly_metrics['total_orders'].sum())
     st.metric("総注文数", f"{total_orders:,}")
 with col2:
     avg_monthly_orders = int(monthly_metrics['total_orders'].mean())
     st.metric("月平均注文数", f"{avg_monthly_orders:,}")
 with col3:
-    overall_cancel_rate = (processed_orders['status'] == 'Cancelled').mean() * 100
+    overall_cancel_rate = monthly_metrics['cancelled_orders'].sum() / max(total_orders, 1) * 100
     st.metric("全体キャンセル率", f"{overall_cancel_rate:.1f}%")
 with col4:
     avg_cancel_rate = monthly_metrics['cancel_rate'].mean()
@@ -106,15 +137,63 @@ st.dataframe(
     monthly_metrics.style.format({
         'total_orders': '{:,}',
         'cancelled_orders': '{:,}',
+        'returned_orders': '{:,}',
+        'shipped_orders': '{:,}',
+        'delivered_orders': '{:,}',
         'cancel_rate': '{:.2f}%'
     }),
     use_container_width=True
 )
 
-# 既存のデータプレビュー（折りたたみ式に変更）
-with st.expander("元データプレビュー"):
-    st.subheader("Orders Data (Top 10 rows)")
-    st.dataframe(orders_df.head(10))
+# 配送リードタイム分析（分位点スケッチで全注文履歴を集計）
+st.subheader("配送リードタイム分析（p50 / p95 / p99）")
+LATENCY_LABELS = {
+    'ship_hours': '出荷まで（注文→出荷）',
+    'deliver_hours': '配送（出荷→配達）',
+    'return_hours': '返品まで（配達→返品）',
+}
+latency_monthly, latency_by_status = calculate_latency_summaries()
+latency_metric = st.radio(
+    "指標", list(LATENCY_LABELS), format_func=LATENCY_LABELS.get, horizontal=True
+)
+
+latency_fig = go.Figure()
+monthly_latency = latency_monthly[latency_monthly['metric'] == latency_metric]
+for quantile_name in QUANTILES:
+    latency_fig.add_trace(
+        go.Scatter(
+            x=monthly_latency['month'],
+            y=monthly_latency[quantile_name],
+            mode='lines+markers',
+            name=quantile_name,
+        )
+    )
+latency_fig.update_layout(
+    title=f"月別リードタイム: {LATENCY_LABELS[latency_metric]}",
+    xaxis_title="月",
+    yaxis_title="時間",
+    hovermode='x unified',
+    height=420
+)
+st.plotly_chart(latency_fig, use_container_width=True)
+
+status_latency = latency_by_status[latency_by_status['metric'] == latency_metric].drop(columns='metric')
+st.dataframe(
+    status_latency.style.format({name: '{:.1f}h' for name in QUANTILES} | {'orders': '{:,}'}),
+    use_container_width=True,
+    hide_index=True
+)
+
+# 既存のデータプレビュー
+#   expander の中身は閉じていても実行されるため、トグルをオンにしたときだけ
+#   プレビューに必要な先頭行を読み込む
+if st.toggle("元データプレビューを表示"):
+    st.subheader(f"Orders Data (Top {PREVIEW_ROWS} rows)")
+    st.dataframe(load_orders(nrows=PREVIEW_ROWS))
     
-    st.subheader("Users Data (Top 10 rows)")
-    st.dataframe(users_df.head(10))
\ No newline at end of file
+    st.subheader(f"Users Data (Top {PREVIEW_ROWS} rows)")
+    users_df = load_users(nrows=PREVIEW_ROWS)
+    if users_df is None:
+        st.info(f"{USERS_CSV} が見つからないため、ユーザーデータは表示されません。")
+    else:
+        st.dataframe(users_df)
\ No newline at end of file
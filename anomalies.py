@@ -0,0 +1,290 @@
+"""
+Anomaly detection on daily revenue for every dimension combination.
+
+Daily revenue is aggregated for the whole table and for each dimension set
+in DIMENSION_SETS with one GROUPING SETS query. Every series is then scored
+against its own trailing window with a robust z-score: the median and the
+median absolute deviation (MAD) of the previous WINDOW_DAYS days, computed
+with DuckDB window functions, so thousands of series are scored in one query.
+Days without sales count as zero revenue.
+
+State lives in two tables on the same connection (ANOMALY_DAILY_TABLE,
+ANOMALY_SCORES_TABLE). refresh() only aggregates and scores days after the
+last scored one, reading back one window of history. If the sales table no
+longer reaches the last scored day (it was reloaded) the state is rebuilt.
+Read-only snapshots (db.publish_snapshot) are scored before they are
+published and are never refreshed.
+"""
+
+import datetime
+import threading
+import weakref
+from typing import Any, Optional
+
+import pandas as pd
+
+from db import is_read_only
+
+
+# Dimension combinations scored; () is the whole table
+DIMENSION_SETS = [
+    (),
+    ("category",),
+    ("region",),
+    ("sales_channel",),
+    ("customer_segment",),
+    ("category", "region"),
+    ("category", "sales_channel"),
+    ("category", "region", "sales_channel"),
+]
+DIMENSION_COLUMNS = ["category", "region", "sales_channel", "customer_segment"]
+
+WINDOW_DAYS = 28
+# Days of history a series needs before it is scored
+MIN_HISTORY_DAYS = 14
+# Robust z-score reported as an anomaly
+Z_THRESHOLD = 3.5
+
+ANOMALY_DAILY_TABLE = "anomaly_daily"
+ANOMALY_SCORES_TABLE = "anomaly_scores"
+TOTAL = "total"
+
+
+def dimension_name(dimensions: tuple) -> str:
+    """('category', 'region') -> 'category × region'; () -> 'total'."""
+    return " × ".join(dimensions) or TOTAL
+
+
+class AnomalyDetector:
+    """Incrementally updated robust z-scores of daily revenue per dimension combination."""
+
+    def __init__(self, con: Any, dimension_sets: list = DIMENSION_SETS,
+                 window_days: int = WINDOW_DAYS, min_history_days: int = MIN_HISTORY_DAYS):
+        """
+        Args:
+            con: DuckDB connection object with the sales table
+            dimension_sets: Dimension combinations to score
+            window_days: Trailing days the median and MAD are computed over
+            min_history_days: Days of history a series needs before it is scored
+        """
+        self.con = con
+        self.dimension_sets = [tuple(dimensions) for dimensions in dimension_sets]
+        self.window_days = window_days
+        self.min_history_days = min_history_days
+        self._lock = threading.Lock()
+
+    def _create_tables(self, cur):
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {ANOMALY_DAILY_TABLE} (
+                dimension VARCHAR, member VARCHAR, date DATE, revenue DOUBLE
+            )
+        """)
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {ANOMALY_SCORES_TABLE} (
+                dimension VARCHAR, member VARCHAR, date DATE, revenue DOUBLE,
+                median DOUBLE, mad DOUBLE, z DOUBLE
+            )
+        """)
+
+    def _aggregate_sql(self) -> str:
+        grouping_sets = ", ".join(f"({', '.join(('date',) + dimensions)})" for dimensions in self.dimension_sets)
+        # GROUPING() has one bit per column (1 = not grouped), first column highest
+        names = []
+        for dimensions in self.dimension_sets:
+            bits = "".join("0" if column in dimensions else "1" for column in DIMENSION_COLUMNS)
+            names.append(f"WHEN {int(bits, 2)} THEN '{dimension_name(dimensions)}'")
+        return f"""
+            SELECT
+                CASE GROUPING({', '.join(DIMENSION_COLUMNS)}) {' '.join(names)} END AS dimension,
+                COALESCE(concat_ws(' / ', {', '.join(DIMENSION_COLUMNS)}), '{TOTAL}') AS member,
+                date,
+                SUM(revenue) AS revenue
+            FROM sales
+            WHERE date > $after
+            GROUP BY GROUPING SETS ({grouping_sets})
+        """
+
+    def refresh(self) -> int:
+        """
+        Aggregate and score the days added to the sales table since the last refresh.
+
+        Returns:
+            Number of new days scored
+        """
+        with self._lock:
+            cur = self.con.cursor()
+            if is_read_only(cur):
+                # Shared snapshots are scored before they are published
+                return 0
+            self._create_tables(cur)
+            last_day = cur.execute(f"SELECT MAX(date) FROM {ANOMALY_DAILY_TABLE}").fetchone()[0]
+            first_sales, last_sales = cur.execute("SELECT MIN(date), MAX(date) FROM sales").fetchone()
+            if last_sales is None:
+                return 0
+            if last_day is not None and last_sales < last_day:
+                # The sales table was replaced with older data; start over
+                cur.execute(f"DELETE FROM {ANOMALY_DAILY_TABLE}")
+                cur.execute(f"DELETE FROM {ANOMALY_SCORES_TABLE}")
+                last_day = None
+            if last_day is not None and last_sales == last_day:
+                return 0
+
+            after = last_day or first_sales - datetime.timedelta(days=1)
+            cur.execute(f"INSERT INTO {ANOMALY_DAILY_TABLE} {self._aggregate_sql()}", {"after": after})
+
+            # Score the new days; one window of earlier days is read back as history
+            cur.execute(f"""
+                INSERT INTO {ANOMALY_SCORES_TABLE}
+                WITH series AS (
+                    SELECT DISTINCT dimension, member FROM {ANOMALY_DAILY_TABLE}
+                ),
+                days AS (
+                    SELECT CAST(day AS DATE) AS date
+                    FROM range(CAST($start AS TIMESTAMP), CAST($end AS TIMESTAMP) + INTERVAL 1 DAY,
+                               INTERVAL 1 DAY) AS t(day)
+                ),
+                dense AS (
+                    SELECT series.dimension, series.member, days.date, COALESCE(daily.revenue, 0) AS revenue
+                    FROM series
+                    CROSS JOIN days
+                    LEFT JOIN {ANOMALY_DAILY_TABLE} AS daily
+                        ON daily.dimension = series.dimension
+                        AND daily.member = series.member
+                        AND daily.date = days.date
+                ),
+                windowed AS (
+                    SELECT
+                        *,
+                        median(revenue) OVER history AS median,
+                        mad(revenue) OVER history AS mad,
+                        COUNT(*) OVER history AS history_days
+                    FROM dense
+                    WINDOW history AS (
+                        PARTITION BY dimension, member ORDER BY date
+                        ROWS BETWEEN {int(self.window_days)} PRECEDING AND 1 PRECEDING
+                    )
+                )
+                SELECT
+                    dimension, member, date, revenue, median, mad,
+                    -- 0.6745 scales the MAD to a standard deviation for normal data
+                    0.6745 * (revenue - median) / NULLIF(mad, 0) AS z
+                FROM windowed
+                WHERE date > $after AND history_days >= {int(self.min_history_days)}
+            """, {
+                "start": max(first_sales, after - datetime.timedelta(days=self.window_days)),
+                "end": last_sales,
+                "after": after,
+            })
+            return (last_sales - after).days
+
+    def top_anomalies(self, limit: int = 10, start_date: Optional[datetime.date] = None,
+                      end_date: Optional[datetime.date] = None, dimensions: Optional[list] = None,
+                      threshold: float = Z_THRESHOLD) -> pd.DataFrame:
+        """
+        The strongest anomalies scored so far.
+
+        Args:
+            limit: Maximum number of rows
+            start_date: First date (inclusive)
+            end_date: Last date (inclusive)
+            dimensions: Dimension names to include, e.g. ['category', 'category × region'] (all if omitted)
+            threshold: Minimum absolute robust z-score
+
+        Returns:
+            DataFrame with dimension, member, date, revenue, median, mad and z, strongest first
+        """
+        conditions, params = ["abs(z) >= $threshold"], {"threshold": threshold, "limit": limit}
+        if start_date is not None:
+            conditions.append("date >= $start_date")
+            params["start_date"] = start_date
+        if end_date is not None:
+            conditions.append("date <= $end_date")
+            params["end_date"] = end_date
+        if dimensions:
+            conditions.append("list_contains($dimensions::VARCHAR[], dimension)")
+            params["dimensions"] = list(dimensions)
+        return self.con.cursor().execute(f"""
+            SELECT dimension, member, date, revenue, median, mad, z
+            FROM {ANOMALY_SCORES_TABLE}
+            WHERE {' AND '.join(conditions)}
+            ORDER BY abs(z) DESC, date DESC
+            LIMIT $limit
+        """, params).fetchdf()
+
+    def series(self, dimension: str, member: str, start_date: Optional[datetime.date] = None,
+               end_date: Optional[datetime.date] = None) -> pd.DataFrame:
+        """
+        Scored daily revenue of one series.
+
+        Args:
+            dimension: Dimension name (see dimension_name)
+            member: Series member, e.g. 'Electronics / North'
+            start_date: First date (inclusive)
+            end_date: Last date (inclusive)
+
+        Returns:
+            DataFrame with date, revenue, median and z, ordered by date
+        """
+        return self.con.cursor().execute(f"""
+            SELECT date, revenue, median, z
+            FROM {ANOMALY_SCORES_TABLE}
+            WHERE dimension = $dimension AND member = $member
+                AND date BETWEEN COALESCE($start_date, DATE '0001-01-01') AND COALESCE($end_date, DATE '9999-12-31')
+            ORDER BY date
+        """, {"dimension": dimension, "member": member, "start_date": start_date, "end_date": end_date}).fetchdf()
+
+
+_detectors = weakref.WeakKeyDictionary()
+_detectors_lock = threading.Lock()
+
+
+def get_detector(con: Any) -> AnomalyDetector:
+    """The shared, refreshed detector of a connection."""
+    with _detectors_lock:
+        detector = _detectors.get(con)
+        if detector is None:
+            detector = _detectors[con] = AnomalyDetector(con)
+            if hasattr(con, "add_reload_hook"):
+                # Score reloaded data before it goes live (db.LiveConnection)
+                con.add_reload_hook(lambda new_con: AnomalyDetector(new_con).refresh())
+    detector.refresh()
+    return detector
+
+
+def anomaly_insights(con: Any, df: pd.DataFrame, limit: int = 2) -> list:
+    """
+    Notable anomalies for the dimensions that appear in a query result.
+
+    A result grouped by category gets the strongest category anomalies, a
+    revenue result without sales dimensions gets whole-table anomalies and
+    anything else (e.g. orders) gets none. The result's date or month range
+    narrows the search when present.
+
+    Args:
+        con: DuckDB connection object with the sales table
+        df: Query results DataFrame
+        limit: Maximum number of insights
+
+    Returns:
+        List of insight strings
+    """
+    columns = [column for column in DIMENSION_COLUMNS if column in df.columns]
+    if not columns and not any("revenue" in str(column).lower() for column in df.columns):
+        return []
+    dimensions = [dimension_name(d) for d in DIMENSION_SETS if set(d) == set(columns)] or [TOTAL]
+
+    start_date = end_date = None
+    if "date" in df.columns and len(df):
+        dates = pd.to_datetime(df["date"])
+        start_date, end_date = dates.min().date(), dates.max().date()
+    elif "month" in df.columns and len(df):
+        months = pd.to_datetime(df["month"].astype(str))
+        start_date = months.min().date()
+        end_date = (months.max() + pd.offsets.MonthEnd(0)).date()
+
+    anomalies = get_detector(con).top_anomalies(limit, start_date, end_date, dimensions)
+    return [
+        f"Unusual day: {row.member if row.member != TOTAL else 'all sales'} on {row.date:%Y-%m-%d} "
+        f"(¥{row.revenue:,.0f} vs typical ¥{row.median:,.0f}, z={row.z:+.1f})"
+        for row in anomalies.itertuples()
+    ]
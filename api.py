@@ -0,0 +1,244 @@
+"""
+Headless HTTP API for the question answering pipeline.
+
+A plain ASGI application, so no web framework is required:
+
+    POST /query    {"question": "...", "format": "json" | "arrow"}
+    GET  /health
+
+Run it with any ASGI server, e.g. `uvicorn api:app --port 8000`. Questions
+are answered on a bounded worker pool. When every worker is busy and the
+wait queue is full, new requests get 503 so clients can back off.
+"""
+
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+import pyarrow as pa
+
+from db import get_data_summary, init_db
+from pipeline import PipelineResult, answer_question
+from prompt_builder import PromptBuilder
+from tracing import start_trace
+
+
+MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "8"))
+MAX_QUEUE = int(os.getenv("API_MAX_QUEUE", "32"))
+MAX_BODY_BYTES = 64 * 1024
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def result_to_json(result: PipelineResult) -> dict:
+    """
+    Convert a pipeline result into a JSON-serializable dictionary.
+
+    Args:
+        result: Output of pipeline.answer_question
+
+    Returns:
+        Dictionary with the SQL, its source, insights, columns and row records
+    """
+    records = json.loads(result.df.to_json(orient="records", date_format="iso", force_ascii=False))
+    return {
+        "question": result.question,
+        "sql": result.sql,
+        "source": result.source,
+        "fallback_name": result.fallback_name,
+        "insights": result.insights,
+        "columns": [str(column) for column in result.df.columns],
+        "row_count": len(result.df),
+        "rows": records,
+        "repair_attempts": len(result.repair.attempts) if result.repair else 0,
+        "seconds": round(result.seconds, 4),
+    }
+
+
+def result_to_arrow(result: PipelineResult) -> bytes:
+    """
+    Serialize a pipeline result as an Arrow IPC stream.
+
+    The SQL, its source and the insights travel in the schema metadata.
+
+    Args:
+        result: Output of pipeline.answer_question
+
+    Returns:
+        Arrow IPC stream bytes
+    """
+    table = pa.Table.from_pandas(result.df, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b"question": result.question.encode(),
+        b"sql": result.sql.encode(),
+        b"source": result.source.encode(),
+        b"fallback_name": (result.fallback_name or "").encode(),
+        b"insights": json.dumps(result.insights, ensure_ascii=False).encode(),
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class QueryAPI:
+    """ASGI application answering questions with a bounded worker pool."""
+
+    def __init__(self, con: Any = None, prompt_builder: Optional[PromptBuilder] = None,
+                 max_concurrency: int = MAX_CONCURRENCY, max_queue: int = MAX_QUEUE,
+                 answer: Callable[..., PipelineResult] = answer_question):
+        """
+        Args:
+            con: DuckDB connection object (initialized from db.init_db on startup if omitted)
+            prompt_builder: Prompt builder shared by all requests (built on startup if omitted)
+            max_concurrency: Questions answered at the same time
+            max_queue: Requests allowed to wait for a worker before 503 is returned
+            answer: Pipeline callable (con, question, prompt_builder) -> PipelineResult
+        """
+        self.con = con
+        self.prompt_builder = prompt_builder
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.answer = answer
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="query-api")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._startup_lock = asyncio.Lock()
+        self._pending = 0
+
+    def _load(self):
+        if self.con is None:
+            self.con = init_db()
+        if self.prompt_builder is None:
+            self.prompt_builder = PromptBuilder(self.con, get_data_summary(self.con))
+
+    async def startup(self):
+        """Load the database and prompt builder once (off the event loop)."""
+        async with self._startup_lock:
+            if self.con is None or self.prompt_builder is None:
+                await asyncio.get_running_loop().run_in_executor(self._executor, self._load)
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        method, path = scope["method"], scope["path"]
+        if path == "/health" and method == "GET":
+            await _send_json(send, 200, {
+                "status": "ok",
+                "ready": self.con is not None,
+                "pending": self._pending,
+                "max_concurrency": self.max_concurrency,
+            })
+        elif path == "/query" and method == "POST":
+            await self._query(scope, receive, send)
+        elif path in ("/health", "/query"):
+            await _send_json(send, 405, {"error": "method not allowed"})
+        else:
+            await _send_json(send, 404, {"error": "not found"})
+
+    async def _lifespan(self, receive: Callable, send: Callable):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                    await send({"type": "lifespan.startup.complete"})
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+            elif message["type"] == "lifespan.shutdown":
+                self._executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _query(self, scope: dict, receive: Callable, send: Callable):
+        try:
+            payload = json.loads(await _read_body(receive) or b"{}")
+            question = str(payload.get("question", "")).strip()
+        except (ValueError, AttributeError) as e:
+            await _send_json(send, 400, {"error": f"invalid request body: {e}"})
+            return
+        if not question:
+            await _send_json(send, 400, {"error": "question is required"})
+            return
+
+        accept = dict(scope.get("headers", [])).get(b"accept", b"").decode()
+        as_arrow = payload.get("format") == "arrow" or ARROW_MEDIA_TYPE in accept
+
+        # Reject instead of queueing without bound
+        if self._pending >= self.max_concurrency + self.max_queue:
+            await _send_json(send, 503, {"error": "server busy"}, [(b"retry-after", b"1")])
+            return
+
+        self._pending += 1
+        try:
+            await self.startup()
+            async with self._semaphore:
+                loop = asyncio.get_running_loop()
+                result, trace_id = await loop.run_in_executor(self._executor, self._answer, question)
+                body = await loop.run_in_executor(
+                    self._executor, result_to_arrow if as_arrow else _json_bytes, result
+                )
+        except Exception as e:
+            await _send_json(send, 500, {"error": str(e)})
+            return
+        finally:
+            self._pending -= 1
+
+        await _send(send, 200, body, ARROW_MEDIA_TYPE if as_arrow else "application/json",
+                    [(b"x-trace-id", trace_id.encode())])
+
+    def _answer(self, question: str) -> tuple:
+        # Runs on a worker thread; each request gets its own trace
+        with start_trace("api_query", question=question) as trace:
+            result = self.answer(self.con, question, self.prompt_builder)
+        return result, trace.trace_id
+
+
+def _json_bytes(result: PipelineResult) -> bytes:
+    return json.dumps(result_to_json(result), ensure_ascii=False).encode()
+
+
+async def _read_body(receive: Callable) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY_BYTES:
+            raise ValueError("body too large")
+        if not message.get("more_body"):
+            return body
+
+
+async def _send(send: Callable, status: int, body: bytes, content_type: str, headers: Optional[list] = None):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", content_type.encode()),
+            (b"content-length", str(len(body)).encode()),
+            *(headers or []),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send: Callable, status: int, payload: dict, headers: Optional[list] = None):
+    body = json.dumps(payload, ensure_ascii=False).encode()
+    await _send(send, status, body, "application/json", headers)
+
+
+app = QueryAPI()
+
+
+if __name__ == "__main__":
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("uvicorn is required to serve the API: uv sync --extra api")
+
+    uvicorn.run("api:app", host=os.getenv("API_HOST", "127.0.0.1"), port=int(os.getenv("API_PORT", "8000")))
@@ -1,24 +1,49 @@
+import time
+
 import streamlit as st
-import pandas as pd
 import altair as alt
 
-# =========================
-# データ読み込み
-# =========================
-@st.cache_data
-def load_data():
-    df = pd.read_csv("data/sample_sales.csv", parse_dates=["date"])
-    return df
+from anomalies import DIMENSION_SETS, Z_THRESHOLD, dimension_name, get_detector
+from db import init_db
+from dashboard_queries import (
+    get_filter_options, daily_sales,
+    ensure_sales_cube, cross_filtered_sales, cross_filtered_kpis,
+)
+
+SERVER_MODE = "サーバー (DuckDB)"
 
 st.set_page_config(page_title="販売データBIダッシュボード", layout="wide")
 st.title("📊 販売データBIダッシュボード")
 
+
+def show_guide():
+    with st.expander("ℹ️ 操作ガイド"):
+        st.markdown(
+            """
+- サイドバーの**日付/カテゴリ**で事前フィルタ  
+- 各グラフの要素を**クリック**：選択に追加（複数可）  
+- **再クリック**：その要素だけ解除  
+- **背景ダブルクリック**：そのグラフの選択を全解除  
+- 上段の**ボタン（ラジオ）**でチャートの種類を切替  
+- **クロスフィルタの計算**を「サーバー」にすると、選択状態を Python に戻して DuckDB で集計します  
+            """
+        )
+
+
 # =========================
 # サイドバー：日付範囲 & カテゴリ選択
 # =========================
-df = load_data()
+try:
+    con = init_db()
+except Exception as e:
+    st.error(f"データの読み込みに失敗しました: {e}")
+    st.stop()
+options = get_filter_options(con)
+st.sidebar.caption(f"データ読込: {time.strftime('%H:%M:%S', time.localtime(con.loaded_at))}（v{con.version}）")
+if con.last_error:
+    st.sidebar.warning(f"データの再読み込みに失敗しました（前回のデータを表示中）: {con.last_error}")
 st.sidebar.header("フィルタ")
-min_date, max_date = df["date"].min(), df["date"].max()
+min_date, max_date = options["min_date"], options["max_date"]
 date_range = st.sidebar.date_input(
     "日付範囲を選択してください",
     [min_date, max_date],
@@ -30,19 +55,18 @@ else:
     start_date, end_date = date_range[0], date_range[1]
 
 # カテゴリ セレクター（複数選択）
-all_categories = sorted(df["category"].unique().tolist())
+all_categories = options["categories"]
 selected_categories = st.sidebar.multiselect(
     "カテゴリを選択（未選択=すべて）",
     options=all_categories,
     default=all_categories
 )
 
-# 日付・カテゴリで事前フィルタ
-base_df = df[
-    (df["date"] >= pd.to_datetime(start_date)) &
-    (df["date"] <= pd.to_datetime(end_date)) &
-    (df["category"].isin(selected_categories))
-].copy()
+# 日付・カテゴリで事前フィルタ（DuckDB 側でパネルごとに集計し、集計済みの行だけを描画に渡す）
+filter_args = (start_date, end_date, selected_categories)
+
+# クロスフィルタの計算場所（ブラウザ = Vega-Lite / サーバー = DuckDB キューブ）
+cross_filter_mode = st.sidebar.radio("クロスフィルタの計算", ["ブラウザ", SERVER_MODE], index=0)
 
 # =========================
 # チャート種別切替 UI
@@ -65,52 +89,195 @@ sel_cat = alt.selection_point(name="sel_category", fields=["category"], toggle=T
 sel_region = alt.selection_point(name="sel_region", fields=["region"], toggle=True, clear="dblclick")
 sel_seg = alt.selection_point(name="sel_segment", fields=["customer_segment"], toggle=True, clear="dblclick")
 
-# どのチャートでも参照可能にするため、共通の add_params を適用
-def with_params(chart: alt.Chart) -> alt.Chart:
-    return chart.add_params(sel_cat, sel_region, sel_seg)
-
 # KPI/時系列で使う総合フィルタ（空選択時は全件）
 combined_sel = sel_cat & sel_region & sel_seg
 
+# =========================
+# サーバー側クロスフィルタ
+#   選択状態を Python に戻し、DuckDB のキューブで集計した数行だけを各チャートに渡す
+# =========================
+# 選択フィールド -> (チャートの key, selection 名, selection)
+SERVER_SELECTIONS = {
+    "category": ("xf_category", "sel_category", sel_cat),
+    "region": ("xf_region", "sel_region", sel_region),
+    "customer_segment": ("xf_segment", "sel_segment", sel_seg),
+}
+
+
+@st.cache_resource
+def prepare_cube(_con):
+    ensure_sales_cube(_con)
+    # データ再読込時は新しいスナップショットにキューブを作ってから切り替える
+    _con.add_reload_hook(ensure_sales_cube)
+    return True
+
+
+def current_selections() -> dict:
+    """前回の再実行でブラウザから戻ってきた選択状態を取り出す"""
+    selections = {}
+    for field, (key, param_name, _) in SERVER_SELECTIONS.items():
+        state = st.session_state.get(key)
+        points = state["selection"].get(param_name, []) if state else []
+        selections[field] = [point[field] for point in points if field in point]
+    return selections
+
+
+def selectable_chart(df, field: str, chart_type: str, legend_title: str) -> alt.Chart:
+    """集計済みの行から、クリック選択できるチャートを作る"""
+    param = SERVER_SELECTIONS[field][2]
+    tooltip = [f"{field}:N", alt.Tooltip("revenue:Q", format=",.0f", title="売上")]
+    opacity = alt.condition(param, alt.value(1), alt.value(0.3))
+    base = alt.Chart(df).add_params(param)
+    if chart_type in ("円", "ドーナツ"):
+        return base.mark_arc(innerRadius=80 if chart_type == "ドーナツ" else 0).encode(
+            theta=alt.Theta("revenue:Q", title="売上"),
+            color=alt.Color(f"{field}:N", legend=alt.Legend(title=legend_title)),
+            tooltip=tooltip,
+            opacity=opacity,
+        )
+    if chart_type == "棒(縦)":
+        return base.mark_bar().encode(
+            x=alt.X(f"{field}:N", title=legend_title, sort="-y"),
+            y=alt.Y("revenue:Q", title="売上金額"),
+            tooltip=tooltip,
+            opacity=opacity,
+        )
+    return base.mark_bar().encode(
+        x=alt.X("revenue:Q", title="売上金額"),
+        y=alt.Y(f"{field}:N", title=legend_title, sort="-x"),
+        tooltip=tooltip,
+        opacity=opacity,
+    )
+
+
+def render_server_side_dashboard():
+    prepare_cube(con)
+    selections = current_selections()
+
+    st.subheader("📌 全体KPI（クリック選択に連動）")
+    kpis = cross_filtered_kpis(con, selections, *filter_args)
+    k1, k2, k3 = st.columns(3)
+    k1.metric("売上合計", f"¥{kpis['revenue']:,.0f}")
+    k2.metric("販売数量合計", f"{kpis['units']:,.0f}")
+    k3.metric("商品カテゴリ数", f"{kpis['category_count']:,}")
+
+    panels = [
+        ("category", "📦 商品カテゴリごとの売上", cat_chart_type, "商品カテゴリ"),
+        ("region", "🌍 地域別売上", region_chart_type, "地域"),
+        ("customer_segment", "👥 顧客セグメント別 売上シェア", seg_chart_type, "顧客セグメント"),
+    ]
+    for field, title, chart_type, legend_title in panels:
+        st.subheader(f"{title}（クリックで複数選択・ダブルクリックで解除）")
+        df = cross_filtered_sales(con, field, selections, *filter_args)
+        st.altair_chart(
+            selectable_chart(df, field, chart_type, legend_title).properties(height=360),
+            use_container_width=True,
+            on_select="rerun",
+            key=SERVER_SELECTIONS[field][0],
+        )
+
+    st.subheader("📈 日毎の売上推移（選択連動）")
+    ts_df = cross_filtered_sales(con, "date", selections, *filter_args)
+    ts_base = alt.Chart(ts_df).encode(
+        x=alt.X("date:T", title="日付"),
+        y=alt.Y("revenue:Q", title="売上金額"),
+        tooltip=[alt.Tooltip("date:T", title="日付"), alt.Tooltip("revenue:Q", format=",.0f", title="売上")]
+    )
+    ts_chart = ts_base.mark_area() if ts_chart_type == "面" else ts_base.mark_line(point=True)
+    st.altair_chart(ts_chart.properties(height=380), use_container_width=True)
+
+
+def show_anomalies():
+    """日次売上の異常（全切り口の組み合わせを DuckDB で一括スコアリング）"""
+    st.subheader("🚨 売上の異常検知（日次・ロバストzスコア）")
+    # 新しく追加された日だけを集計・スコアリングする
+    detector = get_detector(con)
+
+    names = [dimension_name(dimensions) for dimensions in DIMENSION_SETS]
+    chosen = st.multiselect("切り口", names, default=names, key="anomaly_dimensions")
+    top = detector.top_anomalies(10, start_date, end_date, chosen)
+    if top.empty:
+        st.info("選択した期間に異常はありません")
+        return
+
+    st.dataframe(
+        top.rename(columns={
+            "dimension": "切り口", "member": "対象", "date": "日付",
+            "revenue": "売上", "median": "直近中央値", "mad": "MAD", "z": "zスコア",
+        }),
+        hide_index=True,
+        use_container_width=True,
+    )
+
+    labels = [f"{row.member}（{row.dimension}）" for row in top.itertuples()]
+    index = st.selectbox("推移を表示", range(len(labels)), format_func=labels.__getitem__, key="anomaly_series")
+    series = detector.series(top["dimension"].iloc[index], top["member"].iloc[index], start_date, end_date)
+
+    base = alt.Chart(series).encode(x=alt.X("date:T", title="日付"))
+    chart = alt.layer(
+        base.mark_line().encode(y=alt.Y("revenue:Q", title="売上金額")),
+        base.mark_line(strokeDash=[4, 4], color="gray").encode(y="median:Q"),
+        base.transform_filter(f"abs(datum.z) >= {Z_THRESHOLD}").mark_point(color="red", size=80, filled=True).encode(
+            y="revenue:Q",
+            tooltip=[alt.Tooltip("date:T", title="日付"), alt.Tooltip("revenue:Q", format=",.0f", title="売上"),
+                     alt.Tooltip("z:Q", format="+.1f", title="zスコア")],
+        ),
+    )
+    st.altair_chart(chart.properties(height=300), use_container_width=True)
+    st.caption(f"破線: 直近の中央値 / 赤点: |z| ≥ {Z_THRESHOLD}")
+
+
+if cross_filter_mode == SERVER_MODE:
+    render_server_side_dashboard()
+    show_anomalies()
+    show_guide()
+    st.stop()
+
+# =========================
+# ブラウザ側クロスフィルタ
+#   日次×選択フィールドの集計を複合チャートのトップレベルに1回だけ埋め込み、
+#   各チャートはデータを持たずにそれを参照する
+# =========================
+shared_df = daily_sales(con, *filter_args)
+
 # =========================
 # KPI（選択に連動）
 # =========================
-st.subheader("📌 全体KPI（クリック選択に連動）")
-kpi_rev = with_params(
-    alt.Chart(base_df, title="売上合計")
+kpi_rev = (
+    alt.Chart(title="売上合計")
     .transform_filter(combined_sel)
     .mark_text(fontSize=28)
     .encode(text=alt.Text("revenue:Q", aggregate="sum", format="¥,.0f"))
     .properties(height=60, width=260)
 )
-kpi_units = with_params(
-    alt.Chart(base_df, title="販売数量合計")
+kpi_units = (
+    alt.Chart(title="販売数量合計")
     .transform_filter(combined_sel)
     .mark_text(fontSize=28)
     .encode(text=alt.Text("units:Q", aggregate="sum", format=",.0f"))
     .properties(height=60, width=260)
 )
-kpi_cats = with_params(
-    alt.Chart(base_df, title="商品カテゴリ数")
+kpi_cats = (
+    alt.Chart(title="商品カテゴリ数")
     .transform_filter(combined_sel)
     .mark_text(fontSize=28)
     .encode(text=alt.Text("category:N", aggregate="distinct", format=",.0f"))
     .properties(height=60, width=260)
 )
-st.altair_chart(alt.hconcat(kpi_rev, kpi_units, kpi_cats), use_container_width=True)
 
 # =========================
 # 商品カテゴリ別 売上（種別切替 + 複数選択）
 #   ※ 他選択（地域/セグメント）でフィルタ、自身は sel_cat でハイライト
 # =========================
-st.subheader("📦 商品カテゴリごとの売上（クリックで複数選択・ダブルクリックで解除）")
-cat_sales = base_df.groupby("category", as_index=False)["revenue"].sum().sort_values("revenue", ascending=False)
-
+cat_base = (
+    alt.Chart(title="商品カテゴリごとの売上")
+    .transform_filter(sel_region)  # 他パラメータでフィルタ
+    .transform_filter(sel_seg)
+    .transform_aggregate(revenue="sum(revenue)", groupby=["category"])
+)
 if cat_chart_type == "棒グラフ":
     cat_chart = (
-        alt.Chart(cat_sales)
-        .transform_filter(sel_region)  # 他パラメータでフィルタ
-        .transform_filter(sel_seg)
+        cat_base
         .mark_bar()
         .encode(
             x=alt.X("revenue:Q", title="売上金額"),
@@ -121,9 +288,7 @@ if cat_chart_type == "棒グラフ":
     )
 else:  # ドーナツ
     cat_chart = (
-        alt.Chart(cat_sales)
-        .transform_filter(sel_region)
-        .transform_filter(sel_seg)
+        cat_base
         .mark_arc(innerRadius=80)
         .encode(
             theta=alt.Theta("revenue:Q", title="売上"),
@@ -133,20 +298,18 @@ else:  # ドーナツ
         .encode(opacity=alt.condition(sel_cat, alt.value(1), alt.value(0.4)))
     )
 
-# ここで **必ず** 3つの param を付与（未定義参照を避ける）
-st.altair_chart(with_params(cat_chart).properties(height=360), use_container_width=True)
-
 # =========================
 # 地域別 売上（種別切替 + 複数選択）
 # =========================
-st.subheader("🌍 地域別売上（クリックで複数選択・ダブルクリックで解除）")
-region_sales = base_df.groupby("region", as_index=False)["revenue"].sum().sort_values("revenue", ascending=False)
-
+region_base = (
+    alt.Chart(title="地域別売上")
+    .transform_filter(sel_cat)
+    .transform_filter(sel_seg)
+    .transform_aggregate(revenue="sum(revenue)", groupby=["region"])
+)
 if region_chart_type == "棒(縦)":
     region_chart = (
-        alt.Chart(region_sales)
-        .transform_filter(sel_cat)
-        .transform_filter(sel_seg)
+        region_base
         .mark_bar()
         .encode(
             x=alt.X("region:N", title="地域", sort="-y"),
@@ -157,9 +320,7 @@ if region_chart_type == "棒(縦)":
     )
 else:  # 棒(横)
     region_chart = (
-        alt.Chart(region_sales)
-        .transform_filter(sel_cat)
-        .transform_filter(sel_seg)
+        region_base
         .mark_bar()
         .encode(
             x=alt.X("revenue:Q", title="売上金額"),
@@ -168,48 +329,32 @@ else:  # 棒(横)
         )
         .encode(opacity=alt.condition(sel_region, alt.value(1), alt.value(0.3)))
     )
-st.altair_chart(with_params(region_chart).properties(height=360), use_container_width=True)
 
 # =========================
 # 顧客セグメント別 売上シェア（種別切替 + 複数選択）
 # =========================
-st.subheader("👥 顧客セグメント別 売上シェア（クリックで複数選択・ダブルクリックで解除）")
-seg_sales = base_df.groupby("customer_segment", as_index=False)["revenue"].sum()
-
-if seg_chart_type == "円":
-    seg_chart = (
-        alt.Chart(seg_sales)
-        .transform_filter(sel_cat)
-        .transform_filter(sel_region)
-        .mark_arc()
-        .encode(
-            theta=alt.Theta("revenue:Q", title="売上"),
-            color=alt.Color("customer_segment:N", legend=alt.Legend(title="顧客セグメント")),
-            tooltip=["customer_segment:N", alt.Tooltip("revenue:Q", format=",.0f", title="売上")]
-        )
-        .encode(opacity=alt.condition(sel_seg, alt.value(1), alt.value(0.4)))
-    )
-else:  # ドーナツ
-    seg_chart = (
-        alt.Chart(seg_sales)
-        .transform_filter(sel_cat)
-        .transform_filter(sel_region)
-        .mark_arc(innerRadius=80)
-        .encode(
-            theta=alt.Theta("revenue:Q", title="売上"),
-            color=alt.Color("customer_segment:N", legend=alt.Legend(title="顧客セグメント")),
-            tooltip=["customer_segment:N", alt.Tooltip("revenue:Q", format=",.0f", title="売上")]
-        )
-        .encode(opacity=alt.condition(sel_seg, alt.value(1), alt.value(0.4)))
+seg_base = (
+    alt.Chart(title="顧客セグメント別 売上シェア")
+    .transform_filter(sel_cat)
+    .transform_filter(sel_region)
+    .transform_aggregate(revenue="sum(revenue)", groupby=["customer_segment"])
+)
+seg_chart = (
+    seg_base
+    .mark_arc(innerRadius=0 if seg_chart_type == "円" else 80)
+    .encode(
+        theta=alt.Theta("revenue:Q", title="売上"),
+        color=alt.Color("customer_segment:N", legend=alt.Legend(title="顧客セグメント")),
+        tooltip=["customer_segment:N", alt.Tooltip("revenue:Q", format=",.0f", title="売上")]
     )
-st.altair_chart(with_params(seg_chart).properties(height=360), use_container_width=True)
+    .encode(opacity=alt.condition(sel_seg, alt.value(1), alt.value(0.4)))
+)
 
 # =========================
 # 日毎の売上推移（選択連動）
 # =========================
-st.subheader("📈 日毎の売上推移（選択連動）")
 ts_base = (
-    alt.Chart(base_df)
+    alt.Chart(title="日毎の売上推移")
     .transform_filter(combined_sel)
     .transform_aggregate(revenue="sum(revenue)", groupby=["date"])
     .encode(
@@ -219,18 +364,28 @@ ts_base = (
     )
 )
 ts_chart = ts_base.mark_area() if ts_chart_type == "面" else ts_base.mark_line(point=True)
-st.altair_chart(with_params(ts_chart).properties(height=380), use_container_width=True)
+
+# =========================
+# 1つのビューとして描画
+#   selection は各チャートで1回だけ定義し、他のチャートからは参照のみ
+#   （同じビューにあるので、クリック選択がチャートをまたいで連動する）
+# =========================
+st.subheader("📊 売上ダッシュボード（クリックで複数選択・ダブルクリックで解除）")
+dashboard = alt.vconcat(
+    alt.hconcat(kpi_rev, kpi_units, kpi_cats),
+    alt.hconcat(
+        cat_chart.add_params(sel_cat).properties(height=360, width=420),
+        region_chart.add_params(sel_region).properties(height=360, width=420),
+    ),
+    seg_chart.add_params(sel_seg).properties(height=360, width=420),
+    ts_chart.properties(height=380, width=880),
+    data=shared_df,
+)
+st.altair_chart(dashboard, use_container_width=True)
+
+show_anomalies()
 
 # =========================
 # ヘルプ
 # =========================
-with st.expander("ℹ️ 操作ガイド"):
-    st.markdown(
-        """
-- サイドバーの**日付/カテゴリ**で事前フィルタ  
-- 各グラフの要素を**クリック**：選択に追加（複数可）  
-- **再クリック**：その要素だけ解除  
-- **背景ダブルクリック**：そのグラフの選択を全解除  
-- 上段の**ボタン（ラジオ）**でチャートの種類を切替  
-        """
-    )
+show_guide()
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Benchmark the chatbot pipeline end to end with a deterministic mock LLM.
+
+    python benchmark.py --rows 1000000 10000000 --sessions 1 4 16
+
+For each data size a synthetic sales CSV is generated with datagen.py (and
+cached), loaded with init_db, and a question corpus is replayed through
+pipeline.answer_question with an empty cache for every question.
+SQL generation goes through the real OpenAI client against a local
+OpenAI-compatible mock server, which answers with the predefined query
+matching each question. Ingestion time, per-stage latency (from tracing
+spans), fallback lookup and chart building time, peak RSS and throughput
+under concurrent sessions are written to a JSON file for comparing commits.
+Each size runs in its own process, so its peak RSS is not that of a larger
+size benchmarked before it.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from datagen import write_dataset
+
+
+BENCHMARK_DIR = ".cache/benchmark"
+RESULTS_DIR = "benchmark_results"
+
+# Questions replayed in every run (sample questions plus common variants)
+BENCHMARK_QUESTIONS = [
+    "月ごとのカテゴリ別売上を見せて",
+    "チャネル別の売上合計は？",
+    "地域ごとの売上を教えて",
+    "2025年1月の売上トップ3カテゴリは？",
+    "平均単価をチャネル別に分析して",
+    "顧客セグメント別の売上は？",
+    "月別の売上推移",
+    "カテゴリ別の販売数量",
+]
+
+
+class MockLLMServer:
+    """Local OpenAI-compatible chat completions server with deterministic answers."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        """
+        Args:
+            latency_ms: Artificial delay added to every completion
+        """
+        from fallbacks import find_best_fallback
+
+        latency = latency_ms / 1000
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                content = body.get("messages", [{}])[-1].get("content", "")
+                question = content.rsplit("【ユーザーの質問】", 1)[-1].split("【", 1)[0].strip()
+                _, sql = find_best_fallback(question)
+                sql = " ".join(sql.split())
+                if latency:
+                    time.sleep(latency)
+
+                payload = json.dumps({
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "mock"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": sql}, "finish_reason": "stop"}],
+                    "usage": {
+                        "prompt_tokens": len(content) // 2,
+                        "completion_tokens": len(sql) // 4,
+                        "total_tokens": len(content) // 2 + len(sql) // 4,
+                    },
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+
+def latency_stats(milliseconds: list) -> dict:
+    """Count, mean, p50, p95 and max of a list of latencies in milliseconds."""
+    if not milliseconds:
+        return {"count": 0}
+    values = np.asarray(milliseconds, dtype=float)
+    return {
+        "count": len(values),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def build_figure(df: pd.DataFrame):
+    """Build the chart viz.auto_chart would show, without rendering it."""
+    from viz import create_bar_chart, create_line_chart, create_pie_chart, create_scatter_plot, detect_chart_type
+
+    builders = {
+        "bar": create_bar_chart,
+        "line": create_line_chart,
+        "pie": create_pie_chart,
+        "scatter": create_scatter_plot,
+    }
+    chart_type = detect_chart_type(df)
+    return builders[chart_type](df) if chart_type in builders else None
+
+
+def answer_uncached(con, question: str):
+    """
+    Answer a question the way a cache miss would.
+
+    Every call gets an empty cache, so repeated questions are generated,
+    queried and analysed again instead of measuring cache hits.
+    """
+    from pipeline import answer_question
+    from shared_cache import MemoryCache
+
+    return answer_question(con, question, cache=MemoryCache())
+
+
+def prepare_dataset(rows: int) -> tuple:
+    """
+    Generate the synthetic sales CSV of a size unless it is already cached.
+
+    Returns:
+        Tuple of (path, generation seconds or None when cached)
+    """
+    path = os.path.join(BENCHMARK_DIR, f"sales_{rows}.csv")
+    if os.path.exists(path):
+        return path, None
+    start = time.perf_counter()
+    write_dataset("sales", rows, path, fmt="csv", partition_by_month=False)
+    return path, round(time.perf_counter() - start, 3)
+
+
+def run_size(rows: int, questions: list, sessions: list, repeats: int) -> dict:
+    """
+    Benchmark one data size.
+
+    Peak RSS is process-wide and never goes down, so main() runs every size
+    in a fresh process; called directly, later sizes report the peak so far.
+
+    Args:
+        rows: Synthetic sales rows
+        questions: Question corpus
+        sessions: Concurrent session counts for the throughput runs
+        repeats: Times the corpus is replayed for per-stage latency
+
+    Returns:
+        Result dictionary for this size
+    """
+    from db import clear_db_cache, init_db
+    from fallbacks import find_best_fallback
+    from tracing import span, start_trace
+
+    result = {"rows": rows}
+
+    path, generate_seconds = prepare_dataset(rows)
+    if generate_seconds is not None:
+        result["generate_seconds"] = generate_seconds
+    result["csv_bytes"] = os.path.getsize(path)
+
+    # Ingestion
+    clear_db_cache()
+    start = time.perf_counter()
+    try:
+        con = init_db(path)
+    except Exception as e:
+        result["error"] = f"init_db failed: {e}"
+        return result
+    result["ingest_seconds"] = round(time.perf_counter() - start, 3)
+    result["rss_mb_after_ingest"] = round(peak_rss_mb(), 1)
+
+    # Per-stage latency from the tracing spans
+    stages = {}
+    fallback_ms = []
+    for _ in range(repeats):
+        for question in questions:
+            with start_trace("benchmark_turn", export_path=None) as trace:
+                answer = answer_uncached(con, question)
+                with span("viz"):
+                    build_figure(answer.df)
+            for s in trace.spans:
+                stages.setdefault(s.name, []).append(s.duration_ms)
+
+            start = time.perf_counter()
+            find_best_fallback(question)
+            fallback_ms.append((time.perf_counter() - start) * 1000)
+
+    result["stages"] = {name: latency_stats(values) for name, values in stages.items()}
+    result["find_best_fallback"] = latency_stats(fallback_ms)
+
+    # Throughput under concurrent sessions sharing one connection
+    result["concurrency"] = []
+    for session_count in sessions:
+        latencies = []
+        lock = threading.Lock()
+
+        def session(_):
+            for question in questions:
+                start = time.perf_counter()
+                answer_uncached(con, question)
+                with lock:
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=session_count) as pool:
+            list(pool.map(session, range(session_count)))
+        seconds = time.perf_counter() - start
+        result["concurrency"].append({
+            "sessions": session_count,
+            "questions": len(latencies),
+            "seconds": round(seconds, 3),
+            "throughput_qps": round(len(latencies) / seconds, 2),
+            **latency_stats(latencies),
+        })
+
+    result["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    con.close()
+    clear_db_cache()
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(baseline: dict, current: dict):
+    """Print p50 stage latency changes against a baseline result file."""
+    base_runs = {run["rows"]: run for run in baseline.get("runs", [])}
+    for run in current["runs"]:
+        base = base_runs.get(run["rows"])
+        if not base:
+            continue
+        print(f"\n📊 {run['rows']:,} rows vs {baseline.get('commit', 'baseline')}")
+        print(f"   ingest: {base['ingest_seconds']:.2f}s → {run['ingest_seconds']:.2f}s")
+        for name, stats in run.get("stages", {}).items():
+            before = base.get("stages", {}).get(name, {}).get("p50_ms")
+            if before:
+                print(f"   {name}: p50 {before:.2f} → {stats['p50_ms']:.2f} ms ({stats['p50_ms'] / before - 1:+.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the chatbot pipeline with a mock LLM.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000],
+                        help="Synthetic sales sizes, e.g. 1000000 10000000 100000000")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16], help="Concurrent session counts")
+    parser.add_argument("--repeats", type=int, default=3, help="Corpus replays for per-stage latency")
+    parser.add_argument("--questions", help="Question file (same formats as run_batch.py)")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Artificial mock LLM latency")
+    parser.add_argument("--output", help="Result JSON path (default: benchmark_results/<time>-<commit>.json)")
+    parser.add_argument("--baseline", help="Earlier result JSON to compare against")
+    args = parser.parse_args()
+
+    if args.questions:
+        from run_batch import read_questions
+        questions = read_questions(args.questions)
+    else:
+        questions = BENCHMARK_QUESTIONS
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "duckdb": duckdb.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "rows": args.rows,
+            "sessions": args.sessions,
+            "repeats": args.repeats,
+            "questions": len(questions),
+            "llm_latency_ms": args.llm_latency_ms,
+        },
+        "runs": [],
+    }
+
+    with MockLLMServer(args.llm_latency_ms) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ["OPENAI_API_KEY"] = "mock"
+        for rows in args.rows:
+            print(f"🚀 Benchmarking {rows:,} rows...")
+            # Generated here so the data generator does not count towards the size's memory
+            _, generate_seconds = prepare_dataset(rows)
+            # A fresh process per size, so its peak RSS is its own
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                run = pool.submit(run_size, rows, questions, args.sessions, args.repeats).result()
+            if generate_seconds is not None:
+                run["generate_seconds"] = generate_seconds
+            report["runs"].append(run)
+            print(f"   ingest {run.get('ingest_seconds', 0):.2f}s, peak RSS {run.get('peak_rss_mb', 0):,.0f} MB")
+            for entry in run.get("concurrency", []):
+                print(f"   {entry['sessions']} session(s): {entry['throughput_qps']} q/s, p95 {entry['p95_ms']:.1f} ms")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{report['commit']}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"📁 Results: {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(json.load(f), report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,15 +3,33 @@ Sales Data Analysis AI Chatbot
 A Streamlit application for analyzing sales data using natural language queries.
 """
 
+import os
 import streamlit as st
-import pandas as pd
+import threading
 import traceback
+from dataclasses import asdict
 
 # Import our custom modules
-from db import init_db, query_df, get_data_summary
-from llm_sql_openai import process_sql_query
-from fallbacks import find_best_fallback
+from db import init_db, get_data_summary
+from fallbacks import SAMPLE_QUESTIONS
+from pipeline import PipelineResult, answer_question
+from prompt_builder import PromptBuilder
+from tracing import Trace, span, start_trace
 from viz import display_data_with_chart
+from warmup import WARMUP_ENABLED, Warmup
+
+
+def load_secrets():
+    """Copy API keys from Streamlit secrets into the environment the LLM modules read."""
+    for name in ("OPENAI_API_KEY", "ANTHROPIC_API_KEY"):
+        if os.getenv(name):
+            continue
+        try:
+            if name in st.secrets:
+                os.environ[name] = st.secrets[name]
+        except Exception:
+            # No secrets file
+            return
 
 
 def initialize_session_state():
@@ -22,24 +40,132 @@ def initialize_session_state():
         st.session_state.db_connection = None
     if "data_summary" not in st.session_state:
         st.session_state.data_summary = {}
+    if "prompt_builder" not in st.session_state:
+        st.session_state.prompt_builder = None
 
 
-def setup_database():
-    """Setup database connection and load data."""
-    if st.session_state.db_connection is None:
-        with st.spinner("Loading sales data..."):
-            st.session_state.db_connection = init_db()
-            if st.session_state.db_connection:
-                st.session_state.data_summary = get_data_summary(st.session_state.db_connection)
-                st.success("✅ Database loaded successfully!")
-                
-                # Check API key status
-                import os
-                if not os.getenv("OPENAI_API_KEY"):
-                    st.info("💡 To enable AI-powered SQL generation, set your OPENAI_API_KEY environment variable. For now, the app will use predefined queries.")
-            else:
-                st.error("❌ Failed to load database")
-                st.stop()
+class DataLoader:
+    """Loads the database, data summary and prompt builder in a background thread, then starts the warm-up."""
+    
+    def __init__(self):
+        self.result = None
+        self.error = None
+        self.warmup = None
+        self._staged = None
+        self._thread = threading.Thread(target=self._load, name="data-loader", daemon=True)
+        self._thread.start()
+    
+    def _load(self):
+        try:
+            con = init_db()
+            summary = get_data_summary(con)
+            self.result = (con, summary, PromptBuilder(con, summary))
+            con.add_reload_hook(self._reloaded)
+            if WARMUP_ENABLED:
+                # Answer the sample questions before anyone clicks them
+                self.warmup = Warmup(con, self.result[2])
+                self.warmup.start()
+        except Exception as e:
+            self.error = str(e)
+    
+    def _reloaded(self, new_con):
+        # Runs on the new snapshot before it goes live (see db.LiveConnection).
+        # A later hook can still fail the reload, so the values are staged for
+        # the version the swap will set and only taken over once it happens.
+        summary = get_data_summary(new_con)
+        self._staged = (self.result[0].version + 1, summary, PromptBuilder(new_con, summary))
+    
+    def current(self) -> tuple:
+        """The (connection, summary, prompt builder) of the data that is live now."""
+        con = self.result[0]
+        staged = self._staged
+        if staged is not None and staged[0] == con.version:
+            self.result = (con, staged[1], staged[2])
+            self._staged = None
+        return self.result
+    
+    @property
+    def ready(self) -> bool:
+        return not self._thread.is_alive()
+
+
+@st.cache_resource
+def get_data_loader() -> DataLoader:
+    """Start loading data once per server process (shared by all sessions)."""
+    return DataLoader()
+
+
+def setup_database() -> bool:
+    """
+    Attach the background-loaded database to the session.
+    
+    Returns:
+        True when the data is available, False while it is still loading
+    """
+    if st.session_state.db_connection is not None:
+        # Pick up the summary and prompt builder of reloaded data
+        con, summary, builder = get_data_loader().current()
+        if st.session_state.prompt_builder is not builder:
+            st.session_state.data_summary = summary
+            st.session_state.prompt_builder = builder
+        return True
+    
+    loader = get_data_loader()
+    if not loader.ready:
+        return False
+    
+    if loader.result is None:
+        # Retry on the next page load
+        get_data_loader.clear()
+        st.error(f"❌ Failed to load database: {loader.error}")
+        st.stop()
+    
+    con, summary, builder = loader.result
+    st.session_state.db_connection = con
+    st.session_state.data_summary = summary
+    st.session_state.prompt_builder = builder
+    st.success("✅ Database loaded successfully!")
+    
+    # Check API key status
+    if not os.getenv("OPENAI_API_KEY"):
+        st.info("💡 To enable AI-powered SQL generation, set your OPENAI_API_KEY environment variable. For now, the app will use predefined queries.")
+    return True
+
+
+def display_loading_skeleton():
+    """Placeholder UI shown while the data loads; reruns the app once it is ready."""
+    with st.sidebar:
+        st.header("📊 Data Overview")
+        st.caption("Loading sales data...")
+    
+    st.info("⏳ Loading sales data... You can start typing as soon as it is ready.")
+    st.chat_input("Ask me anything about the sales data...", disabled=True)
+    
+    @st.fragment(run_every=0.5)
+    def wait_for_data():
+        if get_data_loader().ready:
+            st.rerun(scope="app")
+    
+    wait_for_data()
+
+
+def display_warmup_status():
+    """Show the progress and timings of the startup warm-up in the sidebar."""
+    warmup = get_data_loader().warmup
+    if warmup is None:
+        return
+    
+    if warmup.finished:
+        with st.expander(f"🔥 {warmup.summary()}", expanded=False):
+            st.dataframe([asdict(item) for item in warmup.items], hide_index=True)
+        return
+    
+    # Only this fragment reruns, so answers on the page are left alone
+    @st.fragment(run_every=1)
+    def warmup_progress():
+        st.progress(warmup.done / max(warmup.total, 1), text=f"🔥 {warmup.summary()}")
+    
+    warmup_progress()
 
 
 def display_sidebar():
@@ -47,6 +173,10 @@ def display_sidebar():
     with st.sidebar:
         st.header("📊 Data Overview")
         
+        con = st.session_state.db_connection
+        if getattr(con, "last_error", None):
+            st.warning(f"⚠️ Data reload failed; showing the previous data. {con.last_error}")
+        
         if st.session_state.data_summary:
             summary = st.session_state.data_summary
             
@@ -87,26 +217,20 @@ def display_sidebar():
         st.divider()
         
         # API Status
-        import os
         if os.getenv("OPENAI_API_KEY"):
             st.success("🤖 AI SQL Generation: Enabled (ChatGPT)")
         else:
             st.warning("🤖 AI SQL Generation: Disabled")
             st.caption("Set OPENAI_API_KEY to enable")
         
+        st.checkbox("⏱️ Show latency breakdown", key="show_latency")
+        display_warmup_status()
+        
         st.divider()
         
         # Sample questions
         st.header("💡 Sample Questions")
-        sample_questions = [
-            "月ごとのカテゴリ別売上を見せて",
-            "チャネル別の売上合計は？",
-            "地域ごとの売上を教えて",
-            "2025年1月の売上トップ3カテゴリは？",
-            "平均単価をチャネル別に分析して"
-        ]
-        
-        for i, question in enumerate(sample_questions):
+        for i, question in enumerate(SAMPLE_QUESTIONS):
             if st.button(question, key=f"sample_btn_{i}"):
                 st.success(f"✅ Processing: {question}")
                 # Add user message to chat history
@@ -114,44 +238,13 @@ def display_sidebar():
                 
                 # Immediately process the question (like in button_test.py)
                 try:
-                    # Import required functions for processing
-                    from llm_sql_openai import process_sql_query
-                    from fallbacks import find_best_fallback
-                    from db import query_df
-                    from viz import display_data_with_chart
-                    
-                    # Process question
-                    sql, is_generated = process_sql_query(question)
-                    
-                    # If SQL generation failed, use fallback
-                    if not is_generated or not sql.strip():
-                        fallback_name, fallback_sql = find_best_fallback(question)
-                        sql = fallback_sql
-                        st.info(f"🔄 Using fallback query: {fallback_name}")
-                    else:
-                        st.success("✅ SQL generated successfully!")
-                    
-                    # Display the SQL query
-                    with st.expander("🔍 View SQL Query", expanded=False):
-                        st.code(sql, language="sql")
-                    
-                    # Execute the query
-                    with st.spinner("Executing query..."):
-                        result_df = query_df(st.session_state.db_connection, sql)
-                    
-                    st.write(f"📊 Query returned {len(result_df)} rows")
-                    
-                    if not result_df.empty:
-                        # Display results with visualization
-                        display_data_with_chart(result_df, "Query Results")
-                        
-                        # Add some insights
-                        st.subheader("🎯 Key Insights")
-                        insights = generate_insights(result_df, question)
-                        for insight in insights:
-                            st.write(f"• {insight}")
-                    else:
-                        st.warning("⚠️ No data found for your query.")
+                    with start_trace("chat_turn", question=question) as trace:
+                        with st.spinner("Generating and executing SQL query..."):
+                            result = answer_question(
+                                st.session_state.db_connection, question, st.session_state.prompt_builder
+                            )
+                        display_result(result)
+                    display_latency_panel(trace)
                     
                     # Add success message to chat history
                     st.session_state.messages.append({
@@ -170,124 +263,97 @@ def display_sidebar():
                 st.rerun()
 
 
-def process_user_question(question: str):
+def display_result(result: PipelineResult):
     """
-    Process user question and generate response with data visualization.
+    Display a pipeline result: how the SQL was obtained, the query, chart and insights.
     
     Args:
-        question: User's natural language question
+        result: Output of pipeline.answer_question
     """
-    try:
-        # Add debug output
-        st.write(f"🔍 Processing question: {question}")
-        
-        # Try to generate SQL
-        with st.spinner("Generating SQL query..."):
-            st.write("🤖 Connecting to OpenAI...")
-            sql, is_generated = process_sql_query(question)
-            st.write("📝 SQL generation complete")
-        
-        # If SQL generation failed, use fallback
-        if not is_generated or not sql.strip():
-            fallback_name, fallback_sql = find_best_fallback(question)
-            sql = fallback_sql
-            st.info(f"🔄 Using fallback query: {fallback_name}")
-        else:
-            st.success("✅ SQL generated successfully!")
-        
-        # Display the SQL query in an expander
-        with st.expander("🔍 View SQL Query", expanded=False):
-            st.code(sql, language="sql")
-        
-        # Execute the query
-        with st.spinner("Executing query..."):
-            result_df = query_df(st.session_state.db_connection, sql)
-        
-        st.write(f"📊 Query returned {len(result_df)} rows")
-        
-        if result_df.empty:
-            st.warning("⚠️ No data found for your query. Try rephrasing your question or being more specific.")
-            return
-        
-        # Display results with visualization
-        display_data_with_chart(result_df, "Query Results")
-        
-        # Add some insights
-        st.subheader("🎯 Key Insights")
-        if len(result_df) > 0:
-            insights = generate_insights(result_df, question)
-            for insight in insights:
-                st.write(f"• {insight}")
+    if result.generation_error:
+        st.warning(f"SQL generation failed: {result.generation_error}. Using fallback query.")
     
-    except Exception as e:
-        st.error(f"❌ Error processing your question: {str(e)}")
-        
-        # Try fallback as last resort
-        try:
-            st.info("🔄 Attempting fallback query...")
-            fallback_name, fallback_sql = find_best_fallback(question)
-            
-            with st.expander("🔍 View Fallback SQL Query", expanded=False):
-                st.code(fallback_sql, language="sql")
-            
-            result_df = query_df(st.session_state.db_connection, fallback_sql)
-            
-            if not result_df.empty:
-                display_data_with_chart(result_df, f"Fallback Results: {fallback_name}")
-            else:
-                st.error("❌ Fallback query also returned no results.")
-                
-        except Exception as fallback_error:
-            st.error(f"❌ Fallback also failed: {str(fallback_error)}")
-            if st.checkbox("Show detailed error information"):
-                st.text(traceback.format_exc())
+    repair = result.repair
+    if repair and (len(repair.attempts) > 1 or not repair.succeeded):
+        with st.expander(f"🛠️ SQL repair: {len(repair.attempts)} attempt(s), {repair.total_seconds:.2f}s", expanded=False):
+            for i, attempt in enumerate(repair.attempts, 1):
+                st.write(
+                    f"**Attempt {i}**: validate {attempt.validate_seconds:.3f}s, "
+                    f"execute {attempt.execute_seconds:.3f}s, repair {attempt.repair_seconds:.3f}s"
+                )
+                if attempt.error:
+                    st.caption(attempt.error)
+    
+    if result.source == "fallback":
+        st.info(f"🔄 Using fallback query: {result.fallback_name}")
+    else:
+        st.success("✅ SQL generated successfully!")
+    
+    # Display the SQL query in an expander
+    with st.expander("🔍 View SQL Query", expanded=False):
+        st.code(result.sql, language="sql")
+    
+    st.write(f"📊 Query returned {len(result.df)} rows")
+    if result.cached:
+        st.caption("⚡ Served from the cache")
+    
+    if result.df.empty:
+        st.warning("⚠️ No data found for your query. Try rephrasing your question or being more specific.")
+        return
+    
+    # Display results with visualization
+    with span("auto_chart", rows=len(result.df)):
+        display_data_with_chart(result.df, "Query Results", st.session_state.db_connection, result.sql)
+    
+    # Add some insights
+    st.subheader("🎯 Key Insights")
+    for insight in result.insights:
+        st.write(f"• {insight}")
 
 
-def generate_insights(df: pd.DataFrame, question: str = None) -> list:
+def display_latency_panel(trace: Trace):
     """
-    Generate simple insights from the query results.
+    Show the per-stage latency breakdown of a chat turn (when enabled in the sidebar).
     
     Args:
-        df: Query results DataFrame
-        question: Original user question (unused, kept for future enhancement)
-        
-    Returns:
-        List of insight strings
+        trace: Finished trace of the turn
+    """
+    if not st.session_state.get("show_latency"):
+        return
+    
+    breakdown = trace.breakdown()
+    total_ms = breakdown["ms"].iloc[0] if not breakdown.empty else 0
+    with st.expander(f"⏱️ Latency breakdown: {total_ms:,.0f} ms", expanded=False):
+        st.dataframe(breakdown, use_container_width=True, hide_index=True)
+        st.caption(f"Trace ID: {trace.trace_id}")
+
+
+def process_user_question(question: str):
     """
-    insights = []
+    Process user question and generate response with data visualization.
     
+    Args:
+        question: User's natural language question
+    """
     try:
-        # Basic insights
-        insights.append(f"Found {len(df)} records matching your query")
-        
-        # Numeric column insights
-        numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+        # Add debug output
+        st.write(f"🔍 Processing question: {question}")
         
-        for col in numeric_cols:
-            if col.lower() in ['revenue', 'total_revenue']:
-                total_revenue = df[col].sum()
-                avg_revenue = df[col].mean()
-                insights.append(f"Total revenue: ¥{total_revenue:,.0f}")
-                insights.append(f"Average revenue: ¥{avg_revenue:,.0f}")
-                
-                if len(df) > 1:
-                    max_idx = df[col].idxmax()
-                    max_row = df.loc[max_idx]
-                    insights.append(f"Highest revenue: {max_row.iloc[0] if len(df.columns) > 1 else 'N/A'} (¥{df[col].max():,.0f})")
+        # Generate, validate and run SQL (the pipeline falls back to predefined queries)
+        with start_trace("chat_turn", question=question) as trace:
+            with st.spinner("Generating SQL query..."):
+                result = answer_question(
+                    st.session_state.db_connection, question, st.session_state.prompt_builder
+                )
             
-            elif col.lower() in ['units', 'total_units']:
-                total_units = df[col].sum()
-                insights.append(f"Total units sold: {total_units:,}")
-        
-        # If data has multiple rows, mention the range
-        if len(df) > 1:
-            insights.append(f"Data spans {len(df)} different categories/periods")
+            display_result(result)
+        display_latency_panel(trace)
     
-    except Exception:
-        # If insight generation fails, just provide basic info
-        insights = [f"Successfully retrieved {len(df)} records"]
-    
-    return insights
+    except Exception as e:
+        # The fallback query failed as well
+        st.error(f"❌ Error processing your question: {str(e)}")
+        if st.checkbox("Show detailed error information"):
+            st.text(traceback.format_exc())
 
 
 def display_chat_interface():
@@ -341,19 +407,24 @@ def main():
     if "initialized" not in st.session_state:
         st.session_state.initialized = True
     
+    # API keys from .streamlit/secrets.toml
+    load_secrets()
+    
     # Initialize session state
     initialize_session_state()
     
-    # Setup database
-    setup_database()
-    
-    # Main header
+    # Main header (rendered before the data is available)
     st.title("🤖 Sales Data Analysis AI Chatbot")
     st.markdown("""
     Ask me anything about your sales data in natural language! 
     I can analyze trends, compare categories, and provide insights with visualizations.
     """)
     
+    # Setup database (loaded in the background; show a skeleton until it is ready)
+    if not setup_database():
+        display_loading_skeleton()
+        return
+    
     # Display sidebar
     display_sidebar()
     
@@ -0,0 +1,201 @@
+"""
+DuckDB query layer for the sales BI dashboard (app.py).
+Filters are bind parameters and aggregation happens in DuckDB, so only
+grouped rows are handed to Altair regardless of how large the sales table grows.
+"""
+
+import datetime
+from typing import Any, Sequence
+
+import pandas as pd
+
+
+# Dimensions that charts may group by (identifiers cannot be bound as parameters)
+DIMENSIONS = ["date", "month", "category", "region", "sales_channel", "customer_segment"]
+
+# Fields used by the Altair click selections in app.py
+SELECTION_FIELDS = ["category", "region", "customer_segment"]
+
+# Shared WHERE clause: date range and category list are bind parameters.
+# An empty category list means "no category filter".
+FILTER_CLAUSE = """
+    date BETWEEN $start_date AND $end_date
+    AND (len($categories::VARCHAR[]) = 0 OR list_contains($categories::VARCHAR[], category))
+"""
+
+
+def _filter_params(start_date: datetime.date, end_date: datetime.date,
+                   categories: Sequence[str]) -> dict:
+    """Build the bind parameters for FILTER_CLAUSE."""
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "categories": list(categories),
+    }
+
+
+def get_filter_options(con: Any) -> dict:
+    """
+    Get the values needed to build the dashboard sidebar filters.
+
+    Args:
+        con: DuckDB connection object
+
+    Returns:
+        Dictionary with min_date, max_date and categories
+    """
+    cur = con.cursor()
+    min_date, max_date = cur.execute("SELECT MIN(date), MAX(date) FROM sales").fetchone()
+    categories = cur.execute("SELECT DISTINCT category FROM sales ORDER BY category").fetchall()
+    return {
+        "min_date": min_date,
+        "max_date": max_date,
+        "categories": [row[0] for row in categories],
+    }
+
+
+def aggregate_sales(con: Any, dimensions: Sequence[str], start_date: datetime.date,
+                    end_date: datetime.date, categories: Sequence[str]) -> pd.DataFrame:
+    """
+    Aggregate revenue and units by the given dimensions inside DuckDB.
+
+    Args:
+        con: DuckDB connection object
+        dimensions: Columns to group by (must be in DIMENSIONS)
+        start_date: First date of the range (inclusive)
+        end_date: Last date of the range (inclusive)
+        categories: Categories to include (empty = all)
+
+    Returns:
+        DataFrame with one row per dimension combination and revenue/units sums
+    """
+    invalid = [dim for dim in dimensions if dim not in DIMENSIONS]
+    if invalid:
+        raise ValueError(f"Unsupported dimensions: {', '.join(invalid)}")
+
+    select_dims = "".join(f"{dim}, " for dim in dimensions)
+    group_by = f"GROUP BY {', '.join(dimensions)} ORDER BY {', '.join(dimensions)}" if dimensions else ""
+    sql = f"""
+        SELECT {select_dims}SUM(revenue) AS revenue, SUM(units) AS units
+        FROM sales
+        WHERE {FILTER_CLAUSE}
+        {group_by}
+    """
+
+    # A cursor per query keeps the shared connection safe across Streamlit sessions
+    return con.cursor().execute(sql, _filter_params(start_date, end_date, categories)).fetchdf()
+
+
+def daily_sales(con: Any, start_date: datetime.date, end_date: datetime.date,
+                categories: Sequence[str]) -> pd.DataFrame:
+    """
+    Daily sales at the grain of the click selections.
+
+    This is the single dataset shared by every browser-side chart: KPIs and
+    breakdown panels re-aggregate it in Vega-Lite after applying selections.
+    """
+    return aggregate_sales(con, ["date"] + SELECTION_FIELDS, start_date, end_date, categories)
+
+
+# =========================
+# Server-side cross-filtering
+# =========================
+
+# Pre-aggregated cube at the grain of the selection fields and day.
+# Cross-filter queries read this instead of the raw sales rows.
+CUBE_TABLE = "sales_cube"
+
+
+def ensure_sales_cube(con: Any) -> None:
+    """
+    Create the cross-filter cube table if it does not exist yet.
+
+    Shared read-only snapshots already contain it (see db.publish_snapshot).
+
+    Args:
+        con: DuckDB connection object
+    """
+    cursor = con.cursor()
+    if cursor.execute(
+        "SELECT COUNT(*) FROM duckdb_tables() WHERE database_name = current_database() AND table_name = $name",
+        {"name": CUBE_TABLE},
+    ).fetchone()[0]:
+        return
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CUBE_TABLE} AS
+        SELECT date, {', '.join(SELECTION_FIELDS)},
+               SUM(revenue) AS revenue, SUM(units) AS units
+        FROM sales
+        GROUP BY ALL
+    """)
+
+
+def _selection_clause(selections: dict, exclude: str = None) -> tuple[str, dict]:
+    """
+    Build WHERE conditions for the click selections.
+
+    A chart is not filtered by its own selection (it only highlights it), so
+    the field given as ``exclude`` is skipped.
+    """
+    conditions = []
+    params = {}
+    for field in SELECTION_FIELDS:
+        values = selections.get(field) or []
+        if field == exclude or not values:
+            continue
+        conditions.append(f"AND list_contains($sel_{field}::VARCHAR[], {field})")
+        params[f"sel_{field}"] = list(values)
+    return "\n".join(conditions), params
+
+
+def cross_filtered_sales(con: Any, dimension: str, selections: dict,
+                         start_date: datetime.date, end_date: datetime.date,
+                         categories: Sequence[str]) -> pd.DataFrame:
+    """
+    Revenue by one dimension, filtered by the selections made in the other charts.
+
+    Args:
+        con: DuckDB connection object
+        dimension: Column to group by (must be in DIMENSIONS)
+        selections: Mapping of selection field to selected values
+        start_date: First date of the range (inclusive)
+        end_date: Last date of the range (inclusive)
+        categories: Categories to include (empty = all)
+
+    Returns:
+        DataFrame with one row per dimension value
+    """
+    if dimension not in DIMENSIONS:
+        raise ValueError(f"Unsupported dimension: {dimension}")
+
+    selection_sql, selection_params = _selection_clause(selections, exclude=dimension)
+    sql = f"""
+        SELECT {dimension}, SUM(revenue) AS revenue, SUM(units) AS units
+        FROM {CUBE_TABLE}
+        WHERE {FILTER_CLAUSE}
+        {selection_sql}
+        GROUP BY {dimension}
+        ORDER BY {dimension}
+    """
+    params = {**_filter_params(start_date, end_date, categories), **selection_params}
+    return con.cursor().execute(sql, params).fetchdf()
+
+
+def cross_filtered_kpis(con: Any, selections: dict, start_date: datetime.date,
+                        end_date: datetime.date, categories: Sequence[str]) -> dict:
+    """
+    KPI totals filtered by every active selection.
+
+    Returns:
+        Dictionary with revenue, units and category_count
+    """
+    selection_sql, selection_params = _selection_clause(selections)
+    sql = f"""
+        SELECT COALESCE(SUM(revenue), 0), COALESCE(SUM(units), 0), COUNT(DISTINCT category)
+        FROM {CUBE_TABLE}
+        WHERE {FILTER_CLAUSE}
+        {selection_sql}
+    """
+    params = {**_filter_params(start_date, end_date, categories), **selection_params}
+    revenue, units, category_count = con.cursor().execute(sql, params).fetchone()
+    return {"revenue": revenue, "units": units, "category_count": category_count}
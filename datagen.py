@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Synthetic sales and orders data at arbitrary scale.
+
+    python datagen.py sales --rows 10000000 --output .cache/datagen/sales --format parquet
+    python datagen.py orders --rows 5000000 --output .cache/datagen/orders.csv --format csv --no-partition
+
+Rows are generated in vectorized chunks and streamed to disk, so memory use
+stays at one chunk regardless of size. Distributions follow the samples
+(data/sample_sales.csv, sample_data/orders.csv): the same categories, prices,
+regions, channels and segments, the order status mix and the
+created → shipped → delivered → returned delays. Rows come out in time
+order. Output is partitioned by month unless --no-partition is given (Hive
+layout month=YYYY-MM/part-NNNNN.parquet, or .csv, under the output
+directory), which DuckDB reads with
+read_parquet('dir/**/*.parquet', hive_partitioning = true). Use
+--no-partition to write a single file.
+"""
+
+import argparse
+import os
+import sys
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+
+CHUNK_ROWS = 1_000_000
+
+# --- sales (data/sample_sales.csv) ---
+CATEGORY_PRICES = {
+    "Electronics": 19990,
+    "Groceries": 250,
+    "Clothing": 3990,
+    "Home & Kitchen": 5990,
+    "Sports": 2990,
+    "Beauty": 1490,
+}
+REGIONS = {"North": 0.25, "East": 0.25, "South": 0.24, "West": 0.26}
+SALES_CHANNELS = {"Online": 0.49, "Store": 0.51}
+CUSTOMER_SEGMENTS = {"Small Business": 0.33, "Consumer": 0.33, "Corporate": 0.34}
+UNITS_MEAN = 6.9
+UNITS_STD = 2.4
+
+# Relative demand by month and weekday (the three sample months are flat;
+# the rest of the year follows a typical retail curve)
+MONTH_SEASONALITY = {1: 1.0, 2: 1.0, 3: 1.0, 4: 0.95, 5: 0.95, 6: 1.0,
+                     7: 1.05, 8: 1.0, 9: 0.95, 10: 1.0, 11: 1.15, 12: 1.3}
+WEEKDAY_SEASONALITY = {0: 0.95, 1: 0.95, 2: 0.95, 3: 1.0, 4: 1.05, 5: 1.1, 6: 1.0}
+
+# --- orders (sample_data/orders.csv) ---
+ORDER_STATUSES = {"Shipped": 0.30, "Complete": 0.25, "Processing": 0.20, "Cancelled": 0.15, "Returned": 0.10}
+ITEMS_PER_ORDER = {1: 0.70, 2: 0.20, 3: 0.05, 4: 0.05}
+ORDERS_PER_USER = 1.3
+# Uniform delays in hours: created -> shipped -> delivered -> returned
+SHIP_HOURS = 72
+DELIVER_HOURS = 120
+RETURN_HOURS = 72
+ORDER_COLUMNS = ["order_id", "user_id", "status", "gender", "created_at",
+                 "returned_at", "shipped_at", "delivered_at", "num_of_item"]
+
+
+def _choice(rng: np.random.Generator, weights: dict, size: int) -> np.ndarray:
+    values = np.array(list(weights))
+    probabilities = np.array(list(weights.values()), dtype=float)
+    return values[rng.choice(len(values), size, p=probabilities / probabilities.sum())]
+
+
+def _positions(offset: int, size: int, rows: int) -> np.ndarray:
+    """Fraction of the time range for rows offset..offset+size (evenly spread, increasing)."""
+    return (np.arange(offset, offset + size, dtype=np.float64) + 0.5) / rows
+
+
+def iter_sales(rows: int, start: str = "2025-01-01", end: str = "2025-12-31",
+               seed: int = 0, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Generate sales rows in date order, one chunk at a time.
+
+    Args:
+        rows: Total number of rows
+        start: First date
+        end: Last date (inclusive)
+        seed: Random seed (the same seed gives the same data)
+        chunk_rows: Rows per chunk
+
+    Yields:
+        DataFrames with the columns of data/sample_sales.csv
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, end, freq="D")
+    date_strings = dates.strftime("%Y-%m-%d").to_numpy()
+    demand = (dates.month.map(MONTH_SEASONALITY).to_numpy()
+              * dates.weekday.map(WEEKDAY_SEASONALITY).to_numpy())
+    categories = np.array(list(CATEGORY_PRICES))
+    prices = np.array(list(CATEGORY_PRICES.values()))
+
+    for offset in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - offset)
+        day = (_positions(offset, n, rows) * len(dates)).astype(np.int64)
+        category = rng.integers(0, len(categories), n)
+        units = np.clip(np.rint(rng.normal(UNITS_MEAN * demand[day], UNITS_STD)), 1, None).astype(np.int64)
+        yield pd.DataFrame({
+            "date": date_strings[day],
+            "category": categories[category],
+            "units": units,
+            "unit_price": prices[category],
+            "region": _choice(rng, REGIONS, n),
+            "sales_channel": _choice(rng, SALES_CHANNELS, n),
+            "customer_segment": _choice(rng, CUSTOMER_SEGMENTS, n),
+            "revenue": units * prices[category],
+        })
+
+
+def iter_orders(rows: int, start: str = "2025-01-01", end: str = "2025-07-15",
+                seed: int = 0, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Generate orders in created_at order, one chunk at a time.
+
+    Timestamps follow each status: Processing and Cancelled orders have none,
+    Shipped orders have shipped_at, Complete adds delivered_at and Returned
+    adds returned_at.
+
+    Args:
+        rows: Total number of orders
+        start: Earliest created_at
+        end: Latest created_at
+        seed: Random seed (the same seed gives the same data)
+        chunk_rows: Rows per chunk
+
+    Yields:
+        DataFrames with the columns of sample_data/orders.csv
+    """
+    rng = np.random.default_rng(seed)
+    start_ts = pd.Timestamp(start)
+    span_seconds = (pd.Timestamp(end) - start_ts).total_seconds()
+    users = max(1, int(rows / ORDERS_PER_USER))
+    hour = np.timedelta64(3600, "s")
+
+    for offset in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - offset)
+        seconds = _positions(offset, n, rows) * span_seconds
+        # Round to the minute like the sample
+        created = start_ts.to_datetime64() + (seconds // 60 * 60).astype("timedelta64[s]")
+        status = _choice(rng, ORDER_STATUSES, n)
+        user_id = rng.integers(1, users + 1, n)
+
+        shipped = created + (rng.uniform(0, SHIP_HOURS, n) * hour).astype("timedelta64[s]")
+        delivered = shipped + (rng.uniform(0, DELIVER_HOURS, n) * hour).astype("timedelta64[s]")
+        returned = delivered + (rng.uniform(0, RETURN_HOURS, n) * hour).astype("timedelta64[s]")
+        nat = np.datetime64("NaT")
+        has_shipped = np.isin(status, ["Shipped", "Complete", "Returned"])
+        has_delivered = np.isin(status, ["Complete", "Returned"])
+
+        yield pd.DataFrame({
+            "order_id": np.arange(offset + 1, offset + n + 1),
+            "user_id": user_id,
+            "status": status,
+            # One gender per user
+            "gender": np.where((user_id * 2654435761) % 97 % 2 == 0, "F", "M"),
+            "created_at": created,
+            "returned_at": np.where(status == "Returned", returned, nat),
+            "shipped_at": np.where(has_shipped, shipped, nat),
+            "delivered_at": np.where(has_delivered, delivered, nat),
+            "num_of_item": np.array(list(ITEMS_PER_ORDER))[
+                rng.choice(len(ITEMS_PER_ORDER), n, p=list(ITEMS_PER_ORDER.values()))],
+        }, columns=ORDER_COLUMNS)
+
+
+GENERATORS = {
+    "sales": (iter_sales, "date"),
+    "orders": (iter_orders, "created_at"),
+}
+
+
+def write_dataset(kind: str, rows: int, output: str, fmt: str = "parquet",
+                  partition_by_month: bool = True, seed: int = 0,
+                  chunk_rows: int = CHUNK_ROWS) -> list:
+    """
+    Stream a synthetic dataset to Parquet or CSV.
+
+    Args:
+        kind: "sales" or "orders"
+        rows: Number of rows
+        output: Output directory (partitioned) or file path
+        fmt: "parquet" or "csv"
+        partition_by_month: Write month=YYYY-MM/part-NNNNN files under output
+        seed: Random seed
+        chunk_rows: Rows generated per chunk (bounds memory use)
+
+    Returns:
+        List of written file paths
+    """
+    generate, time_column = GENERATORS[kind]
+    written = []
+
+    def write(df: pd.DataFrame, path: str, append: bool = False):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # pyarrow writers are several times faster than DataFrame.to_csv/to_parquet
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if fmt == "parquet":
+            pq.write_table(table, path)
+        else:
+            # Second-resolution timestamps and unquoted values, like the sample files
+            # (generated values never contain commas or quotes)
+            table = table.cast(pa.schema([
+                pa.field(f.name, pa.timestamp("s")) if pa.types.is_timestamp(f.type) else f for f in table.schema
+            ]))
+            with open(path, "ab" if append else "wb") as f:
+                if not append:
+                    f.write((",".join(table.column_names) + "\n").encode())
+                pa_csv.write_csv(table, f, pa_csv.WriteOptions(include_header=False, quoting_style="none"))
+        if not append:
+            written.append(path)
+
+    for number, chunk in enumerate(generate(rows, seed=seed, chunk_rows=chunk_rows)):
+        if partition_by_month:
+            # Chunks are in time order, so each month is a contiguous slice
+            months = np.asarray(chunk[time_column]).astype("datetime64[D]").astype("datetime64[M]")
+            bounds = [0, *(np.flatnonzero(months[1:] != months[:-1]) + 1), len(chunk)]
+            for begin, stop in zip(bounds[:-1], bounds[1:]):
+                write(chunk.iloc[begin:stop], os.path.join(output, f"month={months[begin]}", f"part-{number:05d}.{fmt}"))
+        elif fmt == "parquet":
+            write(chunk, os.path.join(output, f"part-{number:05d}.parquet"))
+        else:
+            write(chunk, output, append=number > 0)
+
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic sales or orders data.")
+    parser.add_argument("kind", choices=sorted(GENERATORS))
+    parser.add_argument("--rows", type=int, required=True, help="Number of rows")
+    parser.add_argument("--output", required=True, help="Output directory, or file for unpartitioned CSV")
+    parser.add_argument("--format", choices=["parquet", "csv"], default="parquet")
+    parser.add_argument("--no-partition", action="store_true", help="Do not split files by month")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    files = write_dataset(args.kind, args.rows, args.output, args.format,
+                          partition_by_month=not args.no_partition, seed=args.seed,
+                          chunk_rows=args.chunk_rows)
+    print(f"✅ Wrote {args.rows:,} {args.kind} rows to {len(files)} file(s) under {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,38 +1,633 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import weakref
 import pandas as pd
 import duckdb
-from typing import Any
-import streamlit as st
+from typing import Any, Callable, Optional
 
 
-@st.cache_resource
-def init_db(csv_path: str = "data/sample_sales.csv") -> Any:
+# Tables registered next to sales so the chatbot can join them.
+# columns=None lets DuckDB detect the types (used for files without a fixed schema).
+TABLE_CATALOG = {
+    "orders": {
+        "path": "sample_data/orders.csv",
+        "description": "注文（1行=1注文）",
+        "columns": {
+            "order_id": "BIGINT",
+            "user_id": "BIGINT",
+            "status": "VARCHAR",
+            "gender": "VARCHAR",
+            "created_at": "TIMESTAMP",
+            "returned_at": "TIMESTAMP",
+            "shipped_at": "TIMESTAMP",
+            "delivered_at": "TIMESTAMP",
+            "num_of_item": "INTEGER",
+        },
+        "notes": {
+            "status": "'Processing', 'Shipped', 'Complete', 'Returned', 'Cancelled'",
+            "gender": "'M' / 'F'",
+        },
+        # Rows are stored in created_at order so DuckDB's per-row-group min/max
+        # (zone maps) can skip data for date-range filters
+        "sort_by": "created_at",
+        "indexes": ["user_id", "created_at"],
+    },
+    "users": {
+        "path": "sample_data/users.csv",
+        "description": "ユーザー（1行=1ユーザー）",
+        "columns": None,
+        "notes": {},
+        "sort_by": None,
+        "indexes": ["id"],
+    },
+}
+
+# Column notes and join keys for the prompt
+SALES_DESCRIPTION = "日次の販売明細"
+# month is a DATE: compare it with dates, or format it to match 'YYYY-MM' text
+MONTH_FILTER_EXAMPLES = [
+    "month = DATE '2025-01-01'",
+    "strftime(month, '%Y-%m') = '2025-01'",
+]
+SALES_NOTES = {
+    "month": f"各月1日の DATE。文字列とは直接比較できない（例: {'、'.join(MONTH_FILTER_EXAMPLES)}）",
+}
+JOIN_HINTS = [
+    "orders.user_id = users.id",
+]
+
+# VARCHAR columns with at most this many distinct values, and at most this
+# share of the rows, are stored as ENUMs (dictionary-encoded: one small
+# integer per row instead of a string, so GROUP BY and filters compare codes)
+ENUM_MAX_VALUES = 256
+ENUM_MAX_RATIO = 0.5
+
+# Seconds between checks of the data files for hot reload (0 disables it)
+RELOAD_INTERVAL = float(os.getenv("DATA_RELOAD_INTERVAL", "5"))
+
+# Multi-process mode (see run_workers.py): workers attach read-only to the
+# snapshot named in this pointer file instead of loading the CSV themselves
+DATA_SNAPSHOT = os.getenv("DATA_SNAPSHOT")
+SNAPSHOT_DIR = ".cache/snapshots"
+SNAPSHOT_POINTER = "current"
+# DuckDB buffer pool limit per worker, e.g. "1GB" (DuckDB's default if unset)
+SNAPSHOT_MEMORY_LIMIT = os.getenv("DUCKDB_MEMORY_LIMIT")
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def apply_enum_types(con: Any, table: str) -> list:
     """
-    Initialize DuckDB connection and create the sales table with derived month column.
+    Convert the low-cardinality VARCHAR columns of a table to ENUM types.
+    
+    The table is rebuilt once with every conversion applied, keeping its row
+    order. Call this before creating indexes on the table.
+    
+    Args:
+        con: DuckDB connection object
+        table: Table name
+        
+    Returns:
+        List of converted column names
+    """
+    columns = [name for name, column_type, *_ in con.execute(f"DESCRIBE {table}").fetchall() if column_type == "VARCHAR"]
+    if not columns:
+        return []
+    
+    # Cheap HyperLogLog estimate first (with slack for its error); exact values only for the candidates
+    rows, *estimates = con.execute(
+        f"SELECT COUNT(*), {', '.join(f'approx_count_distinct({_quote(c)})' for c in columns)} FROM {table}"
+    ).fetchone()
+    candidates = [c for c, n in zip(columns, estimates) if 0 < n <= ENUM_MAX_VALUES * 1.1 and n <= rows * ENUM_MAX_RATIO]
+    if not candidates:
+        return []
+    
+    value_lists = con.execute("SELECT " + ", ".join(
+        f"list(DISTINCT {_quote(c)} ORDER BY {_quote(c)}) FILTER (WHERE {_quote(c)} IS NOT NULL)" for c in candidates
+    ) + f" FROM {table}").fetchone()
+    casts = {
+        c: f"CAST({_quote(c)} AS ENUM({', '.join(_literal(v) for v in values)})) AS {_quote(c)}"
+        for c, values in zip(candidates, value_lists)
+        if values and len(values) <= ENUM_MAX_VALUES
+    }
+    if casts:
+        con.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * REPLACE ({', '.join(casts.values())}) FROM {table}")
+    return list(casts)
+
+
+def enum_values(column_type: str) -> Optional[list]:
+    """
+    Values of an ENUM column type as reported by DESCRIBE.
+    
+    Args:
+        column_type: DuckDB type string, e.g. "ENUM('East', 'North')"
+        
+    Returns:
+        List of values, or None if the type is not an ENUM
+    """
+    if not column_type.startswith("ENUM("):
+        return None
+    return [value.replace("''", "'") for value in re.findall(r"'((?:[^']|'')*)'", column_type)]
+
+
+def register_tables(con: Any, catalog: dict = TABLE_CATALOG) -> list:
+    """
+    Load the catalog tables into DuckDB with typed columns and indexes.
+    
+    Tables whose source file does not exist are skipped.
+    
+    Args:
+        con: DuckDB connection object
+        catalog: Table name -> table specification (see TABLE_CATALOG)
+        
+    Returns:
+        List of registered table names
+    """
+    registered = []
+    for table, spec in catalog.items():
+        if not os.path.exists(spec["path"]):
+            continue
+        
+        if spec["columns"]:
+            source = "read_csv($path, header = true, columns = $columns)"
+            params = {"path": spec["path"], "columns": spec["columns"]}
+        else:
+            source = "read_csv_auto($path)"
+            params = {"path": spec["path"]}
+        order_by = f"ORDER BY {spec['sort_by']}" if spec.get("sort_by") else ""
+        con.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM {source} {order_by}", params)
+        apply_enum_types(con, table)
+        
+        columns = {row[0] for row in con.execute(f"DESCRIBE {table}").fetchall()}
+        for column in spec.get("indexes", []):
+            if column in columns:
+                con.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ({column})")
+        registered.append(table)
+    
+    return registered
+
+
+def describe_tables(con: Any, catalog: dict = TABLE_CATALOG) -> dict:
+    """
+    Collect descriptions and column types of the registered tables.
+    
+    Args:
+        con: DuckDB connection object
+        catalog: Table name -> table specification (see TABLE_CATALOG)
+        
+    Returns:
+        Dictionary of table name -> {"description": str, "columns": [(name, type, note)],
+        "values": {column: [values]}}. ENUM columns are reported as type "ENUM"
+        with their values under "values".
+    """
+    tables = {"sales": {"description": SALES_DESCRIPTION, "notes": SALES_NOTES}}
+    tables.update(catalog)
+    existing = {row[0] for row in con.execute("SHOW TABLES").fetchall()}
+    
+    described = {}
+    for table, spec in tables.items():
+        if table not in existing:
+            continue
+        columns = []
+        values = {}
+        for name, column_type, *_ in con.execute(f"DESCRIBE {table}").fetchall():
+            enum = enum_values(column_type)
+            if enum is not None:
+                column_type = "ENUM"
+                values[name] = enum
+            columns.append((name, column_type, spec["notes"].get(name)))
+        described[table] = {"description": spec["description"], "columns": columns, "values": values}
+    
+    return described
+
+
+def get_schema_prompt(con: Any, catalog: dict = TABLE_CATALOG) -> str:
+    """
+    Describe all registered tables for the SQL generation prompt.
+    
+    Args:
+        con: DuckDB connection object
+        catalog: Table name -> table specification (see TABLE_CATALOG)
+        
+    Returns:
+        Schema description text (one block per table plus join keys)
+    """
+    described = describe_tables(con, catalog)
+    
+    lines = []
+    for table, info in described.items():
+        columns = []
+        for name, column_type, note in info["columns"]:
+            if not note and name in info["values"]:
+                note = ", ".join(_literal(value) for value in info["values"][name])
+            columns.append(f"{name} ({column_type}: {note})" if note else f"{name} ({column_type})")
+        lines.append(f"- {table}: {info['description']}")
+        lines.append(f"  列: {', '.join(columns)}")
+    
+    joins = [hint for hint in JOIN_HINTS if all(part.split('.')[0] in described for part in hint.split(' = '))]
+    if joins:
+        lines.append("- 結合キー: " + ", ".join(joins))
+    
+    return "\n".join(lines)
+
+
+def load_database(csv_path: str = "data/sample_sales.csv", catalog: dict = TABLE_CATALOG) -> Any:
+    """
+    Build a new in-memory DuckDB database with the sales table and the catalog tables.
+    
+    Low-cardinality text columns are stored as ENUMs (see apply_enum_types)
+    and month as a DATE (first day of the month).
     
     Args:
         csv_path: Path to the CSV file containing sales data
+        catalog: Table name -> table specification (see TABLE_CATALOG)
         
     Returns:
-        DuckDB connection object
+        DuckDB connection object (raises on failure)
+    """
+    con = duckdb.connect(":memory:")
+    
+    # Read the CSV in DuckDB (no pandas object columns); date is a real DATE so
+    # range filters can be pushed down, month is the first day of the month
+    con.execute("""
+        CREATE TABLE sales AS
+        SELECT
+            * REPLACE (CAST(date AS DATE) AS date),
+            CAST(date_trunc('month', CAST(date AS DATE)) AS DATE) AS month
+        FROM read_csv($path, header = true)
+    """, {"path": csv_path})
+    
+    # Dictionary-encode category, region, sales_channel and customer_segment
+    apply_enum_types(con, "sales")
+    
+    # Register the other tables the chatbot can join
+    register_tables(con, catalog)
+    
+    return con
+
+
+def is_read_only(con: Any) -> bool:
+    """Whether the connection's database is attached read-only (a shared snapshot)."""
+    return con.cursor().execute(
+        "SELECT readonly FROM duckdb_databases() WHERE database_name = current_database()"
+    ).fetchone()[0]
+
+
+def publish_snapshot(con: Any, directory: str = SNAPSHOT_DIR, keep: int = 2) -> str:
     """
+    Write the database to a new snapshot file and make it the current one.
+    
+    Readers only open files named in the pointer file, which is replaced
+    atomically after the snapshot is complete. Older snapshots beyond ``keep``
+    are deleted; workers still reading one keep their open handle.
+    
+    Args:
+        con: DuckDB connection with the tables to publish (derived tables included)
+        directory: Snapshot directory (the pointer file is SNAPSHOT_POINTER in it)
+        keep: Number of snapshot files to keep
+        
+    Returns:
+        Path of the pointer file
+    """
+    os.makedirs(directory, exist_ok=True)
+    name = f"snapshot-{time.time_ns()}.duckdb"
+    source = con.execute("SELECT current_database()").fetchone()[0]
+    con.execute(f"ATTACH {_literal(os.path.join(directory, name))} AS snapshot")
     try:
-        # Read CSV data
-        df = pd.read_csv(csv_path)
+        con.execute(f"COPY FROM DATABASE {_quote(source)} TO snapshot")
+        con.execute("CHECKPOINT snapshot")
+    finally:
+        con.execute("DETACH snapshot")
+    
+    pointer = os.path.join(directory, SNAPSHOT_POINTER)
+    with open(pointer + ".tmp", "w") as f:
+        f.write(name)
+    os.replace(pointer + ".tmp", pointer)
+    
+    snapshots = sorted(f for f in os.listdir(directory) if f.startswith("snapshot-") and f.endswith(".duckdb"))
+    for old in snapshots[:-keep]:
+        try:
+            os.remove(os.path.join(directory, old))
+        except OSError:
+            pass
+    return pointer
+
+
+def open_snapshot(pointer: str) -> Any:
+    """
+    Attach read-only to the snapshot named in a pointer file.
+    
+    Any number of processes can open the same file read-only. Pages are read
+    through the OS page cache, so workers share one copy of the data in
+    memory; each worker's own buffer pool can be capped with DUCKDB_MEMORY_LIMIT.
+    
+    Args:
+        pointer: Pointer file written by publish_snapshot
+        
+    Returns:
+        Read-only DuckDB connection object
+    """
+    with open(pointer) as f:
+        name = f.read().strip()
+    config = {"memory_limit": SNAPSHOT_MEMORY_LIMIT} if SNAPSHOT_MEMORY_LIMIT else {}
+    return duckdb.connect(os.path.join(os.path.dirname(pointer), name), read_only=True, config=config)
+
+
+class LiveConnection:
+    """
+    DuckDB connection that reloads its data in the background when the source files change.
+    
+    Behaves like the wrapped connection (cursor(), execute(), ...). A watcher
+    thread polls the files; after a change has settled, a complete new
+    database is built off the request path, reload hooks prepare derived
+    tables on it, and only then is the connection reference swapped. Queries
+    already running keep their cursor on the previous snapshot, so nothing
+    blocks and nothing sees a half-loaded table. The old snapshot is freed
+    when its last cursor is gone.
+    
+    ``data_key`` identifies the loaded files (path, inode, mtime and size), so
+    processes watching the same files agree on it; shared caches use it to
+    tell data versions apart.
+    """
+    
+    def __init__(self, loader: Callable[[], Any], paths: list, interval: float = RELOAD_INTERVAL):
+        """
+        Args:
+            loader: Builds and returns a new DuckDB connection (raises on failure)
+            paths: Files to watch
+            interval: Seconds between checks (0 disables watching)
+        """
+        self._loader = loader
+        self.paths = list(paths)
+        self._con = loader()
+        self._signature = self._stat()
+        self._seen = self._signature
+        self.data_key = _signature_key(self._signature)
+        self._hooks = []
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.version = 1
+        self.loaded_at = time.time()
+        self.last_error = None
+        
+        if interval > 0:
+            # The thread only holds a weak reference, so it ends once the connection is dropped
+            threading.Thread(target=_watch, args=(weakref.ref(self), interval, self._stop),
+                             name="data-reloader", daemon=True).start()
+    
+    def __getattr__(self, name):
+        return getattr(self._con, name)
+    
+    def cursor(self):
+        return self._con.cursor()
+    
+    def add_reload_hook(self, hook: Callable[[Any], None]):
+        """
+        Run ``hook(new_connection)`` on every reloaded database before it goes live.
         
-        # Create DuckDB connection
-        con = duckdb.connect(":memory:")
+        Use it to rebuild derived tables or caches so the first query after a
+        swap does not pay for them. Hooks are not run on the current database.
+        """
+        self._hooks.append(hook)
+    
+    def _stat(self) -> tuple:
+        signature = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_ino, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((path, None, None, None))
+        return tuple(signature)
+    
+    def check(self) -> bool:
+        """
+        Reload if the files changed and have not changed since the previous check.
         
-        # Add month column (YYYY-MM format)
-        df['month'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m')
+        Returns:
+            True if a new snapshot went live
+        """
+        signature = self._stat()
+        if signature == self._signature:
+            self._seen = signature
+            return False
+        if signature != self._seen:
+            # Still being written; wait for the next check
+            self._seen = signature
+            return False
+        return self.reload(signature)
+    
+    def reload(self, signature: Optional[tuple] = None) -> bool:
+        """
+        Build a new snapshot and swap it in (failures keep the current one).
         
-        # Create table in DuckDB
-        con.execute("CREATE TABLE sales AS SELECT * FROM df")
+        Returns:
+            True if a new snapshot went live
+        """
+        with self._reload_lock:
+            signature = signature or self._stat()
+            try:
+                con = self._loader()
+                for hook in self._hooks:
+                    hook(con)
+            except Exception as e:
+                self.last_error = str(e)
+                # Do not retry the same broken files on every check
+                self._signature = signature
+                return False
+            
+            self._con = con
+            self._signature = signature
+            self.data_key = _signature_key(signature)
+            self.version += 1
+            self.loaded_at = time.time()
+            self.last_error = None
+            return True
+    
+    def close(self):
+        self._stop.set()
+        self._con.close()
+
+
+def _signature_key(signature: tuple) -> str:
+    return hashlib.sha1(repr(signature).encode()).hexdigest()[:16]
+
+
+def _watch(ref: "weakref.ref", interval: float, stop: threading.Event):
+    while not stop.wait(interval):
+        live = ref()
+        if live is None:
+            return
+        live.check()
+        del live
+
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def init_db(csv_path: str = "data/sample_sales.csv") -> Any:
+    """
+    Initialize DuckDB connection and create the sales table with derived month column.
+    
+    The orders and users tables from TABLE_CATALOG are registered as well
+    when their files exist. The returned connection reloads itself when the
+    files change (see LiveConnection and DATA_RELOAD_INTERVAL). When
+    DATA_SNAPSHOT is set the shared read-only snapshot is attached instead.
+    One connection per csv_path is shared by the whole process.
+    
+    Args:
+        csv_path: Path to the CSV file containing sales data
+        
+    Returns:
+        DuckDB connection object
         
+    Raises:
+        Exception: If the data cannot be loaded
+    """
+    with _databases_lock:
+        con = _databases.get(csv_path)
+        if con is None:
+            if DATA_SNAPSHOT:
+                con = LiveConnection(lambda: open_snapshot(DATA_SNAPSHOT), [DATA_SNAPSHOT])
+            else:
+                paths = [csv_path] + [spec["path"] for spec in TABLE_CATALOG.values()]
+                con = LiveConnection(lambda: load_database(csv_path), paths)
+            _databases[csv_path] = con
         return con
+
+
+def clear_db_cache():
+    """Forget the connections made by init_db so the next call loads the data again."""
+    with _databases_lock:
+        _databases.clear()
+
+
+def run_query(con: Any, sql: str) -> pd.DataFrame:
+    """
+    Execute SQL query and return results as DataFrame, raising on failure.
+    
+    Args:
+        con: DuckDB connection object
+        sql: SQL query string to execute
+        
+    Returns:
+        DataFrame containing query results
+    """
+    if con is None:
+        raise Exception("Database connection is not initialized")
+    
+    return con.cursor().execute(sql).fetchdf()
+
+
+# Appended by enforce_limit to the LIMIT it adds, so the cap can be told apart
+# from a LIMIT the question asked for
+ROW_CAP_MARKER = "/* row cap */"
+
+
+def remove_row_cap(sql: str) -> str:
+    """
+    Drop the safety LIMIT added by enforce_limit so a paged view can browse every row.
+    
+    Only a trailing LIMIT carrying ROW_CAP_MARKER is removed; any other LIMIT
+    (e.g. "top 3", or LIMIT 1000 written by the model) is part of the query
+    and is kept.
+    """
+    return re.sub(rf"\s+LIMIT\s+\d+\s*{re.escape(ROW_CAP_MARKER)}\s*;?\s*$", "", sql.strip(), flags=re.IGNORECASE)
+
+
+def _like_pattern(text: str) -> str:
+    # Match the text literally: escape the LIKE wildcards and the escape character
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _page_source(sql: str, columns: list, search: Optional[str]) -> tuple:
+    # The query runs as a subquery; the filter matches any column, as text
+    source = f"SELECT * FROM ({sql.strip().rstrip(';')}) AS result"
+    if not search:
+        return source, {}
+    matches = " OR ".join(f"CAST({_quote(column)} AS VARCHAR) ILIKE $search ESCAPE '\\'" for column in columns)
+    return f"{source} WHERE {matches}", {"search": _like_pattern(search)}
+
+
+def count_rows(con: Any, sql: str, columns: list, search: Optional[str] = None) -> int:
+    """
+    Number of rows a query returns, after the page filter.
+    
+    Args:
+        con: DuckDB connection object
+        sql: SELECT query
+        columns: Result columns (searched by the filter)
+        search: Text to look for in any column (case-insensitive)
         
-    except Exception as e:
-        st.error(f"Failed to initialize database: {str(e)}")
+    Returns:
+        Row count
+    """
+    source, params = _page_source(sql, columns, search)
+    return con.cursor().execute(f"SELECT COUNT(*) FROM ({source})", params).fetchone()[0]
+
+
+def query_page(con: Any, sql: str, columns: list, page: int = 0, page_size: int = 100,
+               sort_by: Optional[str] = None, descending: bool = False,
+               search: Optional[str] = None) -> pd.DataFrame:
+    """
+    Fetch one page of a query's result, sorted and filtered in DuckDB.
+    
+    Only the page is transferred to pandas, so results of any size can be
+    browsed. Pages use LIMIT/OFFSET; a sort adds the other columns as
+    tie-breakers so rows do not move between pages.
+    
+    Args:
+        con: DuckDB connection object
+        sql: SELECT query
+        columns: Result columns (sort keys and filter targets are checked against them)
+        page: Zero-based page number
+        page_size: Rows per page
+        sort_by: Column to sort by (the query's own order if omitted)
+        descending: Sort in descending order
+        search: Text to look for in any column (case-insensitive)
+        
+    Returns:
+        DataFrame with at most page_size rows
+    """
+    source, params = _page_source(sql, columns, search)
+    order_by = ""
+    if sort_by is not None:
+        if sort_by not in columns:
+            raise ValueError(f"Unknown sort column: {sort_by}")
+        keys = [f"{_quote(sort_by)} {'DESC' if descending else 'ASC'} NULLS LAST"]
+        keys += [_quote(column) for column in columns if column != sort_by]
+        order_by = "ORDER BY " + ", ".join(keys)
+    params.update({"limit": int(page_size), "offset": int(page) * int(page_size)})
+    return con.cursor().execute(f"{source} {order_by} LIMIT $limit OFFSET $offset", params).fetchdf()
+
+
+def validate_sql(con: Any, sql: str) -> Optional[str]:
+    """
+    Check that a query parses and binds (tables, columns, types) without running it.
+    
+    Args:
+        con: DuckDB connection object
+        sql: SQL query string to check
+        
+    Returns:
+        DuckDB error message, or None if the query is valid
+    """
+    try:
+        con.cursor().execute(f"EXPLAIN {sql.strip().rstrip(';')}")
         return None
+    except duckdb.Error as e:
+        return str(e)
 
 
 def query_df(con: Any, sql: str) -> pd.DataFrame:
@@ -44,17 +639,13 @@ def query_df(con: Any, sql: str) -> pd.DataFrame:
         sql: SQL query string to execute
         
     Returns:
-        DataFrame containing query results
+        DataFrame containing query results, empty if the query failed
+        (use run_query to get the error)
     """
     try:
-        if con is None:
-            raise Exception("Database connection is not initialized")
-            
-        result = con.execute(sql).fetchdf()
-        return result
+        return run_query(con, sql)
         
-    except Exception as e:
-        st.error(f"Failed to execute query: {str(e)}")
+    except Exception:
         return pd.DataFrame()
 
 
@@ -62,51 +653,53 @@ def get_data_summary(con: Any) -> dict:
     """
     Get summary information about the sales data.
     
+    Runs on its own cursor, so it is safe next to other threads using the
+    connection (the loader, reload hooks and the warm-up).
+    
     Args:
         con: DuckDB connection object
         
     Returns:
         Dictionary containing summary statistics
+        
+    Raises:
+        duckdb.Error: If the sales table cannot be read
     """
     if con is None:
         return {}
-        
-    try:
-        summary = {}
-        
-        # Total records
-        total_records = con.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
-        summary['total_records'] = total_records
-        
-        # Date range
-        date_range = con.execute("SELECT MIN(date) as min_date, MAX(date) as max_date FROM sales").fetchone()
-        summary['date_range'] = {
-            'min_date': date_range[0],
-            'max_date': date_range[1]
-        }
-        
-        # Categories
-        categories = con.execute("SELECT DISTINCT category FROM sales ORDER BY category").fetchall()
-        summary['categories'] = [cat[0] for cat in categories]
-        
-        # Regions
-        regions = con.execute("SELECT DISTINCT region FROM sales ORDER BY region").fetchall()
-        summary['regions'] = [region[0] for region in regions]
-        
-        # Sales channels
-        channels = con.execute("SELECT DISTINCT sales_channel FROM sales ORDER BY sales_channel").fetchall()
-        summary['sales_channels'] = [channel[0] for channel in channels]
-        
-        # Customer segments
-        segments = con.execute("SELECT DISTINCT customer_segment FROM sales ORDER BY customer_segment").fetchall()
-        summary['customer_segments'] = [segment[0] for segment in segments]
-        
-        # Total revenue
-        total_revenue = con.execute("SELECT SUM(revenue) FROM sales").fetchone()[0]
-        summary['total_revenue'] = total_revenue
-        
-        return summary
-        
-    except Exception as e:
-        st.error(f"Failed to get data summary: {str(e)}")
-        return {}
\ No newline at end of file
+    
+    cur = con.cursor()
+    summary = {}
+    
+    # Total records
+    total_records = cur.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+    summary['total_records'] = total_records
+    
+    # Date range
+    date_range = cur.execute("SELECT MIN(date) as min_date, MAX(date) as max_date FROM sales").fetchone()
+    summary['date_range'] = {
+        'min_date': date_range[0],
+        'max_date': date_range[1]
+    }
+    
+    # Categories
+    categories = cur.execute("SELECT DISTINCT category FROM sales ORDER BY category").fetchall()
+    summary['categories'] = [cat[0] for cat in categories]
+    
+    # Regions
+    regions = cur.execute("SELECT DISTINCT region FROM sales ORDER BY region").fetchall()
+    summary['regions'] = [region[0] for region in regions]
+    
+    # Sales channels
+    channels = cur.execute("SELECT DISTINCT sales_channel FROM sales ORDER BY sales_channel").fetchall()
+    summary['sales_channels'] = [channel[0] for channel in channels]
+    
+    # Customer segments
+    segments = cur.execute("SELECT DISTINCT customer_segment FROM sales ORDER BY customer_segment").fetchall()
+    summary['customer_segments'] = [segment[0] for segment in segments]
+    
+    # Total revenue
+    total_revenue = cur.execute("SELECT SUM(revenue) FROM sales").fetchone()[0]
+    summary['total_revenue'] = total_revenue
+    
+    return summary
\ No newline at end of file
@@ -64,6 +64,15 @@ FALLBACKS = {
     """
 }
 
+# Sample questions offered in the chatbot sidebar (answered ahead of time by warmup.py)
+SAMPLE_QUESTIONS = [
+    "月ごとのカテゴリ別売上を見せて",
+    "チャネル別の売上合計は？",
+    "地域ごとの売上を教えて",
+    "2025年1月の売上トップ3カテゴリは？",
+    "平均単価をチャネル別に分析して"
+]
+
 # Keywords to match user questions to fallback queries
 FALLBACK_KEYWORDS = {
     "月毎のカテゴリー別の売り上げ": [
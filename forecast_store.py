@@ -0,0 +1,157 @@
+"""
+Local history of hourly weather forecasts.
+
+Every fetched forecast is appended to a DuckDB table keyed by
+(city, time, issued_at), so later fetches keep the earlier series and
+forecast drift can be analysed. Open-Meteo does not report when a forecast
+was issued; the fetch time truncated to the hour is used instead, which
+matches the hourly forecast cache in weather_client.py. Re-appending the same
+forecast within the hour inserts nothing (INSERT OR IGNORE on the key).
+
+Rows are appended in time order, so DuckDB's per-block min/max statistics
+keep range queries on time cheap without scanning the whole table.
+"""
+
+import os
+import threading
+from typing import Optional
+
+import duckdb
+import pandas as pd
+
+from weather_client import TIMEZONE
+
+
+STORE_PATH = ".cache/forecast_history.duckdb"
+COLUMNS = ["city", "time", "issued_at", "temperature"]
+
+
+def current_issue_time() -> pd.Timestamp:
+    """The current hour in the forecast timezone (naive, like the API times)."""
+    return pd.Timestamp.now(tz=TIMEZONE).floor("h").tz_localize(None)
+
+
+class ForecastStore:
+    """Append-only forecast history in a DuckDB file."""
+
+    def __init__(self, path: Optional[str] = STORE_PATH):
+        """
+        Args:
+            path: DuckDB database file (None keeps the history in memory).
+                Only one process can open the file for writing at a time.
+        """
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._con = duckdb.connect(path or ":memory:")
+        self._lock = threading.Lock()
+        self._con.execute("""
+            CREATE TABLE IF NOT EXISTS forecasts (
+                city VARCHAR NOT NULL,
+                time TIMESTAMP NOT NULL,
+                issued_at TIMESTAMP NOT NULL,
+                temperature DOUBLE,
+                PRIMARY KEY (city, time, issued_at)
+            )
+        """)
+
+    def append(self, df: pd.DataFrame, issued_at: Optional[pd.Timestamp] = None) -> int:
+        """
+        Append forecasts, skipping rows already stored.
+
+        Args:
+            df: DataFrame with city, time and temperature columns
+                (e.g. WeatherClient.fetch_many output)
+            issued_at: Issue time of the forecasts (defaults to the current hour)
+
+        Returns:
+            Number of rows inserted
+        """
+        if df.empty:
+            return 0
+        rows = pd.DataFrame({
+            "city": df["city"].astype(str).to_numpy(),
+            "time": pd.to_datetime(df["time"]).to_numpy(),
+            "issued_at": issued_at if issued_at is not None else current_issue_time(),
+            "temperature": df["temperature"].astype(float).to_numpy(),
+        }).sort_values(["time", "city"])
+
+        with self._lock:
+            cursor = self._con.cursor()
+            cursor.register("new_forecasts", rows)
+            inserted = cursor.execute(
+                f"INSERT OR IGNORE INTO forecasts SELECT {', '.join(COLUMNS)} FROM new_forecasts"
+            ).fetchone()[0]
+            cursor.unregister("new_forecasts")
+        return int(inserted)
+
+    def append_series(self, city: str, times: list, temperatures: list,
+                      issued_at: Optional[pd.Timestamp] = None) -> int:
+        """
+        Append one city's forecast as returned by WeatherClient.get_weather_data.
+
+        Args:
+            city: City name
+            times: Forecast times
+            temperatures: Temperatures
+            issued_at: Issue time of the forecast (defaults to the current hour)
+
+        Returns:
+            Number of rows inserted
+        """
+        return self.append(pd.DataFrame({"city": city, "time": times, "temperature": temperatures}), issued_at)
+
+    def history(self, cities: Optional[list] = None, start: Optional[pd.Timestamp] = None,
+                end: Optional[pd.Timestamp] = None, latest_only: bool = False) -> pd.DataFrame:
+        """
+        Stored forecasts for a time range.
+
+        Args:
+            cities: Cities to include (all if omitted)
+            start: First forecast time (inclusive)
+            end: Last forecast time (inclusive)
+            latest_only: Keep only the most recent issue for each city and time
+
+        Returns:
+            DataFrame with city, time, issued_at and temperature, ordered by city and time
+        """
+        conditions, params = [], []
+        if cities:
+            conditions.append(f"city IN ({', '.join('?' for _ in cities)})")
+            params.extend(cities)
+        if start is not None:
+            conditions.append("time >= ?")
+            params.append(pd.Timestamp(start).to_pydatetime())
+        if end is not None:
+            conditions.append("time <= ?")
+            params.append(pd.Timestamp(end).to_pydatetime())
+
+        sql = f"SELECT {', '.join(COLUMNS)} FROM forecasts"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        if latest_only:
+            sql += " QUALIFY row_number() OVER (PARTITION BY city, time ORDER BY issued_at DESC) = 1"
+        sql += " ORDER BY city, time, issued_at"
+        return self._con.cursor().execute(sql, params).fetchdf()
+
+    def issues(self) -> pd.DataFrame:
+        """
+        Summary of the stored history per city.
+
+        Returns:
+            DataFrame with city, issues, rows, first_time and last_time
+        """
+        return self._con.cursor().execute("""
+            SELECT
+                city,
+                COUNT(DISTINCT issued_at) AS issues,
+                COUNT(*) AS rows,
+                MIN(time) AS first_time,
+                MAX(time) AS last_time
+            FROM forecasts
+            GROUP BY city
+            ORDER BY city
+        """).fetchdf()
+
+    def close(self):
+        self._con.close()
@@ -0,0 +1,199 @@
+"""
+Fulfillment-latency analytics over the order timestamps in orders.csv.
+
+Ship (created -> shipped), deliver (shipped -> delivered) and return
+(delivered -> returned) latencies are summarized per month and status with
+mergeable quantile sketches, so p50/p95/p99 are available for the full order
+history without keeping per-order arrays in memory. Sketches are persisted and
+updated incrementally as orders are appended to the CSV.
+"""
+
+import math
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from order_metrics import ORDERS_CSV, STATE_VERSION, AppendOnlyCsvReader, JsonStateFile
+
+
+STATE_PATH = ".cache/orders_fulfillment_latency.json"
+
+# Latency metric -> (start timestamp, end timestamp)
+LATENCY_METRICS = {
+    "ship_hours": ("created_at", "shipped_at"),
+    "deliver_hours": ("shipped_at", "delivered_at"),
+    "return_hours": ("delivered_at", "returned_at"),
+}
+TIMESTAMP_COLUMNS = ["created_at", "shipped_at", "delivered_at", "returned_at"]
+
+QUANTILES = {"p50": 0.50, "p95": 0.95, "p99": 0.99}
+
+
+class LatencySketch:
+    """
+    Mergeable quantile sketch with bounded relative error.
+
+    Values are counted in logarithmically sized buckets (as in DDSketch), so
+    every quantile estimate is within ``relative_accuracy`` of the true value
+    and two sketches merge by adding bucket counts. Values <= ``min_value``
+    are counted as zero.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-3):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.zero_count = 0
+        self.bins = {}
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.bins.values())
+
+    def add(self, values) -> None:
+        """Add an array of values (NaN values are ignored)."""
+        values = np.asarray(values, dtype="float64")
+        values = values[~np.isnan(values)]
+        positive = values[values > self.min_value]
+        self.zero_count += int(len(values) - len(positive))
+        if len(positive) == 0:
+            return
+        keys, counts = np.unique(np.ceil(np.log(positive) / self._log_gamma).astype("int64"), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.bins[key] = self.bins.get(key, 0) + count
+
+    def merge(self, other: "LatencySketch") -> None:
+        """Add the counts of another sketch with the same accuracy."""
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        self.zero_count += other.zero_count
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the q-quantile (0 <= q <= 1), or None if the sketch is empty."""
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def to_dict(self) -> dict:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "min_value": self.min_value,
+            "zero_count": self.zero_count,
+            "bins": {str(key): count for key, count in self.bins.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencySketch":
+        sketch = cls(data["relative_accuracy"], data["min_value"])
+        sketch.zero_count = data["zero_count"]
+        sketch.bins = {int(key): count for key, count in data["bins"].items()}
+        return sketch
+
+
+def latency_hours(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compute latency columns (hours) and the order month, vectorized.
+
+    Args:
+        df: Orders with ``status`` and the timestamp columns (as strings)
+
+    Returns:
+        DataFrame with month, status and one column per LATENCY_METRICS entry
+    """
+    timestamps = {col: pd.to_datetime(df[col], format="%Y-%m-%d %H:%M:%S") for col in TIMESTAMP_COLUMNS}
+    result = pd.DataFrame({
+        "month": df["created_at"].str.slice(0, 7),
+        "status": df["status"],
+    })
+    for metric, (start_col, end_col) in LATENCY_METRICS.items():
+        result[metric] = (timestamps[end_col] - timestamps[start_col]).dt.total_seconds() / 3600
+    return result
+
+
+class FulfillmentLatency:
+    """Per (month, status, metric) latency sketches updated incrementally from orders.csv."""
+
+    def __init__(self, csv_path: str = ORDERS_CSV, state_path: Optional[str] = STATE_PATH):
+        self._state_file = JsonStateFile(state_path)
+        self._lock = threading.Lock()
+        state = self._state_file.load() or {}
+        self._reader = AppendOnlyCsvReader(csv_path, state.get("reader"))
+        self._sketches = {}
+        if state.get("reader") == self._reader.state:
+            self._sketches = {
+                tuple(key.split("|")): LatencySketch.from_dict(data)
+                for key, data in state.get("sketches", {}).items()
+            }
+
+    def refresh(self) -> int:
+        """
+        Fold orders appended since the last refresh into the sketches.
+
+        Returns:
+            Number of orders read
+        """
+        with self._lock:
+            if self._reader.prepare():
+                self._sketches = {}
+
+            rows = 0
+            for df in self._reader.read_appended(usecols=["status"] + TIMESTAMP_COLUMNS):
+                rows += len(df)
+                latencies = latency_hours(df)
+                for (month, status), group in latencies.groupby(["month", "status"], sort=False):
+                    for metric in LATENCY_METRICS:
+                        values = group[metric].to_numpy()
+                        if np.isnan(values).all():
+                            continue
+                        self._sketches.setdefault((month, status, metric), LatencySketch()).add(values)
+
+            if rows:
+                self._state_file.save({
+                    "version": STATE_VERSION,
+                    "reader": self._reader.state,
+                    "sketches": {"|".join(key): sketch.to_dict() for key, sketch in self._sketches.items()},
+                })
+            return rows
+
+    def summary(self, by_status: bool = True) -> pd.DataFrame:
+        """
+        Get latency quantiles per month (and status).
+
+        Args:
+            by_status: If False, sketches of all statuses are merged per month
+
+        Returns:
+            DataFrame with month, [status,] metric, orders and p50/p95/p99 (hours)
+        """
+        with self._lock:
+            merged = {}
+            for (month, status, metric), sketch in self._sketches.items():
+                key = (month, status, metric) if by_status else (month, metric)
+                if key not in merged:
+                    merged[key] = LatencySketch(sketch.relative_accuracy, sketch.min_value)
+                merged[key].merge(sketch)
+
+        key_columns = ["month", "status", "metric"] if by_status else ["month", "metric"]
+        records = []
+        for key, sketch in merged.items():
+            record = dict(zip(key_columns, key))
+            record["orders"] = sketch.count
+            for name, q in QUANTILES.items():
+                record[name] = sketch.quantile(q)
+            records.append(record)
+        summary = pd.DataFrame(records, columns=key_columns + ["orders"] + list(QUANTILES))
+        return summary.sort_values(key_columns).reset_index(drop=True)
@@ -0,0 +1,247 @@
+"""
+Statistical insights for query results, computed in one DuckDB query.
+
+For the main measure of a result (revenue-like columns first, otherwise the
+first numeric column) a single aggregate query returns the total, the top-k
+contributors with their share, how many groups make up 80% of the total
+(Pareto concentration), the change of the latest period against the previous
+one and robust outliers (modified z-score from the median absolute
+deviation). Groups come from the first text column, periods from a
+month/date-like column. When a result has both, outliers are scored within
+each group, so a month stands out against the same category's other months
+rather than against other categories.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+import duckdb
+import pandas as pd
+
+
+TOP_K = 3
+PARETO_SHARE = 0.8
+# Modified z-score above which a value is reported as an outlier
+OUTLIER_Z = 3.5
+MAX_OUTLIERS = 3
+# Values needed (per group when scoring within groups) before outliers are reported
+MIN_OUTLIER_ROWS = 8
+
+# Preferred measure columns, in order
+MEASURE_PATTERNS = [re.compile(p) for p in (r"revenue|sales|amount", r"units|quantity", r"orders|count|total")]
+CURRENCY_PATTERN = re.compile(r"revenue|sales|amount|price")
+TIME_PATTERN = re.compile(r"^(month|date|day|week|year|period|year_month)$|_(at|date|month|day)$")
+# Numeric columns that are identifiers or calendar parts, not measures
+NON_MEASURE_PATTERN = re.compile(r"(^|_)(id|year|month|day|week|hour)$")
+
+# One in-memory database for all results; each call works on its own cursor
+_con = duckdb.connect()
+
+
+@dataclass
+class InsightStats:
+    """Statistics of one measure column."""
+
+    rows: int
+    measure: Optional[str] = None
+    group_column: Optional[str] = None
+    period_column: Optional[str] = None
+    total: Optional[float] = None
+    groups: int = 0
+    top: list = field(default_factory=list)  # [{"key", "total", "share"}]
+    pareto_groups: Optional[int] = None
+    latest: Optional[dict] = None  # {"period", "total", "previous_period", "previous"}
+    outliers: list = field(default_factory=list)  # [{"key", "period", "value", "z"}]
+
+
+def _quote(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def pick_columns(df: pd.DataFrame) -> tuple:
+    """
+    Choose the measure, group and period columns of a result.
+
+    Args:
+        df: Query results DataFrame
+
+    Returns:
+        Tuple of (measure, group_column, period_column); any can be None
+    """
+    period_column = next(
+        (c for c in df.columns
+         if pd.api.types.is_datetime64_any_dtype(df[c]) or TIME_PATTERN.search(str(c).lower())),
+        None,
+    )
+    numeric = [c for c in df.select_dtypes(include=["number"]).columns
+               if c != period_column and not NON_MEASURE_PATTERN.search(str(c).lower())]
+    measure = next(
+        (c for pattern in MEASURE_PATTERNS for c in numeric if pattern.search(str(c).lower())),
+        numeric[0] if numeric else None,
+    )
+    group_column = next(
+        (c for c in df.select_dtypes(include=["object", "string", "category"]).columns if c != period_column),
+        None,
+    )
+    return measure, group_column, period_column
+
+
+def compute_insights(df: pd.DataFrame, top_k: int = TOP_K) -> InsightStats:
+    """
+    Compute the insight statistics of a result with one DuckDB query.
+
+    Args:
+        df: Query results DataFrame
+        top_k: Number of top contributors
+
+    Returns:
+        InsightStats (only rows is set when the result has no numeric measure)
+    """
+    measure, group_column, period_column = pick_columns(df)
+    stats = InsightStats(rows=len(df), measure=measure, group_column=group_column, period_column=period_column)
+    if measure is None or df.empty:
+        return stats
+
+    # Groups are the text column if there is one, otherwise the periods
+    key_column = group_column or period_column
+    key = f"CAST({_quote(key_column)} AS VARCHAR)" if key_column else "NULL"
+    period = _quote(period_column) if period_column else "NULL"
+    outlier_window = "PARTITION BY key" if group_column and period_column else ""
+
+    sql = f"""
+        WITH base AS (
+            SELECT {key} AS key, {period} AS period, CAST({_quote(measure)} AS DOUBLE) AS value
+            FROM result
+            WHERE {_quote(measure)} IS NOT NULL
+        ),
+        grouped AS (
+            SELECT key, SUM(value) AS total FROM base WHERE key IS NOT NULL GROUP BY key
+        ),
+        ranked AS (
+            SELECT
+                key,
+                total,
+                total / NULLIF(SUM(total) OVER (), 0) AS share,
+                SUM(total) OVER (ORDER BY total DESC ROWS UNBOUNDED PRECEDING)
+                    / NULLIF(SUM(total) OVER (), 0) AS cumulative_share,
+                row_number() OVER (ORDER BY total DESC) AS rank
+            FROM grouped
+        ),
+        periods AS (
+            SELECT
+                period,
+                SUM(value) AS total,
+                lag(period) OVER (ORDER BY period) AS previous_period,
+                lag(SUM(value)) OVER (ORDER BY period) AS previous
+            FROM base
+            WHERE period IS NOT NULL
+            GROUP BY period
+        ),
+        spread AS (
+            SELECT
+                key,
+                period,
+                value,
+                median(value) OVER ({outlier_window}) AS median,
+                mad(value) OVER ({outlier_window}) AS mad,
+                COUNT(*) OVER ({outlier_window}) AS n
+            FROM base
+        ),
+        scored AS (
+            -- 0.6745 scales the MAD to a standard deviation for normal data
+            SELECT key, CAST(period AS VARCHAR) AS period, value, 0.6745 * (value - median) / NULLIF(mad, 0) AS z
+            FROM spread
+            WHERE n >= {MIN_OUTLIER_ROWS}
+        )
+        SELECT
+            (SELECT SUM(value) FROM base) AS total,
+            (SELECT COUNT(*) FROM grouped) AS groups,
+            (SELECT list(struct_pack(key := key, total := total, share := share) ORDER BY rank)
+             FROM ranked WHERE rank <= {int(top_k)}) AS top,
+            (SELECT MIN(rank) FROM ranked WHERE cumulative_share >= {PARETO_SHARE}) AS pareto_groups,
+            (SELECT struct_pack(period := CAST(period AS VARCHAR), total := total,
+                                previous_period := CAST(previous_period AS VARCHAR), previous := previous)
+             FROM periods ORDER BY period DESC LIMIT 1) AS latest,
+            (SELECT list(struct_pack(key := key, period := period, value := value, z := z) ORDER BY abs(z) DESC)
+             FROM scored WHERE abs(z) > {OUTLIER_Z}) AS outliers
+    """
+
+    cursor = _con.cursor()
+    try:
+        cursor.register("result", df)
+        total, groups, top, pareto_groups, latest, outliers = cursor.execute(sql).fetchone()
+    finally:
+        cursor.close()
+
+    stats.total = total
+    stats.groups = groups or 0
+    stats.top = top or []
+    stats.pareto_groups = pareto_groups
+    stats.latest = latest if period_column and latest and latest["previous"] is not None else None
+    stats.outliers = (outliers or [])[:MAX_OUTLIERS]
+    return stats
+
+
+def _label(column: str) -> str:
+    """total_revenue -> revenue"""
+    return re.sub(r"^(total|sum|avg|average)_", "", str(column)).replace("_", " ")
+
+
+def _text(value) -> str:
+    # Dates come back from DuckDB as timestamps at midnight
+    text = str(value)
+    return text[:-9] if text.endswith(" 00:00:00") else text
+
+
+def _format_value(column: str, value: float) -> str:
+    if CURRENCY_PATTERN.search(str(column).lower()):
+        return f"¥{value:,.0f}"
+    return f"{value:,.0f}" if abs(value) >= 100 or float(value).is_integer() else f"{value:,.2f}"
+
+
+def format_insights(stats: InsightStats) -> list:
+    """
+    Turn insight statistics into short sentences.
+
+    Args:
+        stats: Output of compute_insights
+
+    Returns:
+        List of insight strings
+    """
+    insights = [f"Found {stats.rows} records matching your query"]
+    if stats.measure is None or stats.total is None:
+        return insights
+
+    measure, label = stats.measure, _label(stats.measure)
+    insights.append(f"Total {label}: {_format_value(measure, stats.total)}")
+
+    if stats.groups > 1 and stats.top:
+        leaders = ", ".join(
+            f"{_text(item['key'])} ({_format_value(measure, item['total'])}, {item['share']:.0%})"
+            for item in stats.top if item["share"] is not None
+        )
+        if leaders:
+            insights.append(f"Top {len(stats.top)} by {label}: {leaders}")
+        if stats.pareto_groups and stats.groups >= 5:
+            insights.append(
+                f"{stats.pareto_groups} of {stats.groups} groups make up {PARETO_SHARE:.0%} of {label}"
+            )
+
+    if stats.latest:
+        latest = stats.latest
+        change = latest["total"] - latest["previous"]
+        line = (f"{_text(latest['period'])} vs {_text(latest['previous_period'])}: "
+                f"{'+' if change >= 0 else '-'}{_format_value(measure, abs(change))}")
+        if latest["previous"]:
+            line += f" ({change / abs(latest['previous']):+.1%})"
+        insights.append(line)
+
+    for outlier in stats.outliers:
+        where = " ".join(dict.fromkeys(_text(outlier[k]) for k in ("key", "period") if outlier[k] is not None))
+        direction = "high" if outlier["z"] > 0 else "low"
+        insights.append(
+            f"Unusually {direction} {label}: {where + ' ' if where else ''}{_format_value(measure, outlier['value'])}"
+        )
+    return insights
@@ -1,69 +1,66 @@
 import os
 import re
-from typing import Optional
-import streamlit as st
-from openai import OpenAI
+from typing import TYPE_CHECKING, Optional
 
+from db import ROW_CAP_MARKER
+from prompt_builder import Prompt, PromptBuilder, default_prompt, with_repair
+from tracing import span
 
-def get_openai_client() -> Optional[OpenAI]:
-    """Get OpenAI client with API key from environment or Streamlit secrets."""
-    try:
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key and hasattr(st, 'secrets') and 'OPENAI_API_KEY' in st.secrets:
-            api_key = st.secrets["OPENAI_API_KEY"]
-        
-        if not api_key:
-            st.warning("⚠️ OPENAI_API_KEY not found. The app will use fallback queries only.")
-            return None
-            
-        return OpenAI(api_key=api_key)
-    except Exception as e:
-        st.warning(f"⚠️ Failed to initialize OpenAI client: {str(e)}. Using fallback queries only.")
+# The SDK is imported on first use to keep app startup fast
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+
+def get_openai_client() -> Optional["OpenAI"]:
+    """
+    Get OpenAI client with API key from the OPENAI_API_KEY environment variable.
+    
+    Returns:
+        OpenAI client, or None when no API key is set
+    """
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
         return None
+    
+    from openai import OpenAI
+    return OpenAI(api_key=api_key)
 
 
-def generate_sql(question: str) -> str:
+def _complete_sql(prompt: Prompt, timeout: float = 30) -> str:
     """
-    Generate SQL query from natural language question using ChatGPT.
+    Send a prompt to ChatGPT and return the SQL text it produced.
     
     Args:
-        question: Natural language question about sales data
+        prompt: Prompt from prompt_builder
+        timeout: Request timeout in seconds
         
     Returns:
-        SQL query string (SELECT only)
+        SQL query string with code fences removed
     """
     client = get_openai_client()
     if not client:
         raise Exception("OpenAI client not available. Please set OPENAI_API_KEY environment variable.")
     
-    system_prompt = "You produce only SQL SELECT statements for DuckDB. No prose, no code fences."
-    
-    user_prompt = f"""あなたはデータ分析のためのSQLアシスタントです。以下の制約を厳守して、DuckDB方言の SELECT 文のみを1つ出力してください。
-
-【制約】
-- 出力はSQLのみ（前後説明やコードブロック記号は不要）
-- SELECT文のみ。サブクエリは可。DDL/DMLは不可（CREATE/UPDATE/DELETE/INSERT等禁止）
-- テーブル名は sales
-- 列: date (DATE), month (TEXT: 'YYYY-MM'), category (TEXT), units (INT), unit_price (INT), region (TEXT), sales_channel (TEXT), customer_segment (TEXT), revenue (INT)
-- 期間集計が必要なら month を使う（例: '2025-01'）
-- 集計列は SUM(revenue) や SUM(units)
-- 並び順は理解しやすい順（期間×カテゴリ等）
-- LIMIT は不要（アプリ側で付与）
-
-【ユーザーの質問】
-{question}"""
-
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",  # Use cheaper, faster model
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            max_tokens=500,
-            temperature=0,
-            timeout=30  # Add timeout
-        )
+        with span("llm_request", model="gpt-4o-mini", estimated_tokens=prompt.estimated_tokens) as request_span:
+            response = client.chat.completions.create(
+                model="gpt-4o-mini",  # Use cheaper, faster model
+                messages=[
+                    {"role": "system", "content": prompt.system},
+                    {"role": "user", "content": f"{prompt.static_prefix}\n\n{prompt.user}"}
+                ],
+                max_tokens=500,
+                temperature=0,
+                timeout=timeout
+            )
+            usage = getattr(response, "usage", None)
+            if usage:
+                details = getattr(usage, "prompt_tokens_details", None)
+                request_span.set(
+                    prompt_tokens=usage.prompt_tokens,
+                    completion_tokens=usage.completion_tokens,
+                    cached_tokens=getattr(details, "cached_tokens", 0) or 0
+                )
         
         sql = response.choices[0].message.content.strip()
         
@@ -81,6 +78,45 @@ def generate_sql(question: str) -> str:
         raise Exception(f"Failed to generate SQL: {str(e)}")
 
 
+def generate_sql(question: str, prompt_builder: Optional[PromptBuilder] = None) -> str:
+    """
+    Generate SQL query from natural language question using ChatGPT.
+    
+    Args:
+        question: Natural language question about sales data
+        prompt_builder: Builds a schema-aware prompt from the live catalog (defaults to sales only)
+        
+    Returns:
+        SQL query string (SELECT only)
+    """
+    prompt = prompt_builder.build(question) if prompt_builder else default_prompt(question)
+    return _complete_sql(prompt)
+
+
+def repair_sql(question: str, sql: str, error: str,
+               prompt_builder: Optional[PromptBuilder] = None, timeout: float = 30) -> str:
+    """
+    Ask ChatGPT to fix a query that DuckDB rejected.
+    
+    Args:
+        question: Original natural language question
+        sql: The SQL query that failed
+        error: DuckDB error message for that query
+        prompt_builder: Builds a schema-aware prompt from the live catalog (defaults to sales only)
+        timeout: Request timeout in seconds (the remaining repair budget)
+        
+    Returns:
+        Safe SQL query string with LIMIT enforced
+    """
+    prompt = prompt_builder.build(question) if prompt_builder else default_prompt(question)
+    repaired = _complete_sql(with_repair(prompt, sql, error), timeout=timeout)
+    
+    if not is_safe_select_sql(repaired):
+        raise Exception("Repaired SQL failed safety check")
+    
+    return enforce_limit(repaired)
+
+
 def is_safe_select_sql(sql: str) -> bool:
     """
     Check if SQL query is safe (SELECT-only, no dangerous keywords).
@@ -124,7 +160,8 @@ def enforce_limit(sql: str, max_limit: int = 1000) -> str:
         max_limit: Maximum allowed limit (default 1000)
         
     Returns:
-        SQL query with appropriate LIMIT clause
+        SQL query with appropriate LIMIT clause (a LIMIT set by this function
+        carries db.ROW_CAP_MARKER, see db.remove_row_cap)
     """
     sql = sql.strip()
     
@@ -141,10 +178,10 @@ def enforce_limit(sql: str, max_limit: int = 1000) -> str:
         existing_limit = int(match.group(1))
         # If existing limit is greater than max_limit, replace it
         if existing_limit > max_limit:
-            sql = re.sub(limit_pattern, f'LIMIT {max_limit}', sql, flags=re.IGNORECASE)
+            sql = re.sub(limit_pattern, f'LIMIT {max_limit} {ROW_CAP_MARKER}', sql, flags=re.IGNORECASE)
     else:
         # Add LIMIT clause
-        sql += f' LIMIT {max_limit}'
+        sql += f' LIMIT {max_limit} {ROW_CAP_MARKER}'
     
     # Add semicolon at the end
     sql += ';'
@@ -152,19 +189,20 @@ def enforce_limit(sql: str, max_limit: int = 1000) -> str:
     return sql
 
 
-def process_sql_query(question: str) -> tuple[str, bool]:
+def process_sql_query(question: str, prompt_builder: Optional[PromptBuilder] = None) -> tuple[str, bool]:
     """
     Process natural language question to generate safe SQL query.
     
     Args:
         question: Natural language question
+        prompt_builder: Builds a schema-aware prompt from the live catalog (defaults to sales only)
         
     Returns:
         Tuple of (sql_query, is_generated) where is_generated indicates if SQL was successfully generated
     """
     try:
         # Generate SQL from question
-        sql = generate_sql(question)
+        sql = generate_sql(question, prompt_builder)
         
         # Check if SQL is safe
         if not is_safe_select_sql(sql):
@@ -175,6 +213,5 @@ def process_sql_query(question: str) -> tuple[str, bool]:
         
         return sql, True
         
-    except Exception as e:
-        st.warning(f"SQL generation failed: {str(e)}. Using fallback query.")
+    except Exception:
         return "", False
\ No newline at end of file
@@ -0,0 +1,239 @@
+"""
+Incremental monthly order metrics for the orders dashboard (Home.py).
+
+Per-month counters are kept in a small JSON state file together with the byte
+offset of the last order that was read. When new orders are appended to the
+CSV only the new bytes are parsed and only the affected months are updated.
+If the file was rewritten (not just appended to) the state is rebuilt.
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+from typing import Iterator, Optional
+
+import pandas as pd
+
+
+ORDERS_CSV = "sample_data/orders.csv"
+STATE_PATH = ".cache/orders_monthly_metrics.json"
+STATE_VERSION = 2
+
+# Counter name -> order status it counts
+STATUS_COUNTERS = {
+    "cancelled_orders": "Cancelled",
+    "returned_orders": "Returned",
+    "shipped_orders": "Shipped",
+    "delivered_orders": "Complete",
+}
+COUNTER_COLUMNS = ["total_orders"] + list(STATUS_COUNTERS)
+
+# Bytes read per block when scanning new orders
+BLOCK_SIZE = 32 * 1024 * 1024
+
+# Bytes just before the stored offset used to detect a rewritten file
+FINGERPRINT_SIZE = 4096
+
+
+def _fingerprint(f, offset: int) -> str:
+    """Hash the bytes just before ``offset`` (the tail that was already read)."""
+    start = max(0, offset - FINGERPRINT_SIZE)
+    f.seek(start)
+    return hashlib.sha1(f.read(offset - start)).hexdigest()
+
+
+def _last_line_end(f, start: int, size: int, step: int = 65536) -> int:
+    """Return the offset just after the last line break in [start, size), or ``start``."""
+    pos = size
+    while pos > start:
+        chunk_start = max(start, pos - step)
+        f.seek(chunk_start)
+        index = f.read(pos - chunk_start).rfind(b"\n")
+        if index >= 0:
+            return chunk_start + index + 1
+        pos = chunk_start
+    return start
+
+
+def _iter_blocks(f, start: int, end: int, block_size: int = BLOCK_SIZE) -> Iterator[bytes]:
+    """Yield the bytes between ``start`` and ``end`` in blocks that end on a line break."""
+    f.seek(start)
+    remaining = end - start
+    carry = b""
+    while remaining > 0:
+        data = f.read(min(block_size, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        data = carry + data
+        cut = data.rfind(b"\n") + 1
+        if cut == 0:
+            carry = data
+            continue
+        carry = data[cut:]
+        yield data[:cut]
+    if carry:
+        yield carry
+
+
+def count_orders_by_month(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Count orders per month and status counter (vectorized).
+
+    Args:
+        df: Orders with ``created_at`` and ``status`` columns
+
+    Returns:
+        DataFrame indexed by 'YYYY-MM' with COUNTER_COLUMNS
+    """
+    # created_at is 'YYYY-MM-DD hh:mm:ss', so the month is a plain string prefix
+    month = df["created_at"].astype(str).str.slice(0, 7)
+    counts = pd.crosstab(month, df["status"])
+
+    result = pd.DataFrame(index=counts.index)
+    result["total_orders"] = counts.sum(axis=1)
+    for counter, status in STATUS_COUNTERS.items():
+        result[counter] = counts[status] if status in counts.columns else 0
+    result.index.name = "year_month"
+    return result.astype("int64")
+
+
+class AppendOnlyCsvReader:
+    """
+    Remembers how far an append-only CSV has been read.
+
+    The reader state (header, byte offset and fingerprint) is a plain dict so
+    engines can persist it next to their own aggregates.
+    """
+
+    def __init__(self, csv_path: str, state: Optional[dict] = None):
+        self.csv_path = csv_path
+        self.state = state if state and state.get("csv_path") == os.path.abspath(csv_path) else self._empty_state()
+
+    def _empty_state(self) -> dict:
+        return {
+            "csv_path": os.path.abspath(self.csv_path),
+            "header": None,
+            "offset": 0,
+            "fingerprint": None,
+        }
+
+    def prepare(self) -> bool:
+        """
+        Check that the file still starts with what was already read.
+
+        Returns:
+            True if the file was rewritten (or never read) and reading restarts
+            from the first order; callers must then reset their aggregates
+        """
+        size = os.path.getsize(self.csv_path)
+        offset = self.state["offset"]
+        with open(self.csv_path, "rb") as f:
+            if offset and size >= offset and _fingerprint(f, offset) == self.state["fingerprint"]:
+                return False
+            self.state = self._empty_state()
+            header_line = f.readline()
+        self.state["header"] = header_line.decode("utf-8").strip().split(",")
+        self.state["offset"] = len(header_line)
+        return True
+
+    def read_appended(self, usecols: list, dtype=str) -> Iterator[pd.DataFrame]:
+        """
+        Yield the orders appended since the last read, block by block.
+
+        Only complete lines are consumed; a partially written order is picked
+        up next time. The offset advances once every block has been yielded.
+        """
+        size = os.path.getsize(self.csv_path)
+        start = self.state["offset"]
+        with open(self.csv_path, "rb") as f:
+            end = _last_line_end(f, start, size)
+            if end == start:
+                return
+            for block in _iter_blocks(f, start, end):
+                yield pd.read_csv(io.BytesIO(block), names=self.state["header"], usecols=usecols, dtype=dtype)
+            self.state["offset"] = end
+            self.state["fingerprint"] = _fingerprint(f, end)
+
+
+class JsonStateFile:
+    """Small JSON state file written atomically."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+
+    def load(self) -> Optional[dict]:
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return state if state.get("version") == STATE_VERSION else None
+
+    def save(self, state: dict) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+
+class MonthlyOrderMetrics:
+    """Monthly order counters that are updated incrementally from an append-only CSV."""
+
+    def __init__(self, csv_path: str = ORDERS_CSV, state_path: Optional[str] = STATE_PATH):
+        self.csv_path = csv_path
+        self._state_file = JsonStateFile(state_path)
+        self._lock = threading.Lock()
+        state = self._state_file.load() or {}
+        self._reader = AppendOnlyCsvReader(csv_path, state.get("reader"))
+        self._months = state.get("months", {}) if state.get("reader") == self._reader.state else {}
+
+    def refresh(self) -> list:
+        """
+        Read orders appended since the last refresh and update their months.
+
+        Returns:
+            Sorted list of months ('YYYY-MM') whose counters changed
+        """
+        with self._lock:
+            if self._reader.prepare():
+                self._months = {}
+
+            changed = set()
+            for df in self._reader.read_appended(usecols=["created_at", "status"]):
+                for month, row in count_orders_by_month(df).iterrows():
+                    counters = self._months.setdefault(month, dict.fromkeys(COUNTER_COLUMNS, 0))
+                    for column in COUNTER_COLUMNS:
+                        counters[column] += int(row[column])
+                    changed.add(month)
+
+            if changed:
+                self._state_file.save({
+                    "version": STATE_VERSION,
+                    "reader": self._reader.state,
+                    "months": self._months,
+                })
+            return sorted(changed)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Get the monthly counters with the cancel rate.
+
+        Returns:
+            DataFrame indexed by 'YYYY-MM' (str) with counters and cancel_rate (%)
+        """
+        with self._lock:
+            monthly_data = pd.DataFrame.from_dict(self._months, orient="index", columns=COUNTER_COLUMNS)
+        monthly_data = monthly_data.sort_index().astype("int64")
+        monthly_data.index.name = "year_month"
+        monthly_data["cancel_rate"] = (
+            monthly_data["cancelled_orders"] / monthly_data["total_orders"] * 100
+        ).round(2)
+        return monthly_data
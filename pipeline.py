@@ -0,0 +1,229 @@
+"""
+UI-free question answering pipeline.
+
+question -> generated SQL (validated and repaired) -> predefined fallback if
+needed -> DuckDB result -> insights. Used by the Streamlit chatbot and the
+HTTP API; nothing here renders UI.
+
+With a versioned connection (db.LiveConnection), generated SQL and results
+are cached per data version (shared_cache.py), across processes when
+SHARED_CACHE_PATH is set.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Union
+
+import pandas as pd
+
+from anomalies import anomaly_insights
+from db import run_query
+from fallbacks import find_best_fallback
+from insights import compute_insights, format_insights
+from llm_sql_openai import enforce_limit, generate_sql, is_safe_select_sql, repair_sql
+from prompt_builder import PromptBuilder
+from shared_cache import MemoryCache, SharedCache, get_shared_cache
+from sql_repair import LATENCY_BUDGET, MAX_ATTEMPTS, RepairResult, run_with_repair
+from tracing import dataframe_stats, span
+
+
+@dataclass
+class PipelineResult:
+    """Answer to one question."""
+
+    question: str
+    sql: str
+    source: str  # "generated" or "fallback"
+    df: pd.DataFrame
+    insights: list = field(default_factory=list)
+    fallback_name: Optional[str] = None
+    generation_error: Optional[str] = None
+    repair: Optional[RepairResult] = None
+    seconds: float = 0.0
+    cached: bool = False  # result served from the cache
+
+
+def generate_safe_sql(question: str, prompt_builder: Optional[PromptBuilder] = None) -> str:
+    """
+    Generate SQL for a question and enforce the SELECT-only and LIMIT rules.
+
+    Unlike llm_sql_openai.process_sql_query this raises with the reason instead of returning ("", False).
+
+    Args:
+        question: Natural language question
+        prompt_builder: Builds a schema-aware prompt from the live catalog (defaults to sales only)
+
+    Returns:
+        Safe SQL query string with LIMIT enforced
+    """
+    sql = generate_sql(question, prompt_builder)
+    with span("is_safe_select_sql"):
+        if not is_safe_select_sql(sql):
+            raise Exception("Generated SQL failed safety check")
+    return enforce_limit(sql)
+
+
+def answer_question(con: Any, question: str, prompt_builder: Optional[PromptBuilder] = None,
+                    generate: Callable[[str, Optional[PromptBuilder]], str] = generate_safe_sql,
+                    repair: Optional[Callable[[str, str, str, float], str]] = None,
+                    max_attempts: int = MAX_ATTEMPTS,
+                    latency_budget: float = LATENCY_BUDGET,
+                    cache: Optional[Union[SharedCache, MemoryCache]] = None) -> PipelineResult:
+    """
+    Answer a natural language question with a DuckDB query.
+
+    The generated SQL goes through the bounded repair loop; the best matching
+    predefined query is used when generation or repair fails. Errors running
+    the fallback query are raised.
+
+    Args:
+        con: DuckDB connection object (queries run on their own cursors, so it can be shared by threads)
+        question: Natural language question
+        prompt_builder: Builds a schema-aware prompt from the live catalog
+        generate: Callable (question, prompt_builder) -> safe SQL
+        repair: Callable (question, sql, error, timeout) -> repaired SQL (defaults to the model)
+        max_attempts: Maximum number of queries tried by the repair loop
+        latency_budget: Seconds allowed for the repair loop
+        cache: SQL and result cache (defaults to get_shared_cache()); only
+            used when the connection has a data_key
+
+    Returns:
+        PipelineResult with the executed SQL, the result DataFrame and insights
+    """
+    start = time.monotonic()
+    cache = cache or get_shared_cache()
+    data_key = getattr(con, "data_key", None) if cache else None
+
+    if data_key:
+        with span("shared_cache", kind="sql") as cache_span:
+            cached_sql = cache.get_sql(question, data_key)
+            cache_span.set(hit=cached_sql is not None)
+        if cached_sql:
+            df, insights, cached = _run_cached(con, cached_sql, question, cache, data_key)
+            return PipelineResult(
+                question=question,
+                sql=cached_sql,
+                source="generated",
+                df=df,
+                insights=insights,
+                seconds=time.monotonic() - start,
+                cached=cached,
+            )
+
+    if repair is None:
+        def repair(q, sql, error, timeout):
+            return repair_sql(q, sql, error, prompt_builder, timeout=timeout)
+
+    sql = ""
+    generation_error = None
+    try:
+        with span("generate_sql"):
+            sql = generate(question, prompt_builder)
+    except Exception as e:
+        generation_error = str(e)
+
+    repair_result = None
+    if sql.strip():
+        with span("sql_repair_loop") as loop_span:
+            repair_result = run_with_repair(con, question, sql, repair,
+                                            max_attempts=max_attempts, latency_budget=latency_budget)
+            loop_span.set(attempts=len(repair_result.attempts), succeeded=repair_result.succeeded)
+        if repair_result.succeeded:
+            insights = _insights(con, repair_result.df, question)
+            if data_key:
+                cache.put_sql(question, data_key, repair_result.sql)
+                cache.put_result(repair_result.sql, data_key, repair_result.df, insights)
+            return PipelineResult(
+                question=question,
+                sql=repair_result.sql,
+                source="generated",
+                df=repair_result.df,
+                insights=insights,
+                repair=repair_result,
+                seconds=time.monotonic() - start,
+            )
+
+    with span("find_best_fallback") as fallback_span:
+        fallback_name, fallback_sql = find_best_fallback(question)
+        fallback_span.set(fallback=fallback_name)
+    # Fallback SQL is not cached per question, so generation is retried next
+    # time; its result is shared by every question that falls back to it
+    df, insights, cached = _run_cached(con, fallback_sql, question, cache, data_key)
+    return PipelineResult(
+        question=question,
+        sql=fallback_sql,
+        source="fallback",
+        df=df,
+        insights=insights,
+        cached=cached,
+        fallback_name=fallback_name,
+        generation_error=generation_error,
+        repair=repair_result,
+        seconds=time.monotonic() - start,
+    )
+
+
+def run_cached_query(con: Any, sql: str, question: str = "",
+                     cache: Optional[Union[SharedCache, MemoryCache]] = None) -> tuple:
+    """
+    Run a query with insights, using the result cache of the connection's data version.
+
+    Args:
+        con: DuckDB connection object
+        sql: SQL query string
+        question: Question the query answers (for insights)
+        cache: SQL and result cache (defaults to get_shared_cache())
+
+    Returns:
+        Tuple of (DataFrame, insights list, served from cache)
+    """
+    cache = cache or get_shared_cache()
+    return _run_cached(con, sql, question, cache, getattr(con, "data_key", None))
+
+
+def _run_cached(con: Any, sql: str, question: str, cache: Optional[Union[SharedCache, MemoryCache]],
+                data_key: Optional[str]) -> tuple:
+    if data_key:
+        with span("shared_cache", kind="result") as cache_span:
+            hit = cache.get_result(sql, data_key)
+            cache_span.set(hit=hit is not None)
+        if hit:
+            return hit[0], hit[1], True
+
+    with span("query_df") as query_span:
+        df = run_query(con, sql)
+        query_span.set(**dataframe_stats(df))
+    insights = _insights(con, df, question)
+    if data_key:
+        cache.put_result(sql, data_key, df, insights)
+    return df, insights, False
+
+
+def _insights(con: Any, df: pd.DataFrame, question: str) -> list:
+    with span("generate_insights"):
+        insights = generate_insights(df, question)
+    with span("anomaly_insights"):
+        try:
+            insights.extend(anomaly_insights(con, df))
+        except Exception:
+            # Anomalies are optional (e.g. tables without the sales columns)
+            pass
+    return insights
+
+
+def generate_insights(df: pd.DataFrame, question: str = None) -> list:
+    """
+    Generate insights from the query results (see insights.py).
+
+    Args:
+        df: Query results DataFrame
+        question: Original user question (unused, kept for future enhancement)
+
+    Returns:
+        List of insight strings
+    """
+    try:
+        return format_insights(compute_insights(df))
+    except Exception:
+        # If insight generation fails, just provide basic info
+        return [f"Successfully retrieved {len(df)} records"]
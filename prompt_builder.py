@@ -0,0 +1,259 @@
+"""
+Schema-aware prompt builder for SQL generation.
+
+The instructions are a static prefix, identical on every call. Only the
+tables, columns and value hints relevant to the question are appended,
+trimmed to fit a token budget. The prefix is well below the providers'
+minimum cacheable prompt length (1024 tokens), so it is not marked for
+prompt caching.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from db import JOIN_HINTS, MONTH_FILTER_EXAMPLES, _literal, describe_tables
+
+
+SYSTEM_PROMPT = "You produce only SQL SELECT statements for DuckDB. No prose, no code fences."
+
+# Static instructions shared by every request
+INSTRUCTIONS = """あなたはデータ分析のためのSQLアシスタントです。以下の制約を厳守して、DuckDB方言の SELECT 文のみを1つ出力してください。
+
+【制約】
+- 出力はSQLのみ（前後説明やコードブロック記号は不要）
+- SELECT文のみ。サブクエリは可。DDL/DMLは不可（CREATE/UPDATE/DELETE/INSERT等禁止）
+- 使えるテーブルと列は【スキーマ】に記載のものだけ。複数のテーブルが必要なら結合キーで JOIN する
+- sales の期間集計が必要なら month（各月1日の DATE）を使う。month と 'YYYY-MM' 形式の文字列は直接比較しない（例: {month_filters}）。TIMESTAMP 列は date_trunc('month', 列) などで集計する
+- ENUM 列は文字列と同じように比較できる（例: category = 'Electronics'）
+- 売上の集計列は SUM(revenue) や SUM(units)
+- 並び順は理解しやすい順（期間×カテゴリ等）
+- LIMIT は不要（アプリ側で付与）""".format(month_filters="、".join(MONTH_FILTER_EXAMPLES))
+
+# Schema used when no live catalog is available
+DEFAULT_SCHEMA = """- sales: 日次の販売明細
+  列: date (DATE), category (ENUM), units (INT), unit_price (INT), region (ENUM), sales_channel (ENUM), customer_segment (ENUM), revenue (INT), month (DATE: 各月1日)"""
+
+# Estimated token budget for the whole prompt (instructions + schema + question)
+DEFAULT_TOKEN_BUDGET = 1200
+
+# Words in a question that point at a table
+TABLE_KEYWORDS = {
+    "sales": ["売上", "販売", "売れ", "単価", "数量", "revenue", "sales", "price", "units",
+              "カテゴリ", "category", "地域", "region", "チャネル", "channel", "セグメント", "segment"],
+    "orders": ["注文", "オーダー", "order", "キャンセル", "cancel", "返品", "return",
+               "出荷", "ship", "配送", "配達", "deliver", "ステータス", "status"],
+    "users": ["ユーザー", "会員", "user", "年齢", "age", "性別", "gender", "顧客"],
+}
+
+# Words in a question that point at a column
+COLUMN_KEYWORDS = {
+    ("sales", "date"): ["日", "date", "daily"],
+    ("sales", "month"): ["月", "month", "期間", "推移"],
+    ("sales", "category"): ["カテゴリ", "商品", "category"],
+    ("sales", "units"): ["数量", "個数", "units"],
+    ("sales", "unit_price"): ["単価", "price"],
+    ("sales", "region"): ["地域", "region"],
+    ("sales", "sales_channel"): ["チャネル", "channel", "オンライン", "店舗"],
+    ("sales", "customer_segment"): ["セグメント", "顧客", "segment"],
+    ("sales", "revenue"): ["売上", "revenue"],
+    ("orders", "status"): ["ステータス", "キャンセル", "返品", "status"],
+    ("orders", "created_at"): ["月", "日", "期間", "推移", "注文日"],
+    ("orders", "shipped_at"): ["出荷", "ship"],
+    ("orders", "delivered_at"): ["配送", "配達", "deliver"],
+    ("orders", "returned_at"): ["返品", "return"],
+    ("orders", "num_of_item"): ["点数", "個数", "item"],
+    ("orders", "gender"): ["性別", "gender"],
+    ("users", "gender"): ["性別", "gender"],
+    ("users", "age"): ["年齢", "age"],
+}
+
+# get_data_summary key -> (table, column) whose distinct values it lists
+SUMMARY_VALUE_COLUMNS = {
+    "categories": ("sales", "category"),
+    "regions": ("sales", "region"),
+    "sales_channels": ("sales", "sales_channel"),
+    "customer_segments": ("sales", "customer_segment"),
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Roughly estimate the token count of a prompt.
+
+    ASCII text averages about four characters per token; Japanese text is
+    closer to one token per character.
+    """
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars)
+
+
+@dataclass
+class Prompt:
+    """A prompt split into the static instructions and the per-question part."""
+
+    system: str
+    static_prefix: str
+    user: str
+    estimated_tokens: int
+
+
+def _join_keys() -> dict:
+    """Parse JOIN_HINTS into table -> set of key columns."""
+    keys = {}
+    for hint in JOIN_HINTS:
+        for part in hint.split(" = "):
+            table, column = part.split(".")
+            keys.setdefault(table, set()).add(column)
+    return keys
+
+
+def _make_prompt(schema: str, question: str) -> Prompt:
+    user = f"【スキーマ】\n{schema}\n\n【ユーザーの質問】\n{question}"
+    return Prompt(
+        system=SYSTEM_PROMPT,
+        static_prefix=INSTRUCTIONS,
+        user=user,
+        estimated_tokens=estimate_tokens(SYSTEM_PROMPT + INSTRUCTIONS + user),
+    )
+
+
+def with_repair(prompt: Prompt, sql: str, error: str) -> Prompt:
+    """
+    Extend a prompt with a failed query and its DuckDB error so the model can fix it.
+
+    The static prefix is unchanged.
+    """
+    user = (
+        f"{prompt.user}\n\n【前回のSQL（エラー）】\n{sql}\n\n【DuckDBのエラー】\n{error}\n\n"
+        "エラーを修正した SELECT 文を1つだけ出力してください。"
+    )
+    return Prompt(
+        system=prompt.system,
+        static_prefix=prompt.static_prefix,
+        user=user,
+        estimated_tokens=estimate_tokens(prompt.system + prompt.static_prefix + user),
+    )
+
+
+def default_prompt(question: str) -> Prompt:
+    """Build the prompt with the fixed sales-only schema."""
+    return _make_prompt(DEFAULT_SCHEMA, question)
+
+
+class PromptBuilder:
+    """Builds compact SQL-generation prompts from the live DuckDB catalog."""
+
+    def __init__(self, con: Any, summary: Optional[dict] = None,
+                 token_budget: int = DEFAULT_TOKEN_BUDGET):
+        """
+        Args:
+            con: DuckDB connection object (read once; the catalog is cached)
+            summary: Output of db.get_data_summary, used for value hints of non-ENUM columns
+            token_budget: Maximum estimated tokens for the whole prompt
+        """
+        self.tables = describe_tables(con)
+        self.token_budget = token_budget
+        self.join_keys = _join_keys()
+        # Value hints: ENUM values from the catalog, then the summary lists
+        self.values = {
+            (table, column): [str(value) for value in values]
+            for table, info in self.tables.items()
+            for column, values in info.get("values", {}).items()
+        }
+        for key, (table, column) in SUMMARY_VALUE_COLUMNS.items():
+            if summary and summary.get(key) and table in self.tables and (table, column) not in self.values:
+                self.values[(table, column)] = [str(value) for value in summary[key]]
+
+    def _column_score(self, question: str, table: str, column: str) -> int:
+        score = 1 if column.lower() in question else 0
+        score += sum(1 for keyword in COLUMN_KEYWORDS.get((table, column), []) if keyword.lower() in question)
+        score += sum(2 for value in self.values.get((table, column), []) if value.lower() in question)
+        return score
+
+    def score(self, question: str) -> dict:
+        """
+        Score how relevant each table and column is to the question.
+
+        Returns:
+            Dictionary of table -> (table score, {column: score})
+        """
+        question = question.lower()
+        scores = {}
+        for table, info in self.tables.items():
+            column_scores = {name: self._column_score(question, table, name) for name, _, _ in info["columns"]}
+            # Generic column words (e.g. 月) only rank columns; they do not pull in a table
+            table_score = sum(1 for keyword in TABLE_KEYWORDS.get(table, []) if keyword.lower() in question)
+            table_score += 2 if table in question else 0
+            table_score += sum(
+                2 for (value_table, _), values in self.values.items() if value_table == table
+                for value in values if value.lower() in question
+            )
+            scores[table] = (table_score, column_scores)
+        return scores
+
+    def _render(self, tables: list, dropped_columns: set, value_columns: set) -> str:
+        lines = []
+        for table in tables:
+            columns = []
+            for name, column_type, note in self.tables[table]["columns"]:
+                if (table, name) in dropped_columns:
+                    continue
+                if (table, name) in value_columns:
+                    # SQL literals the model can copy (Men's -> 'Men''s')
+                    note = ", ".join(_literal(str(value)) for value in self.values[(table, name)])
+                columns.append(f"{name} ({column_type}: {note})" if note else f"{name} ({column_type})")
+            lines.append(f"- {table}: {self.tables[table]['description']}")
+            lines.append(f"  列: {', '.join(columns)}")
+        joins = [hint for hint in JOIN_HINTS if all(part.split(".")[0] in tables for part in hint.split(" = "))]
+        if joins:
+            lines.append("- 結合キー: " + ", ".join(joins))
+        return "\n".join(lines)
+
+    def build(self, question: str) -> Prompt:
+        """
+        Build the prompt for a question within the token budget.
+
+        Tables are picked by relevance (the best match is always kept). When
+        the prompt is over budget, value hints, then unreferenced columns,
+        then the least relevant tables are dropped in that order.
+        """
+        if not self.tables:
+            return default_prompt(question)
+
+        scores = self.score(question)
+        ranked = sorted(self.tables, key=lambda table: -scores[table][0])
+        tables = [table for table in ranked if scores[table][0] > 0]
+        if not tables:
+            tables = ["sales"] if "sales" in self.tables else ranked[:1]
+
+        def column_score(item):
+            table, column = item
+            return scores[table][1].get(column, 0)
+
+        value_columns = {key for key in self.values if key[0] in tables}
+        dropped_columns = set()
+
+        # Reductions applied one by one until the prompt fits
+        reductions = []
+        for key in sorted(value_columns, key=column_score):
+            reductions.append(("value", key))
+        for table in reversed(tables):
+            for name, _, _ in self.tables[table]["columns"]:
+                if scores[table][1][name] == 0 and name not in self.join_keys.get(table, set()):
+                    reductions.append(("column", (table, name)))
+        for table in reversed(tables[1:]):
+            reductions.append(("table", table))
+
+        prompt = _make_prompt(self._render(tables, dropped_columns, value_columns), question)
+        for kind, target in reductions:
+            if prompt.estimated_tokens <= self.token_budget:
+                break
+            if kind == "value":
+                value_columns.discard(target)
+            elif kind == "column":
+                dropped_columns.add(target)
+            else:
+                tables.remove(target)
+            prompt = _make_prompt(self._render(tables, dropped_columns, value_columns), question)
+
+        return prompt
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Batch mode: answer a file of questions and write the results to Parquet.
+
+    python run_batch.py questions.txt --output batch_results
+
+The question file is plain text (one question per line, '#' for comments),
+CSV with a "question" column, or a JSON list. SQL is generated concurrently
+under a request rate limit, identical queries are run once, and queries run
+on a thread pool against one shared DuckDB connection (one cursor each).
+Every distinct result is written to results/<hash>.parquet, and index.parquet
+maps each question to its SQL and result file.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+import pandas as pd
+
+from db import get_data_summary, init_db, run_query
+from fallbacks import find_best_fallback
+from pipeline import generate_safe_sql
+from prompt_builder import PromptBuilder
+from sql_repair import run_with_repair
+
+
+LLM_CONCURRENCY = 4
+LLM_REQUESTS_PER_SECOND = 2.0
+QUERY_WORKERS = 8
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing calls at a fixed rate (allows a small burst)."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate: Calls per second (0 or less disables the limit)
+            burst: Calls allowed back to back before spacing applies
+        """
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.burst = max(1, burst)
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def acquire(self):
+        """Block until the next call is allowed."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            # Allow up to `burst` calls of credit after an idle period
+            self._next = max(self._next, now - self.interval * (self.burst - 1))
+            wait = self._next - now
+            self._next += self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def read_questions(path: str) -> list:
+    """
+    Read questions from a text, CSV or JSON file.
+
+    Args:
+        path: Question file path
+
+    Returns:
+        List of questions in file order (duplicates removed)
+    """
+    if path.endswith(".csv"):
+        questions = pd.read_csv(path)["question"].dropna().astype(str).tolist()
+    elif path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            questions = [str(question) for question in json.load(f)]
+    else:
+        with open(path, encoding="utf-8") as f:
+            questions = [line for line in f if not line.lstrip().startswith("#")]
+
+    questions = [question.strip() for question in questions]
+    return list(dict.fromkeys(question for question in questions if question))
+
+
+def normalize_sql(sql: str) -> str:
+    """Normalize whitespace and the trailing semicolon so identical queries share a key."""
+    return " ".join(sql.split()).rstrip(";").strip()
+
+
+def sql_key(sql: str) -> str:
+    """Short stable identifier of a normalized query (used as the result file name)."""
+    return hashlib.sha1(normalize_sql(sql).encode()).hexdigest()[:16]
+
+
+def run_batch(con: Any, questions: list, output_dir: str,
+              prompt_builder: Optional[PromptBuilder] = None,
+              generate: Callable[[str, Optional[PromptBuilder]], str] = generate_safe_sql,
+              repair: Optional[Callable[[str, str, str, float], str]] = None,
+              llm_concurrency: int = LLM_CONCURRENCY,
+              requests_per_second: float = LLM_REQUESTS_PER_SECOND,
+              query_workers: int = QUERY_WORKERS) -> pd.DataFrame:
+    """
+    Answer many questions and write the results as Parquet files.
+
+    Args:
+        con: DuckDB connection object (shared; each query uses its own cursor)
+        questions: Natural language questions
+        output_dir: Directory for index.parquet and results/
+        prompt_builder: Builds a schema-aware prompt from the live catalog
+        generate: Callable (question, prompt_builder) -> safe SQL
+        repair: Callable (question, sql, error, timeout) -> repaired SQL (defaults to the model)
+        llm_concurrency: Parallel model requests (generation and repair together)
+        requests_per_second: Rate limit shared by generation and repair requests
+        query_workers: Threads running DuckDB queries
+
+    Returns:
+        Index DataFrame with one row per question
+    """
+    start = time.monotonic()
+    limiter = RateLimiter(requests_per_second, burst=llm_concurrency)
+    # Repairs run on the query threads, so model calls share this bound as well
+    llm_slots = threading.BoundedSemaphore(max(1, llm_concurrency))
+    results_dir = os.path.join(output_dir, "results")
+    os.makedirs(results_dir, exist_ok=True)
+
+    if repair is None:
+        from llm_sql_openai import repair_sql
+
+        def repair(question, sql, error, timeout):
+            return repair_sql(question, sql, error, prompt_builder, timeout=timeout)
+
+    def limited_repair(question, sql, error, timeout):
+        with llm_slots:
+            limiter.acquire()
+            return repair(question, sql, error, timeout)
+
+    # 1) Generate SQL concurrently under the rate limit
+    def generate_one(question):
+        with llm_slots:
+            limiter.acquire()
+            try:
+                return generate(question, prompt_builder), None
+            except Exception as e:
+                return "", str(e)
+
+    with ThreadPoolExecutor(max_workers=llm_concurrency) as pool:
+        generated = list(pool.map(generate_one, questions))
+
+    # 2) Run each distinct generated query once (with the bounded repair loop)
+    rows = []
+    for question, (sql, error) in zip(questions, generated):
+        rows.append({"question": question, "sql": sql, "source": "generated" if sql else "fallback",
+                     "fallback_name": None, "error": error})
+
+    unique = {}
+    for row in rows:
+        if row["sql"]:
+            unique.setdefault(normalize_sql(row["sql"]), (row["question"], row["sql"]))
+
+    def execute_generated(item):
+        question, sql = item
+        return run_with_repair(con, question, sql, limited_repair)
+
+    with ThreadPoolExecutor(max_workers=query_workers) as pool:
+        repaired = dict(zip(unique, pool.map(execute_generated, unique.values())))
+
+    frames = {}
+    for row in rows:
+        if not row["sql"]:
+            continue
+        result = repaired[normalize_sql(row["sql"])]
+        if result.succeeded:
+            row["sql"] = result.sql
+            frames[normalize_sql(result.sql)] = result.df
+        else:
+            row["source"] = "fallback"
+            row["error"] = result.error
+
+    # 3) Predefined fallbacks for the rest (also run once per distinct query)
+    for row in rows:
+        if row["source"] == "fallback":
+            row["fallback_name"], row["sql"] = find_best_fallback(row["question"])
+
+    pending = list(dict.fromkeys(normalize_sql(row["sql"]) for row in rows if normalize_sql(row["sql"]) not in frames))
+
+    def execute_fallback(sql):
+        try:
+            return run_query(con, sql), None
+        except Exception as e:
+            return pd.DataFrame(), str(e)
+
+    failures = {}
+    with ThreadPoolExecutor(max_workers=query_workers) as pool:
+        for sql, (df, error) in zip(pending, pool.map(execute_fallback, pending)):
+            if error is None:
+                frames[sql] = df
+            else:
+                failures[sql] = error
+
+    # 4) Write one Parquet file per distinct result plus the index
+    for sql, df in frames.items():
+        df.to_parquet(os.path.join(results_dir, f"{sql_key(sql)}.parquet"), index=False)
+
+    for row in rows:
+        normalized = normalize_sql(row["sql"])
+        if normalized in frames:
+            row["result_file"] = os.path.join("results", f"{sql_key(normalized)}.parquet")
+            row["rows"] = len(frames[normalized])
+        else:
+            row["result_file"] = None
+            row["rows"] = 0
+            row["error"] = failures.get(normalized, row["error"])
+
+    index = pd.DataFrame(rows, columns=["question", "sql", "source", "fallback_name", "result_file", "rows", "error"])
+    index.to_parquet(os.path.join(output_dir, "index.parquet"), index=False)
+    index.attrs["seconds"] = time.monotonic() - start
+    index.attrs["distinct_queries"] = len(frames)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a file of questions and write Parquet results.")
+    parser.add_argument("questions", help="Question file (.txt one per line, .csv with a question column, or .json list)")
+    parser.add_argument("--output", default="batch_results", help="Output directory (default: batch_results)")
+    parser.add_argument("--llm-concurrency", type=int, default=LLM_CONCURRENCY, help="Parallel model requests")
+    parser.add_argument("--rate", type=float, default=LLM_REQUESTS_PER_SECOND, help="Model requests per second")
+    parser.add_argument("--query-workers", type=int, default=QUERY_WORKERS, help="Threads running DuckDB queries")
+    args = parser.parse_args()
+
+    questions = read_questions(args.questions)
+    if not questions:
+        print(f"❌ No questions found in {args.questions}")
+        return 1
+
+    try:
+        con = init_db()
+    except Exception as e:
+        print(f"❌ Failed to load database: {e}")
+        return 1
+
+    print(f"🚀 Answering {len(questions)} questions...")
+    index = run_batch(
+        con, questions, args.output,
+        prompt_builder=PromptBuilder(con, get_data_summary(con)),
+        llm_concurrency=args.llm_concurrency,
+        requests_per_second=args.rate,
+        query_workers=args.query_workers,
+    )
+
+    counts = index["source"].value_counts().to_dict()
+    failed = int(index["result_file"].isna().sum())
+    print(f"✅ Done in {index.attrs['seconds']:.1f}s: {counts.get('generated', 0)} generated, "
+          f"{counts.get('fallback', 0)} fallback, {index.attrs['distinct_queries']} distinct queries, {failed} failed")
+    print(f"📁 Results: {os.path.join(args.output, 'index.parquet')}")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,7 @@ Startup script for the Sales Data Analysis Chatbot.
 This script helps check dependencies and environment before starting the Streamlit app.
 """
 
+import importlib.util
 import os
 import sys
 import subprocess
@@ -15,17 +16,17 @@ def check_dependencies():
         'streamlit',
         'duckdb', 
         'pandas',
+        'openai',
         'anthropic',
         'plotly'
     ]
     
-    missing_packages = []
-    
-    for package in required_packages:
-        try:
-            __import__(package)
-        except ImportError:
-            missing_packages.append(package)
+    # find_spec only locates the package; importing everything here would
+    # double startup time since the app imports them again
+    missing_packages = [
+        package for package in required_packages
+        if importlib.util.find_spec(package) is None
+    ]
     
     if missing_packages:
         print(f"❌ Missing packages: {', '.join(missing_packages)}")
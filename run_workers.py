@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Multi-process mode: several Streamlit workers on one shared copy of the data.
+
+    python run_workers.py --workers 4 --port 8501
+
+One Streamlit process is bound by the GIL for the pandas and Plotly work, and
+each process would load its own copy of the data. This launcher loads the
+data once, builds the derived tables (cross-filter cube, anomaly scores) and
+publishes everything as a DuckDB snapshot file (db.publish_snapshot). Each
+worker attaches to the snapshot read-only (DATA_SNAPSHOT), so the data is held
+once in the OS page cache, and shares generated SQL and query results with
+the other workers through a SQLite cache (SHARED_CACHE_PATH).
+
+When the data files change the launcher publishes a new snapshot; workers
+pick it up like any other hot reload. Workers that exit are restarted.
+
+Streamlit keeps session state inside its process, so put a load balancer
+with sticky sessions (and WebSocket support) in front of the worker ports.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Any
+
+from anomalies import AnomalyDetector
+from dashboard_queries import ensure_sales_cube
+from db import RELOAD_INTERVAL, SNAPSHOT_DIR, TABLE_CATALOG, LiveConnection, load_database, publish_snapshot
+
+
+WORKERS = os.cpu_count() or 2
+BASE_PORT = 8501
+SHARED_CACHE_PATH = ".cache/shared_cache.sqlite"
+
+
+def load_for_snapshot(csv_path: str) -> Any:
+    """Load the data and build the derived tables workers cannot create on a read-only snapshot."""
+    con = load_database(csv_path)
+    ensure_sales_cube(con)
+    AnomalyDetector(con).refresh()
+    return con
+
+
+def start_worker(app: str, port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", app,
+         "--server.port", str(port), "--server.headless", "true"],
+        env=env,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Streamlit workers on a shared read-only data snapshot.")
+    parser.add_argument("--workers", type=int, default=WORKERS, help=f"Worker processes (default: {WORKERS})")
+    parser.add_argument("--port", type=int, default=BASE_PORT, help="First worker port; workers use consecutive ports")
+    parser.add_argument("--app", default="chatbot_app.py", help="Streamlit app (default: chatbot_app.py)")
+    parser.add_argument("--csv", default="data/sample_sales.csv", help="Sales CSV file")
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR, help="Directory for snapshot files")
+    parser.add_argument("--cache-path", default=SHARED_CACHE_PATH, help="SQLite file for the shared caches")
+    parser.add_argument("--memory-limit", help="DuckDB memory limit per worker, e.g. 1GB")
+    args = parser.parse_args()
+
+    print("🚀 Loading data and publishing the snapshot...")
+    start = time.monotonic()
+    paths = [args.csv] + [spec["path"] for spec in TABLE_CATALOG.values()]
+    live = LiveConnection(lambda: load_for_snapshot(args.csv), paths)
+    pointer = publish_snapshot(live, args.snapshot_dir)
+    # New data is published before the launcher's own copy is swapped
+    live.add_reload_hook(lambda con: publish_snapshot(con, args.snapshot_dir))
+    print(f"✅ Snapshot ready in {time.monotonic() - start:.1f}s: {pointer}")
+
+    env = {
+        **os.environ,
+        "DATA_SNAPSHOT": os.path.abspath(pointer),
+        "SHARED_CACHE_PATH": os.path.abspath(args.cache_path),
+        # The launcher watches the data files; workers only watch the pointer
+        "DATA_RELOAD_INTERVAL": str(RELOAD_INTERVAL or 5),
+    }
+    if args.memory_limit:
+        env["DUCKDB_MEMORY_LIMIT"] = args.memory_limit
+
+    ports = [args.port + i for i in range(args.workers)]
+    workers = {port: start_worker(args.app, port, env) for port in ports}
+    print(f"🧵 {len(workers)} workers: " + ", ".join(f"http://localhost:{port}" for port in ports))
+
+    try:
+        while True:
+            time.sleep(1)
+            for port, process in workers.items():
+                if process.poll() is not None:
+                    print(f"⚠️  Worker on port {port} exited with {process.returncode}; restarting")
+                    workers[port] = start_worker(args.app, port, env)
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down...")
+    finally:
+        for process in workers.values():
+            process.terminate()
+        for process in workers.values():
+            process.wait()
+        live.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
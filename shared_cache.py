@@ -0,0 +1,204 @@
+"""
+SQL and result caches, shared by worker processes through a local SQLite file.
+
+Two tables, both keyed by the data version (LiveConnection.data_key) so a
+reload never serves stale answers:
+
+    sql_cache:    question -> generated SQL
+    result_cache: SQL -> result rows (Arrow IPC) and insights
+
+Different questions that end in the same SQL share one result entry. SQLite
+in WAL mode lets every worker read while one writes; each thread uses its own
+connection. Entries are evicted oldest-first beyond MAX_ENTRIES.
+
+The pipeline uses the SQLite cache when SHARED_CACHE_PATH is set
+(run_workers.py does this for its workers) and a MemoryCache with the same
+interface otherwise.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+
+
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH")
+# Results larger than this (serialized) are not cached
+MAX_RESULT_BYTES = 8 * 1024 * 1024
+MAX_ENTRIES = 2000
+# Eviction runs once every this many writes per process
+PRUNE_EVERY = 50
+
+
+def _key(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+def normalize_question(question: str) -> str:
+    """Questions differing only in case or whitespace share a cache entry."""
+    return " ".join(question.split()).casefold()
+
+
+class SharedCache:
+    """Question -> SQL and SQL -> result caches in a SQLite file."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite database file, shared by all processes using the cache
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        con = self._connect()
+        con.execute("PRAGMA journal_mode = WAL")
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS sql_cache (
+                key TEXT PRIMARY KEY, question TEXT, sql TEXT, created_at REAL
+            )
+        """)
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS result_cache (
+                key TEXT PRIMARY KEY, sql TEXT, data BLOB, insights TEXT, created_at REAL
+            )
+        """)
+
+    def _connect(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            # Autocommit; a busy writer in another process is waited for, not an error
+            con = self._local.con = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            con.execute("PRAGMA synchronous = NORMAL")
+        return con
+
+    def get_sql(self, question: str, data_key: str) -> Optional[str]:
+        """The cached SQL of a question, or None."""
+        row = self._connect().execute(
+            "SELECT sql FROM sql_cache WHERE key = ?", (_key(data_key, normalize_question(question)),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put_sql(self, question: str, data_key: str, sql: str):
+        """Cache the SQL answering a question."""
+        self._write(
+            "INSERT OR REPLACE INTO sql_cache VALUES (?, ?, ?, ?)",
+            (_key(data_key, normalize_question(question)), question, sql, time.time()),
+        )
+
+    def get_result(self, sql: str, data_key: str) -> Optional[tuple]:
+        """
+        The cached result of a query.
+
+        Returns:
+            Tuple of (DataFrame, insights list), or None
+        """
+        row = self._connect().execute(
+            "SELECT data, insights FROM result_cache WHERE key = ?", (_key(data_key, sql),)
+        ).fetchone()
+        if row is None:
+            return None
+        table = pa.ipc.open_stream(row[0]).read_all()
+        return table.to_pandas(), json.loads(row[1])
+
+    def put_result(self, sql: str, data_key: str, df: pd.DataFrame, insights: list) -> bool:
+        """
+        Cache the result of a query.
+
+        Returns:
+            False if the result was too large to cache
+        """
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        data = sink.getvalue().to_pybytes()
+        if len(data) > MAX_RESULT_BYTES:
+            return False
+        self._write(
+            "INSERT OR REPLACE INTO result_cache VALUES (?, ?, ?, ?, ?)",
+            (_key(data_key, sql), sql, data, json.dumps(insights, ensure_ascii=False), time.time()),
+        )
+        return True
+
+    def _write(self, sql: str, params: tuple):
+        con = self._connect()
+        con.execute(sql, params)
+        self._writes += 1
+        if self._writes % PRUNE_EVERY == 0:
+            for table in ("sql_cache", "result_cache"):
+                con.execute(f"""
+                    DELETE FROM {table} WHERE key NOT IN (
+                        SELECT key FROM {table} ORDER BY created_at DESC LIMIT ?
+                    )
+                """, (MAX_ENTRIES,))
+
+    def stats(self) -> dict:
+        """Number of cached questions and results."""
+        con = self._connect()
+        return {
+            "questions": con.execute("SELECT COUNT(*) FROM sql_cache").fetchone()[0],
+            "results": con.execute("SELECT COUNT(*) FROM result_cache").fetchone()[0],
+        }
+
+
+class MemoryCache:
+    """SharedCache interface for the threads of one process (no serialization)."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._sql = OrderedDict()
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, entries: OrderedDict, key: str):
+        with self._lock:
+            value = entries.get(key)
+            if value is not None:
+                entries.move_to_end(key)
+            return value
+
+    def _put(self, entries: OrderedDict, key: str, value):
+        with self._lock:
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def get_sql(self, question: str, data_key: str) -> Optional[str]:
+        return self._get(self._sql, _key(data_key, normalize_question(question)))
+
+    def put_sql(self, question: str, data_key: str, sql: str):
+        self._put(self._sql, _key(data_key, normalize_question(question)), sql)
+
+    def get_result(self, sql: str, data_key: str) -> Optional[tuple]:
+        hit = self._get(self._results, _key(data_key, sql))
+        # Callers may add columns for display; keep the cached frame intact
+        return (hit[0].copy(), list(hit[1])) if hit else None
+
+    def put_result(self, sql: str, data_key: str, df: pd.DataFrame, insights: list) -> bool:
+        self._put(self._results, _key(data_key, sql), (df.copy(), list(insights)))
+        return True
+
+    def stats(self) -> dict:
+        return {"questions": len(self._sql), "results": len(self._results)}
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache() -> Union[SharedCache, MemoryCache]:
+    """The process-wide cache: SQLite at SHARED_CACHE_PATH, or in memory when it is not set."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = SharedCache(SHARED_CACHE_PATH) if SHARED_CACHE_PATH else MemoryCache()
+    return _shared_cache
@@ -0,0 +1,141 @@
+"""
+Bounded self-repair loop for generated SQL.
+
+A generated query is validated (EXPLAIN) and executed against DuckDB. If
+DuckDB rejects it, the error and the failing SQL are sent back to the model
+for a fix, up to a maximum number of attempts and within a latency budget.
+Per-attempt timings can be appended to a JSONL log for tuning the budget
+(set SQL_REPAIR_LOG_PATH).
+"""
+
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Optional
+
+import pandas as pd
+
+from db import run_query, validate_sql
+from tracing import dataframe_stats, span
+
+
+MAX_ATTEMPTS = 3
+
+# Seconds allowed for validation, execution and repair calls together
+LATENCY_BUDGET = 20.0
+
+# Do not start a repair call with less time than this left
+MIN_REPAIR_SECONDS = 2.0
+
+# JSONL file for per-attempt timings, e.g. .cache/sql_repair_log.jsonl. Off by
+# default: the file holds every question asked and is never rotated
+REPAIR_LOG_PATH = os.getenv("SQL_REPAIR_LOG_PATH") or None
+
+
+@dataclass
+class RepairAttempt:
+    """Timing and outcome of one validate/execute (and optional repair) step."""
+
+    sql: str
+    error: Optional[str] = None
+    validate_seconds: float = 0.0
+    execute_seconds: float = 0.0
+    repair_seconds: float = 0.0
+
+
+@dataclass
+class RepairResult:
+    """Outcome of run_with_repair."""
+
+    sql: str
+    df: pd.DataFrame
+    succeeded: bool
+    error: Optional[str] = None
+    attempts: list = field(default_factory=list)
+    total_seconds: float = 0.0
+
+
+def run_with_repair(con: Any, question: str, sql: str,
+                    repair: Callable[[str, str, str, float], str],
+                    max_attempts: int = MAX_ATTEMPTS,
+                    latency_budget: float = LATENCY_BUDGET,
+                    log_path: Optional[str] = REPAIR_LOG_PATH) -> RepairResult:
+    """
+    Validate and run a generated query, asking the model to repair it on DuckDB errors.
+
+    Args:
+        con: DuckDB connection object
+        question: Natural language question the SQL answers
+        sql: Generated SQL query
+        repair: Callable (question, sql, error, timeout) -> repaired SQL
+        max_attempts: Maximum number of queries tried (including the first)
+        latency_budget: Seconds allowed for the whole loop
+        log_path: JSONL file for per-attempt timings (None to disable)
+
+    Returns:
+        RepairResult with the final SQL, the result DataFrame and attempt timings
+    """
+    start = time.monotonic()
+    attempts = []
+    error = None
+
+    for attempt_number in range(1, max_attempts + 1):
+        attempt = RepairAttempt(sql=sql)
+        attempts.append(attempt)
+
+        step = time.monotonic()
+        with span("validate_sql", attempt=attempt_number) as validate_span:
+            error = validate_sql(con, sql)
+            validate_span.set(valid=error is None)
+        attempt.validate_seconds = time.monotonic() - step
+
+        if error is None:
+            step = time.monotonic()
+            with span("query_df", attempt=attempt_number) as query_span:
+                try:
+                    df = run_query(con, sql)
+                    query_span.set(**dataframe_stats(df))
+                except Exception as e:
+                    error = str(e)
+                    query_span.set(error=error)
+            attempt.execute_seconds = time.monotonic() - step
+
+        attempt.error = error
+        if error is None:
+            return _finish(question, RepairResult(sql, df, True, None, attempts), start, log_path)
+
+        remaining = latency_budget - (time.monotonic() - start)
+        if attempt_number == max_attempts or remaining < MIN_REPAIR_SECONDS:
+            break
+
+        step = time.monotonic()
+        try:
+            with span("repair_sql", attempt=attempt_number, timeout=round(remaining, 2)):
+                sql = repair(question, sql, error, remaining)
+        except Exception as e:
+            attempt.repair_seconds = time.monotonic() - step
+            error = f"{error}\nRepair failed: {e}"
+            break
+        attempt.repair_seconds = time.monotonic() - step
+
+    return _finish(question, RepairResult(sql, pd.DataFrame(), False, error, attempts), start, log_path)
+
+
+def _finish(question: str, result: RepairResult, start: float, log_path: Optional[str]) -> RepairResult:
+    """Record the total time and append the attempt log."""
+    result.total_seconds = time.monotonic() - start
+    if log_path:
+        try:
+            os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+            with open(log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({
+                    "timestamp": time.time(),
+                    "question": question,
+                    "succeeded": result.succeeded,
+                    "total_seconds": round(result.total_seconds, 4),
+                    "attempts": [asdict(attempt) for attempt in result.attempts],
+                }, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+    return result
@@ -34,5 +34,12 @@ if __name__ == "__main__":
     try:
         times, temps = get_weather_data("Tokyo")
         print("\nData fetch completed")
+        
+        # 3) Keep the forecast in the local history (only new rows are added)
+        from forecast_store import ForecastStore
+        store = ForecastStore()
+        inserted = store.append_series("Tokyo", times, temps)
+        print(f"Stored {inserted} new forecast rows")
+        store.close()
     except Exception as e:
         print(f"Error: {e}")
\ No newline at end of file
@@ -1,32 +1,98 @@
-import requests
+import threading
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 
+from forecast_store import ForecastStore
+from weather_client import WeatherClient
+
+CITIES = ["Tokyo", "Osaka", "Kyoto", "Yokohama", "Nagoya", "Sapporo", "Fukuoka"]
+
+@st.cache_resource
+def get_weather_client():
+    # 接続プール・キャッシュをセッション間で共有する
+    client = WeatherClient()
+    # 選択肢の都市のジオコーディングを先に済ませ、ボタン押下時は予報の1往復だけにする
+    threading.Thread(target=client.prefetch_geocodes, args=(CITIES,), daemon=True).start()
+    return client
+
+@st.cache_resource
+def get_forecast_store():
+    # 取得した予報を履歴として蓄積する（同じ時間帯の再取得は追加されない）
+    return ForecastStore()
+
 def get_weather_data(city_name="Tokyo"):
-    # 1) ジオコーディング
-    geo = requests.get(
-        "https://geocoding-api.open-meteo.com/v1/search",
-        params={"name": city_name, "count": 1, "language": "ja", "format": "json"}
-    ).json()
-    lat = geo["results"][0]["latitude"]
-    lon = geo["results"][0]["longitude"]
+    # ジオコーディング（ディスクキャッシュ）→ 予報取得（1時間キャッシュ）→ 履歴に追記
+    times, temps = get_weather_client().get_weather_data(city_name)
+    get_forecast_store().append_series(city_name, times, temps)
+    return times, temps
 
-    # 2) 予報取得
-    forecast = requests.get(
-        "https://api.open-meteo.com/v1/forecast",
-        params={"latitude": lat, "longitude": lon, "hourly": "temperature_2m", "timezone": "Asia/Tokyo"}
-    ).json()
+def get_multi_city_weather(city_names):
+    # 全都市を並列に取得（同時実行数を制限し、失敗はバックオフ付きで再試行）
+    df = get_weather_client().fetch_many(city_names)
+    get_forecast_store().append(df)
+    return df
 
-    times = forecast["hourly"]["time"]
-    temps = forecast["hourly"]["temperature_2m"]
+def show_city_comparison():
+    st.header("複数都市の比較")
     
-    return times, temps
+    selected = st.multiselect("比較する都市", CITIES, default=CITIES[:3])
+    
+    if st.button("比較データを取得", disabled=not selected):
+        with st.spinner("データを取得中..."):
+            df = get_multi_city_weather(selected)
+        
+        for city, error in df.attrs.get("errors", {}).items():
+            st.warning(f"{city}のデータを取得できませんでした: {error}")
+        if df.empty:
+            return
+        
+        fig = px.line(df, x='time', y='temperature', color='city',
+                     title='都市別の時間別気温予報',
+                     labels={'time': '時間', 'temperature': '気温 (°C)', 'city': '都市'})
+        st.plotly_chart(fig, use_container_width=True)
+        
+        st.subheader("都市別の統計")
+        summary = df.groupby('city', observed=True)['temperature'].agg(['max', 'min', 'mean'])
+        summary.columns = ['最高気温', '最低気温', '平均気温']
+        st.dataframe(summary.round(1))
+
+def show_forecast_history():
+    st.header("予報履歴")
+    
+    store = get_forecast_store()
+    summary = store.issues()
+    if summary.empty:
+        st.info("まだ予報履歴がありません。天気データを取得すると蓄積されます。")
+        return
+    
+    # 再取得せず、蓄積済みの履歴から描画する
+    city = st.selectbox("履歴を表示する都市", summary['city'].tolist())
+    row = summary.set_index('city').loc[city]
+    dates = st.date_input(
+        "期間",
+        value=(row['first_time'].date(), row['last_time'].date()),
+        min_value=row['first_time'].date(),
+        max_value=row['last_time'].date(),
+    )
+    # 範囲の選択途中は日付が1つだけ返る
+    if len(dates) != 2:
+        return
+    start, end = dates
+
+    df = store.history([city], start=pd.Timestamp(start), end=pd.Timestamp(end) + pd.Timedelta(days=1, seconds=-1))
+    df['issued_at'] = df['issued_at'].dt.strftime('%Y-%m-%d %H:%M')
+    fig = px.line(df, x='time', y='temperature', color='issued_at',
+                 title=f'{city}の予報の推移（発表時刻別）',
+                 labels={'time': '時間', 'temperature': '気温 (°C)', 'issued_at': '取得時刻'})
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"取得回数: {row['issues']} / 保存行数: {row['rows']}")
 
 def main():
     st.title("天気予報ダッシュボード")
 
-    city = st.selectbox("都市を選択", ["Tokyo", "Osaka", "Kyoto", "Yokohama"])
+    city = st.selectbox("都市を選択", CITIES)
 
     if st.button("天気データを取得"):
         with st.spinner("データを取得中..."):
@@ -62,6 +128,9 @@ def main():
                 
             except Exception as e:
                 st.error(f"エラーが発生しました: {e}")
+    
+    show_city_comparison()
+    show_forecast_history()
 
 if __name__ == "__main__":
     main()
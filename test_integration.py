@@ -108,6 +108,14 @@ def test_visualization():
         assert chart_type in ['bar', 'line', 'pie', 'scatter', 'none'], f"Invalid chart type: {chart_type}"
         print(f"   ✅ Chart type detection: {chart_type}")
         
+        # LIST columns cannot be fingerprinted for the figure cache
+        import duckdb
+        from viz import build_chart
+        list_data = duckdb.sql("SELECT 'a' AS category, [1, 2] AS xs, 3 AS revenue").df()
+        chart_type, _ = build_chart(list_data)
+        assert chart_type == "bar", f"Unexpected chart type for a LIST column result: {chart_type}"
+        print("   ✅ Results with LIST columns are charted without the figure cache")
+        
         return True
         
     except Exception as e:
@@ -147,6 +155,1079 @@ def test_end_to_end():
         return False
 
 
+def test_dashboard_queries():
+    """Test the DuckDB query layer behind the BI dashboard."""
+    print("🔍 Testing dashboard queries...")
+    
+    try:
+        from db import init_db
+        from dashboard_queries import get_filter_options, aggregate_sales, daily_sales, SELECTION_FIELDS
+        
+        conn = init_db()
+        options = get_filter_options(conn)
+        assert options['categories'], "No categories found"
+        
+        args = (options['min_date'], options['max_date'], [])
+        kpi = aggregate_sales(conn, SELECTION_FIELDS, *args)
+        total = conn.execute("SELECT SUM(revenue) FROM sales").fetchone()[0]
+        assert kpi['revenue'].sum() == total, "KPI cube does not match table total"
+        
+        # Category filter is pushed down as a bind parameter
+        first = options['categories'][0]
+        panel = aggregate_sales(conn, ["category"], options['min_date'], options['max_date'], [first])
+        assert set(panel['category']) == {first}, "Category filter not applied"
+        
+        daily = daily_sales(conn, *args)
+        assert len(daily) <= conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0], "Daily panel not aggregated"
+        
+        # Server-side cross-filter: a chart is filtered by the other charts' selections only
+        from dashboard_queries import ensure_sales_cube, cross_filtered_sales
+        ensure_sales_cube(conn)
+        regions = cross_filtered_sales(conn, "region", {"category": [first], "region": ["North"]}, *args)
+        assert len(regions) > 1, "Chart was filtered by its own selection"
+        assert regions['revenue'].sum() == panel['revenue'].sum(), "Cross-filter totals do not match"
+        print(f"   ✅ Dashboard queries returned {len(kpi)} KPI rows and {len(daily)} daily rows")
+        
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ Dashboard queries failed: {e}")
+        return False
+
+
+def test_incremental_order_metrics():
+    """Test incremental monthly order metrics over an appended orders file."""
+    print("🔍 Testing incremental order metrics...")
+    
+    try:
+        import tempfile
+        import pandas as pd
+        from order_metrics import MonthlyOrderMetrics
+        
+        with open("sample_data/orders.csv", encoding="utf-8") as f:
+            lines = f.readlines()
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = os.path.join(tmp_dir, "orders.csv")
+            state_path = os.path.join(tmp_dir, "state.json")
+            with open(csv_path, "w", encoding="utf-8") as f:
+                f.writelines(lines[:1001])
+            MonthlyOrderMetrics(csv_path, state_path).refresh()
+            
+            # Append the rest plus one order in a new month; only that month must be touched
+            with open(csv_path, "a", encoding="utf-8") as f:
+                f.writelines(lines[1001:])
+                f.write("999999,1,Cancelled,F,2099-01-01 00:00:00,,,,1\n")
+            engine = MonthlyOrderMetrics(csv_path, state_path)
+            changed = engine.refresh()
+            assert "2099-01" in changed, "Appended month not updated"
+            assert engine.refresh() == [], "Unchanged file was re-read"
+            
+            metrics = engine.to_frame()
+        
+        orders = pd.read_csv("sample_data/orders.csv")
+        expected = orders.groupby(orders['created_at'].str.slice(0, 7))['status'].agg(
+            total='count', cancelled=lambda x: (x == 'Cancelled').sum()
+        )
+        actual = metrics.loc[expected.index]
+        assert (actual['total_orders'].values == expected['total'].values).all(), "Order counts differ"
+        assert (actual['cancelled_orders'].values == expected['cancelled'].values).all(), "Cancel counts differ"
+        print(f"   ✅ Incremental metrics match a full recount over {len(expected)} months")
+        
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ Incremental order metrics failed: {e}")
+        return False
+
+
+def test_fulfillment_latency():
+    """Test latency quantile sketches against exact quantiles."""
+    print("🔍 Testing fulfillment latency sketches...")
+    
+    try:
+        import numpy as np
+        import pandas as pd
+        from fulfillment import FulfillmentLatency, LatencySketch, latency_hours
+        
+        # Merged sketches answer like one sketch over all values (within relative accuracy)
+        values = np.random.default_rng(0).exponential(40, 10000)
+        left, right = LatencySketch(), LatencySketch()
+        left.add(values[:5000])
+        right.add(values[5000:])
+        left.merge(right)
+        for q in (0.5, 0.95, 0.99):
+            exact = np.quantile(values, q)
+            assert abs(left.quantile(q) - exact) <= exact * 0.02, f"Quantile {q} out of bounds"
+        
+        engine = FulfillmentLatency(state_path=None)
+        assert engine.refresh() > 0, "No orders read"
+        summary = engine.summary(by_status=False)
+        
+        orders = latency_hours(pd.read_csv("sample_data/orders.csv", dtype=str))
+        exact = orders.groupby("month")["ship_hours"].quantile(0.95)
+        ship = summary[summary["metric"] == "ship_hours"].set_index("month")["p95"]
+        assert ((ship - exact).abs() <= exact * 0.02).all(), "Monthly p95 out of bounds"
+        print(f"   ✅ Latency sketches within 2% for {len(ship)} months")
+        
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ Fulfillment latency failed: {e}")
+        return False
+
+
+def test_table_catalog():
+    """Test that orders/users are registered and described for the prompt."""
+    print("🔍 Testing table catalog...")
+    
+    try:
+        import tempfile
+        import duckdb
+        from db import init_db, register_tables, get_schema_prompt, TABLE_CATALOG
+        
+        conn = init_db()
+        types = dict(conn.execute("SELECT column_name, data_type FROM information_schema.columns WHERE table_name = 'orders'").fetchall())
+        assert types.get('created_at') == 'TIMESTAMP', "orders.created_at is not typed"
+        
+        # users.csv is optional; register a small one to check the join path
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            users_path = os.path.join(tmp_dir, "users.csv")
+            with open(users_path, "w", encoding="utf-8") as f:
+                f.write("id,age\n11,30\n16,40\n")
+            catalog = {**TABLE_CATALOG, "users": {**TABLE_CATALOG["users"], "path": users_path}}
+            
+            test_conn = duckdb.connect(":memory:")
+            assert register_tables(test_conn, catalog) == ["orders", "users"], "Tables not registered"
+            joined = test_conn.execute(
+                "SELECT COUNT(*) FROM orders o JOIN users u ON o.user_id = u.id"
+            ).fetchone()[0]
+            assert joined > 0, "orders/users join returned no rows"
+            
+            schema = get_schema_prompt(test_conn, catalog)
+            assert "orders.user_id = users.id" in schema, "Join key missing from schema prompt"
+        
+        assert "orders:" in get_schema_prompt(conn), "orders missing from schema prompt"
+        print(f"   ✅ Catalog registered orders and users ({joined} joined orders)")
+        
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ Table catalog failed: {e}")
+        return False
+
+
+def test_prompt_builder():
+    """Test schema-aware prompt building and the token budget."""
+    print("🔍 Testing prompt builder...")
+    
+    try:
+        from db import init_db, get_data_summary
+        from prompt_builder import PromptBuilder, INSTRUCTIONS
+        
+        conn = init_db()
+        summary = get_data_summary(conn)
+        builder = PromptBuilder(conn, summary)
+        
+        prompt = builder.build("キャンセルされた注文の月別件数は？")
+        assert "- orders:" in prompt.user and "- sales:" not in prompt.user, "Wrong tables selected"
+        assert prompt.static_prefix == INSTRUCTIONS, "Static prefix is not stable"
+        
+        prompt = builder.build("Electronics の地域別売上")
+        assert "'Electronics'" in prompt.user, "Value hints missing"
+        
+        # Quotes in values are doubled so the hints stay valid SQL literals
+        builder.values[("sales", "category")].append("Men's")
+        assert "'Men''s'" in builder.build("Men's の売上").user, "Quote in value hint not escaped"
+        
+        # A tight budget drops value hints and unreferenced columns but keeps the relevant ones
+        tight = PromptBuilder(conn, summary, token_budget=330).build("注文と売上の地域別")
+        assert tight.estimated_tokens < builder.build("注文と売上の地域別").estimated_tokens, "Budget not enforced"
+        assert "region" in tight.user and "revenue" in tight.user, "Relevant columns dropped"
+        print(f"   ✅ Prompt built with {prompt.estimated_tokens} estimated tokens")
+        
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ Prompt builder failed: {e}")
+        return False
+
+
+def test_sql_repair():
+    """Test the bounded validate/execute/repair loop."""
+    print("🔍 Testing SQL repair loop...")
+    
+    try:
+        from db import init_db
+        from sql_repair import run_with_repair
+        
+        conn = init_db()
+        calls = []
+        
+        def fake_repair(question, sql, error, timeout):
+            calls.append((error, timeout))
+            return sql.replace("revenu_total", "revenue")
+        
+        result = run_with_repair(conn, "カテゴリ別売上", "SELECT category, SUM(revenu_total) FROM sales GROUP BY category",
+                                 fake_repair, log_path=None)
+        assert result.succeeded and not result.df.empty, "Repaired query did not run"
+        assert len(result.attempts) == 2 and "revenu_total" in result.attempts[0].error, "Attempts not recorded"
+        assert 0 < calls[0][1] <= 20, "Remaining budget not passed as timeout"
+        
+        # Unfixable SQL stops after max_attempts
+        result = run_with_repair(conn, "x", "SELECT nope FROM sales", lambda *args: "SELECT nope FROM sales",
+                                 max_attempts=2, log_path=None)
+        assert not result.succeeded and len(result.attempts) == 2, "Attempt limit not enforced"
+        print(f"   ✅ Repaired in {len(calls)} call(s)")
+        
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ SQL repair failed: {e}")
+        return False
+
+
+def test_query_api():
+    """Test the UI-free pipeline through the ASGI query API."""
+    print("🔍 Testing headless query API...")
+    
+    try:
+        import asyncio
+        import json
+        import pyarrow as pa
+        from db import init_db
+        from pipeline import answer_question
+        from api import QueryAPI
+        
+        conn = init_db()
+        
+        def fake_generate(question, prompt_builder):
+            if "壊れた" in question:
+                raise Exception("model unavailable")
+            return "SELECT category, SUM(revenue) AS revenue FROM sales GROUP BY category ORDER BY category LIMIT 1000;"
+        
+        def answer(con, question, prompt_builder):
+            return answer_question(con, question, prompt_builder, generate=fake_generate)
+        
+        app = QueryAPI(con=conn, max_concurrency=2, max_queue=0, answer=answer)
+        
+        async def request(payload, headers=()):
+            messages = []
+            body = json.dumps(payload).encode()
+            
+            async def receive():
+                return {"type": "http.request", "body": body, "more_body": False}
+            
+            async def send(message):
+                messages.append(message)
+            
+            scope = {"type": "http", "method": "POST", "path": "/query", "headers": list(headers)}
+            await app(scope, receive, send)
+            return messages[0]["status"], messages[1]["body"]
+        
+        status, body = asyncio.run(request({"question": "カテゴリ別売上"}))
+        data = json.loads(body)
+        assert status == 200 and data["source"] == "generated" and data["row_count"] > 0, "JSON answer failed"
+        
+        status, body = asyncio.run(request({"question": "壊れた質問 月別売上"}, [(b"accept", b"application/vnd.apache.arrow.stream")]))
+        table = pa.ipc.open_stream(body).read_all()
+        assert status == 200 and table.schema.metadata[b"source"] == b"fallback", "Arrow fallback answer failed"
+        
+        status, _ = asyncio.run(request({}))
+        assert status == 400, "Missing question not rejected"
+        print(f"   ✅ API answered {data['row_count']} rows as JSON and {table.num_rows} rows as Arrow")
+        
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ Query API failed: {e}")
+        return False
+
+
+def test_batch_mode():
+    """Test batch answering with SQL dedupe and Parquet output."""
+    print("🔍 Testing batch mode...")
+    
+    try:
+        import os
+        import tempfile
+        import pandas as pd
+        from db import init_db
+        from run_batch import run_batch
+        
+        conn = init_db()
+        calls = []
+        
+        def fake_generate(question, prompt_builder):
+            calls.append(question)
+            if "地域" in question:
+                return "SELECT region, SUM(revenue) AS revenue FROM sales GROUP BY region LIMIT 1000;"
+            if "不明" in question:
+                raise Exception("model unavailable")
+            return "SELECT category, SUM(revenue) AS revenue FROM sales GROUP BY category LIMIT 1000;"
+        
+        questions = ["地域別の売上", "地域ごとの売上", "カテゴリ別の売上", "不明な質問 チャネル別"]
+        with tempfile.TemporaryDirectory() as tmp:
+            index = run_batch(conn, questions, tmp, generate=fake_generate,
+                              requests_per_second=0, query_workers=4)
+            saved = pd.read_parquet(os.path.join(tmp, "index.parquet"))
+            assert len(saved) == 4 and saved["result_file"].notna().all(), "Index incomplete"
+            assert saved.loc[0, "result_file"] == saved.loc[1, "result_file"], "Identical SQL not deduped"
+            assert saved.loc[3, "source"] == "fallback", "Fallback not used"
+            result = pd.read_parquet(os.path.join(tmp, saved.loc[2, "result_file"]))
+            assert not result.empty, "Result file empty"
+        
+        assert len(calls) == 4, "Each question should be generated once"
+        print(f"   ✅ {len(questions)} questions answered with {index.attrs['distinct_queries']} distinct queries")
+        
+        # Repairs run on the query threads but stay within llm_concurrency
+        import threading
+        import time
+        active, peak, lock = [0], [0], threading.Lock()
+        
+        def broken_generate(question, prompt_builder):
+            return f"SELECT no_such_column_{abs(hash(question))} FROM sales LIMIT 1000;"
+        
+        def slow_repair(question, sql, error, timeout):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return sql
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            run_batch(conn, [f"質問 {i}" for i in range(8)], tmp, generate=broken_generate,
+                      repair=slow_repair, llm_concurrency=2, requests_per_second=0, query_workers=8)
+        assert 0 < peak[0] <= 2, f"Repair calls not bounded by llm_concurrency: {peak[0]} at once"
+        print("   ✅ Repair calls share the model concurrency limit")
+        
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ Batch mode failed: {e}")
+        return False
+
+
+def test_tracing():
+    """Test span instrumentation and the JSONL exporter."""
+    print("🔍 Testing request tracing...")
+    
+    try:
+        import json
+        import os
+        import tempfile
+        from db import init_db
+        from pipeline import answer_question
+        from tracing import span, start_trace
+        
+        conn = init_db()
+        
+        def fake_generate(question, prompt_builder):
+            return "SELECT region, SUM(revenue) AS revenue FROM sales GROUP BY region LIMIT 1000;"
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "traces.jsonl")
+            with start_trace("chat_turn", export_path=path, question="地域別") as trace:
+                answer_question(conn, "地域別", generate=fake_generate)
+            
+            breakdown = trace.breakdown()
+            stages = [stage.strip() for stage in breakdown["stage"]]
+            for stage in ["chat_turn", "generate_sql", "validate_sql", "query_df", "generate_insights"]:
+                assert stage in stages, f"Missing span {stage}"
+            assert "rows=4" in " ".join(breakdown["attributes"]), "Row count not recorded"
+            
+            with open(path, encoding="utf-8") as f:
+                spans = [json.loads(line) for line in f]
+            assert len(spans) == len(stages) and all(s["traceId"] == trace.trace_id for s in spans), "Export incomplete"
+            assert sum(1 for s in spans if s["parentSpanId"] is None) == 1, "Spans not nested under the root"
+        
+        # Outside a trace spans are no-ops
+        with span("orphan") as orphan:
+            orphan.set(rows=1)
+        print(f"   ✅ {len(stages)} spans recorded in {breakdown['ms'].iloc[0]:.1f} ms")
+        
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ Tracing failed: {e}")
+        return False
+
+
+def test_benchmark_harness():
+    """Test the mock LLM server used by the benchmark and that its turns bypass the caches."""
+    print("🔍 Testing benchmark harness...")
+    
+    try:
+        import os
+        import tempfile
+        import pandas as pd
+        from benchmark import MockLLMServer, answer_uncached
+        from db import init_db
+        from pipeline import answer_question, generate_safe_sql
+        from tracing import start_trace
+        
+        saved = {key: os.environ.get(key) for key in ("OPENAI_BASE_URL", "OPENAI_API_KEY")}
+        try:
+            with MockLLMServer() as server:
+                os.environ["OPENAI_BASE_URL"] = server.base_url
+                os.environ["OPENAI_API_KEY"] = "mock"
+                sql = generate_safe_sql("地域ごとの売上を教えて")
+        finally:
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+        
+        assert "region" in sql and sql.endswith(";"), "Mock LLM answer not used"
+        print("   ✅ Mock LLM answers through the OpenAI client")
+        
+        # A repeated question is queried again, even after the shared cache has it
+        con = init_db()
+        answer_question(con, "地域ごとの売上を教えて")
+        for _ in range(2):
+            with start_trace("benchmark_turn", export_path=None) as trace:
+                answer_uncached(con, "地域ごとの売上を教えて")
+            stages = [s.name for s in trace.spans]
+            assert "query_df" in stages, f"Benchmark turn served from the cache: {stages}"
+        print("   ✅ Benchmark turns run the query every time")
+        
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ Benchmark harness failed: {e}")
+        return False
+
+
+def test_synthetic_data():
+    """Test the synthetic sales and orders generator."""
+    print("🔍 Testing synthetic data generator...")
+    
+    try:
+        import os
+        import tempfile
+        import duckdb
+        import pandas as pd
+        from datagen import write_dataset
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            sales_csv = os.path.join(tmp, "sales.csv")
+            write_dataset("sales", 5000, sales_csv, fmt="csv", partition_by_month=False, chunk_rows=1500)
+            sales = pd.read_csv(sales_csv)
+            sample = pd.read_csv("data/sample_sales.csv")
+            assert len(sales) == 5000 and list(sales.columns) == list(sample.columns), "Sales schema mismatch"
+            assert set(sales["category"]) == set(sample["category"]), "Categories differ from the sample"
+            assert (sales["revenue"] == sales["units"] * sales["unit_price"]).all(), "Revenue not consistent"
+            assert sales["date"].is_monotonic_increasing, "Sales not in date order"
+            
+            files = write_dataset("orders", 20000, os.path.join(tmp, "orders"), chunk_rows=7000)
+            assert all("month=2025-" in path for path in files), "Orders not partitioned by month"
+            con = duckdb.connect()
+            checks = con.execute(f"""
+                SELECT
+                    COUNT(*),
+                    COUNT(*) FILTER (WHERE status IN ('Processing', 'Cancelled') AND shipped_at IS NOT NULL),
+                    COUNT(*) FILTER (WHERE status = 'Returned' AND NOT (created_at <= shipped_at
+                                     AND shipped_at <= delivered_at AND delivered_at <= returned_at)),
+                    COUNT(DISTINCT month)
+                FROM read_parquet('{tmp}/orders/**/*.parquet', hive_partitioning = true)
+            """).fetchone()
+            assert checks[0] == 20000 and checks[1] == 0 and checks[2] == 0, "Status timestamps inconsistent"
+            print(f"   ✅ Generated sales and {checks[3]} monthly order partitions")
+        
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ Synthetic data failed: {e}")
+        return False
+
+
+def test_fast_startup():
+    """Test that importing the chatbot does not load the LLM SDKs or plotly.express, nor the headless entry points streamlit."""
+    print("🔍 Testing lazy imports...")
+    
+    try:
+        import subprocess
+        
+        code = "import sys, chatbot_app; print(sorted(m for m in ('openai', 'anthropic', 'plotly.express') if m in sys.modules))"
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        assert output.strip().splitlines()[-1] == "[]", f"Heavy modules imported at startup: {output.strip()}"
+        print("   ✅ LLM SDKs and plotly load on first use")
+        
+        code = "import sys, api, run_batch, pipeline; print('streamlit' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        assert output.strip().splitlines()[-1] == "False", "Headless entry points import streamlit"
+        print("   ✅ API and batch mode run without streamlit")
+        
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ Lazy imports failed: {e}")
+        return False
+
+
+def start_weather_stub(delay: float = 0.0, fail_first: int = 0):
+    """Start a local stand-in for the Open-Meteo APIs; returns (server, base_url, hits).
+    
+    The first `fail_first` forecast requests get 503.
+    """
+    import json
+    import threading
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+    
+    cities = {"Tokyo": (35.69, 139.69), "Osaka": (34.69, 135.50), "Kyoto": (35.02, 135.76)}
+    hits = {"search": 0, "forecast": 0}
+    lock = threading.Lock()
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            endpoint = url.path.rsplit("/", 1)[-1]
+            with lock:
+                hits[endpoint] = hits.get(endpoint, 0) + 1
+                failing = endpoint == "forecast" and hits[endpoint] <= fail_first
+            time.sleep(delay)
+            if failing:
+                self.send_error(503)
+                return
+            if endpoint == "search":
+                location = cities.get(params["name"])
+                payload = {"results": [{"latitude": location[0], "longitude": location[1]}]} if location else {}
+            else:
+                base = float(params["latitude"])
+                times = [f"2025-01-01T{hour:02d}:00" for hour in range(24)]
+                payload = {"hourly": {"time": times, "temperature_2m": [round(base / 5 + hour / 10, 1) for hour in range(24)]}}
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1", hits
+
+
+def test_weather_client():
+    """Test pooled, cached weather fetching against a local stand-in server."""
+    print("🔍 Testing weather client...")
+    
+    try:
+        import os
+        import tempfile
+        from weather_client import WeatherClient
+        
+        server, base_url, hits = start_weather_stub()
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                cache_path = os.path.join(tmp, "geocode.json")
+                
+                def make_client():
+                    return WeatherClient(f"{base_url}/search", f"{base_url}/forecast", geocode_cache_path=cache_path)
+                
+                client = make_client()
+                times, temps = client.get_weather_data("Tokyo")
+                client.get_weather_data("Tokyo")
+                assert len(times) == len(temps) == 24, "Unexpected forecast shape"
+                assert hits == {"search": 1, "forecast": 1}, f"Repeat lookup not cached: {hits}"
+                
+                # Geocodes survive a restart; forecasts are cached per process
+                make_client().get_weather_data("Tokyo")
+                assert hits == {"search": 1, "forecast": 2}, f"Geocode cache not persisted: {hits}"
+                
+                located = client.prefetch_geocodes(["Osaka", "Kyoto", "Atlantis"])
+                assert located["Osaka"] == (34.69, 135.50) and isinstance(located["Atlantis"], ValueError), "Prefetch failed"
+        finally:
+            server.shutdown()
+            server.server_close()
+        print(f"   ✅ {hits['search']} geocoding and {hits['forecast']} forecast requests served")
+        
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ Weather client failed: {e}")
+        return False
+
+
+def test_multi_city_weather():
+    """Test the concurrent multi-city forecast fetch with retries."""
+    print("🔍 Testing multi-city weather fetch...")
+    
+    try:
+        import time
+        from weather_client import WeatherClient
+        
+        delay = 0.2
+        server, base_url, hits = start_weather_stub(delay=delay, fail_first=1)
+        try:
+            # One retry: the 503 is retried once by the session, not again on top of it
+            client = WeatherClient(f"{base_url}/search", f"{base_url}/forecast",
+                                   geocode_cache_path=None, retries=1, backoff=0.05)
+            start = time.perf_counter()
+            df = client.fetch_many(["Tokyo", "Osaka", "Kyoto", "Atlantis"], concurrency=4)
+            seconds = time.perf_counter() - start
+        finally:
+            server.shutdown()
+            server.server_close()
+        
+        assert list(df.columns) == ["city", "time", "temperature"], f"Unexpected columns: {list(df.columns)}"
+        assert list(df["city"].cat.categories) == ["Tokyo", "Osaka", "Kyoto"], "Unexpected cities"
+        assert len(df) == 3 * 24 and str(df["time"].dtype).startswith("datetime64"), "Unexpected frame"
+        assert list(df.attrs["errors"]) == ["Atlantis"], f"Unexpected errors: {df.attrs['errors']}"
+        assert hits["forecast"] == 4, f"Failed forecast not retried: {hits}"
+        # Sequential fetching would take about 7 round trips of `delay`
+        assert seconds < 5 * delay, f"Cities were not fetched concurrently ({seconds:.2f}s)"
+        print(f"   ✅ 3 cities ({len(df)} rows) in {seconds:.2f}s with one retried forecast")
+        
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ Multi-city weather fetch failed: {e}")
+        return False
+
+
+def test_forecast_history():
+    """Test the append-only forecast history store."""
+    print("🔍 Testing forecast history store...")
+    
+    try:
+        import os
+        import tempfile
+        import pandas as pd
+        from forecast_store import ForecastStore
+        
+        times = pd.date_range("2025-01-01", periods=48, freq="h")
+        
+        def forecast(city, offset):
+            return pd.DataFrame({"city": city, "time": times, "temperature": [t.hour + offset for t in times]})
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "history.duckdb")
+            store = ForecastStore(path)
+            first, second = pd.Timestamp("2025-01-01 00:00"), pd.Timestamp("2025-01-01 06:00")
+            
+            assert store.append(pd.concat([forecast("Tokyo", 0), forecast("Osaka", 1)]), first) == 96, "Initial append failed"
+            assert store.append(forecast("Tokyo", 0), first) == 0, "Duplicate rows were appended"
+            assert store.append_series("Tokyo", times, [t.hour + 0.5 for t in times], second) == 48, "New issue not appended"
+            store.close()
+            
+            # History survives reopening
+            store = ForecastStore(path)
+            day = store.history(["Tokyo"], start="2025-01-02", end="2025-01-02 23:00")
+            assert len(day) == 48 and day["time"].min() == pd.Timestamp("2025-01-02"), f"Range query returned {len(day)} rows"
+            
+            latest = store.history(["Tokyo"], latest_only=True)
+            assert len(latest) == 48 and (latest["issued_at"] == second).all(), "Latest issue not selected"
+            
+            summary = store.issues().set_index("city")
+            assert summary.loc["Tokyo", "issues"] == 2 and summary.loc["Osaka", "rows"] == 48, "Unexpected summary"
+            store.close()
+        print("   ✅ 144 rows stored, duplicates ignored, range and latest queries correct")
+        
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ Forecast history store failed: {e}")
+        return False
+
+
+def test_insight_engine():
+    """Test the one-query statistical insight engine."""
+    print("🔍 Testing insight engine...")
+    
+    try:
+        import pandas as pd
+        from insights import compute_insights, pick_columns
+        from pipeline import generate_insights
+        
+        months = ["2025-01", "2025-02", "2025-03"] * 4
+        categories = ["A"] * 3 + ["B"] * 3 + ["C"] * 3 + ["D"] * 3
+        df = pd.DataFrame({
+            "month": months,
+            "category": categories,
+            "total_units": [1] * 12,
+            "total_revenue": [50, 60, 70, 10, 10, 10, 5, 5, 5, 1, 1, 2],
+        })
+        
+        assert pick_columns(df) == ("total_revenue", "category", "month"), f"Unexpected columns: {pick_columns(df)}"
+        stats = compute_insights(df)
+        assert stats.total == 229 and stats.groups == 4, "Unexpected total"
+        assert [item["key"] for item in stats.top] == ["A", "B", "C"], "Unexpected top contributors"
+        assert abs(stats.top[0]["share"] - 180 / 229) < 1e-9, "Unexpected share"
+        assert stats.pareto_groups == 2, f"Unexpected Pareto count: {stats.pareto_groups}"
+        assert stats.latest["period"] == "2025-03" and stats.latest["total"] == 87 and stats.latest["previous"] == 76, \
+            f"Unexpected period delta: {stats.latest}"
+        
+        # Outliers on a longer series
+        series = pd.DataFrame({"date": pd.date_range("2025-01-01", periods=20), "revenue": [100] * 10 + [101] * 9 + [900]})
+        outliers = compute_insights(series).outliers
+        assert len(outliers) == 1 and outliers[0]["value"] == 900, f"Unexpected outliers: {outliers}"
+        
+        insights = generate_insights(df)
+        assert insights[1] == "Total revenue: ¥229" and any("2025-03 vs 2025-02" in line for line in insights), insights
+        assert generate_insights(pd.DataFrame({"name": ["x"]})) == ["Found 1 records matching your query"], "Non-numeric result"
+        print(f"   ✅ {len(insights)} insights, top/share/Pareto/period delta/outliers correct")
+        
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ Insight engine failed: {e}")
+        return False
+
+
+def test_anomaly_detection():
+    """Test incremental rolling robust z-score anomaly detection."""
+    print("🔍 Testing anomaly detection...")
+    
+    try:
+        import duckdb
+        import pandas as pd
+        from anomalies import AnomalyDetector, anomaly_insights
+        from pipeline import answer_question
+        
+        sales = pd.read_csv("data/sample_sales.csv")
+        sales["date"] = pd.to_datetime(sales["date"]).dt.date
+        # Plant a spike on one category and day
+        spike = (sales["category"] == "Groceries") & (sales["date"] == pd.Timestamp("2025-03-10").date())
+        sales.loc[spike, "revenue"] *= 50
+        cutoff = pd.Timestamp("2025-03-01").date()
+        
+        # Incremental: score up to the cutoff, then append the rest
+        incremental = duckdb.connect()
+        incremental.execute("CREATE TABLE sales AS SELECT * FROM sales WHERE date < $cutoff", {"cutoff": cutoff})
+        detector = AnomalyDetector(incremental)
+        first = detector.refresh()
+        incremental.register("new_sales", sales[sales["date"] >= cutoff])
+        incremental.execute("INSERT INTO sales SELECT * FROM new_sales")
+        second = detector.refresh()
+        assert (first, second, detector.refresh()) == (59, 31, 0), f"Unexpected refreshed days: {first}, {second}"
+        
+        # Same scores as scoring everything at once
+        full = duckdb.connect()
+        full.execute("CREATE TABLE sales AS SELECT * FROM sales")
+        AnomalyDetector(full).refresh()
+        query = "SELECT dimension, member, date, round(z, 6) FROM anomaly_scores ORDER BY ALL"
+        assert incremental.execute(query).fetchall() == full.execute(query).fetchall(), "Incremental scores differ"
+        
+        top = detector.top_anomalies(1, dimensions=["category"])
+        assert (top["member"].iloc[0], top["date"].iloc[0]) == ("Groceries", pd.Timestamp("2025-03-10")), f"Spike not found: {top}"
+        insights = anomaly_insights(incremental, pd.DataFrame({"category": ["Groceries"], "revenue": [1]}))
+        assert insights and "Groceries on 2025-03-10" in insights[0], f"Unexpected insights: {insights}"
+        assert anomaly_insights(incremental, pd.DataFrame({"status": ["Shipped"], "orders": [1]})) == [], "Orders got sales anomalies"
+        
+        result = answer_question(incremental, "カテゴリ別売上", generate=lambda q, p: "SELECT category, SUM(revenue) AS revenue FROM sales GROUP BY 1")
+        assert any(line.startswith("Unusual day: Groceries") for line in result.insights), "No anomaly chat insight"
+        print(f"   ✅ {first}+{second} days scored incrementally, spike found: {insights[0]}")
+        
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ Anomaly detection failed: {e}")
+        return False
+
+
+def test_enum_columns():
+    """Test ENUM inference for low-cardinality columns and the DATE month key."""
+    print("🔍 Testing ENUM columns...")
+    
+    try:
+        import duckdb
+        import pandas as pd
+        from db import apply_enum_types, clear_db_cache, describe_tables, init_db, run_query
+        from prompt_builder import PromptBuilder
+        from viz import build_chart, detect_chart_type, format_months
+        
+        con = duckdb.connect()
+        con.execute("""
+            CREATE TABLE t AS
+            SELECT i, ['a', 'b''c', NULL][i % 3 + 1] AS small, CAST(i AS VARCHAR) AS unique_text
+            FROM range(1000) r(i)
+        """)
+        assert apply_enum_types(con, "t") == ["small"], "Unexpected ENUM columns"
+        types = dict(con.execute("SELECT column_name, data_type FROM information_schema.columns WHERE table_name = 't'").fetchall())
+        assert types["small"].startswith("ENUM") and types["unique_text"] == "VARCHAR", f"Unexpected types: {types}"
+        assert con.execute("SELECT COUNT(*) FROM t WHERE small = 'b''c'").fetchone()[0] == 333, "ENUM filter failed"
+        assert con.execute("SELECT i FROM t LIMIT 1").fetchone()[0] == 0, "Row order not kept"
+        
+        clear_db_cache()
+        sales = init_db()
+        info = describe_tables(sales)["sales"]
+        types = {name: column_type for name, column_type, _ in info["columns"]}
+        assert all(types[c] == "ENUM" for c in ["category", "region", "sales_channel", "customer_segment"]), types
+        assert types["month"] == "DATE" and info["values"]["region"] == ["East", "North", "South", "West"], "Unexpected schema"
+        
+        df = run_query(sales, "SELECT month, category, SUM(revenue) AS revenue FROM sales GROUP BY ALL ORDER BY ALL")
+        assert str(df["category"].dtype) == "category" and pd.api.types.is_datetime64_any_dtype(df["month"]), "Unexpected dtypes"
+        assert detect_chart_type(df) == "line", "DATE month not detected as time series"
+        assert format_months(df)["month"].iloc[0] == "2025-01", "Month not shown as YYYY-MM"
+        assert build_chart(df)[1].layout.xaxis.tickformat == "%Y-%m", "Chart axis not formatted by month"
+        
+        # Every fallback and every month filter the prompt suggests runs on the DATE month
+        from db import MONTH_FILTER_EXAMPLES
+        from fallbacks import FALLBACKS
+        for name, sql in FALLBACKS.items():
+            assert not run_query(sales, sql).empty, f"Fallback {name} returned nothing"
+        for example in MONTH_FILTER_EXAMPLES:
+            rows = run_query(sales, f"SELECT COUNT(*) AS n FROM sales WHERE {example}")["n"].iloc[0]
+            assert rows > 0, f"Month filter matched nothing: {example}"
+        
+        prompt = PromptBuilder(sales).build("地域別の売上")
+        assert "region (ENUM: 'East', 'North', 'South', 'West')" in prompt.user, "ENUM values missing from prompt"
+        print(f"   ✅ ENUM columns inferred, month stored as DATE ({len(df)} month × category rows)")
+        
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ ENUM columns failed: {e}")
+        return False
+
+
+def test_hot_reload():
+    """Test background data reload with an atomic snapshot swap."""
+    print("🔍 Testing hot data reload...")
+    
+    try:
+        import os
+        import shutil
+        import tempfile
+        from anomalies import ANOMALY_SCORES_TABLE, get_detector
+        from db import LiveConnection, load_database
+        
+        tmpdir = tempfile.mkdtemp()
+        csv_path = os.path.join(tmpdir, "sales.csv")
+        shutil.copy("data/sample_sales.csv", csv_path)
+        live = LiveConnection(lambda: load_database(csv_path, catalog={}), [csv_path], interval=0)
+        rows = live.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+        get_detector(live)
+        hooked = []
+        live.add_reload_hook(lambda con: hooked.append(con.execute("SELECT COUNT(*) FROM sales").fetchone()[0]))
+        
+        # A query started before the swap keeps reading its snapshot
+        old_cursor = live.cursor()
+        with open(csv_path, "a") as f:
+            f.write("2025-06-30,Electronics,1,1000,North,Online,Consumer,1000\n")
+        os.utime(csv_path, ns=(0, 10**18))
+        assert not live.check(), "Reloaded before the file settled"
+        assert live.check() and live.version == 2, "Snapshot not swapped"
+        assert hooked == [rows + 1], f"Reload hook not run on the new snapshot: {hooked}"
+        assert live.execute("SELECT COUNT(*) FROM sales").fetchone()[0] == rows + 1, "New rows not visible"
+        assert old_cursor.execute("SELECT COUNT(*) FROM sales").fetchone()[0] == rows, "Old cursor saw the new snapshot"
+        assert live.execute(f"SELECT COUNT(*) FROM {ANOMALY_SCORES_TABLE}").fetchone()[0] > 0, "Anomaly tables not prebuilt"
+        
+        # A broken file keeps the current snapshot
+        with open(csv_path, "w") as f:
+            f.write("not,a,sales,file\n1,2,3,4\n")
+        live.check()
+        assert not live.check() and live.last_error and live.version == 2, "Broken file replaced the snapshot"
+        assert live.execute("SELECT COUNT(*) FROM sales").fetchone()[0] == rows + 1, "Snapshot lost after failed reload"
+        print(f"   ✅ Swapped {rows} -> {rows + 1} rows (v{live.version}); failed reload kept the snapshot")
+        
+        # The chatbot takes over the summary and prompt of reloaded data only once it is live
+        from chatbot_app import DataLoader
+        loader = DataLoader.__new__(DataLoader)
+        loader.result, loader._staged = (live, {}, None), None
+        live.add_reload_hook(loader._reloaded)
+        failures = [RuntimeError("later hook failed")]
+        
+        def fail_once(con):
+            if failures:
+                raise failures.pop()
+        
+        live.add_reload_hook(fail_once)
+        shutil.copy("data/sample_sales.csv", csv_path)
+        assert not live.reload() and loader.current()[2] is None, "Prompt of a failed reload went live"
+        assert live.reload() and loader.current()[1]["total_records"] == rows, "Prompt not updated after the swap"
+        
+        # A summary that cannot be built fails the reload instead of going live empty
+        import duckdb
+        from db import get_data_summary
+        try:
+            get_data_summary(duckdb.connect())
+            raise AssertionError("Summary of a database without sales did not fail")
+        except duckdb.Error:
+            pass
+        print("   ✅ Chatbot prompt follows only snapshots that went live")
+        
+        live.close()
+        shutil.rmtree(tmpdir)
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ Hot reload failed: {e}")
+        return False
+
+
+def test_shared_snapshot():
+    """Test workers on a shared read-only snapshot with shared SQL/result caches."""
+    print("🔍 Testing shared snapshot and caches...")
+    
+    try:
+        import os
+        import shutil
+        import subprocess
+        import sys
+        import tempfile
+        from db import LiveConnection, is_read_only, open_snapshot, publish_snapshot
+        from pipeline import answer_question
+        from run_workers import load_for_snapshot
+        from shared_cache import SharedCache
+        from dashboard_queries import ensure_sales_cube
+        from anomalies import get_detector
+        
+        tmpdir = tempfile.mkdtemp()
+        source = load_for_snapshot("data/sample_sales.csv")
+        pointer = publish_snapshot(source, tmpdir)
+        
+        # Two workers attach to the same file; derived tables are already there
+        workers = [LiveConnection(lambda: open_snapshot(pointer), [pointer], interval=0) for _ in range(2)]
+        assert all(is_read_only(w) for w in workers), "Snapshot not attached read-only"
+        assert workers[0].data_key == workers[1].data_key, "Workers disagree on the data version"
+        ensure_sales_cube(workers[0])
+        assert len(get_detector(workers[0]).top_anomalies(5)) > 0, "Anomaly scores missing from snapshot"
+        
+        calls = []
+        def generate(question, builder):
+            calls.append(question)
+            return "SELECT region, SUM(revenue) AS revenue FROM sales GROUP BY region ORDER BY region"
+        
+        cache = SharedCache(os.path.join(tmpdir, "cache.sqlite"))
+        first = answer_question(workers[0], "地域ごとの売上", generate=generate, cache=cache)
+        second = answer_question(workers[1], "  地域ごとの売上 ", generate=generate, cache=cache)
+        assert not first.cached and second.cached and len(calls) == 1, "Second worker did not reuse the answer"
+        assert second.df["revenue"].tolist() == first.df["revenue"].tolist(), "Cached result differs"
+        assert second.insights == first.insights, "Cached insights differ"
+        
+        # Another process reads the snapshot and the cache at the same time
+        script = (
+            "import sys; from db import open_snapshot; from shared_cache import SharedCache;"
+            f"con = open_snapshot({pointer!r}); c = SharedCache({cache.path!r});"
+            f"print(con.execute('SELECT COUNT(*) FROM sales').fetchone()[0], c.stats()['results'])"
+        )
+        out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=60)
+        assert out.stdout.split() == ["540", "1"], f"Other process failed: {out.stdout} {out.stderr[-300:]}"
+        
+        # A new snapshot is a new data version
+        source.execute("DELETE FROM sales WHERE region = 'North'")
+        publish_snapshot(source, tmpdir)
+        workers[0].check()
+        assert workers[0].check() and workers[0].data_key != workers[1].data_key, "New snapshot not picked up"
+        third = answer_question(workers[0], "地域ごとの売上", generate=generate, cache=cache)
+        assert not third.cached and "North" not in third.df["region"].tolist(), "Stale cache entry served"
+        print(f"   ✅ 2 workers on one snapshot, cache hit across workers and processes, reload on republish")
+        
+        for w in workers:
+            w.close()
+        shutil.rmtree(tmpdir)
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ Shared snapshot failed: {e}")
+        return False
+
+
+def test_warmup():
+    """Test the startup warm-up of sample questions and fallback queries."""
+    print("🔍 Testing startup warm-up...")
+    
+    try:
+        from db import init_db
+        from fallbacks import FALLBACKS, SAMPLE_QUESTIONS
+        from pipeline import answer_question
+        from viz import _figures, _fingerprint
+        from warmup import Warmup
+        
+        conn = init_db()
+        calls = []
+        
+        def fake_generate(question, prompt_builder):
+            calls.append(question)
+            if "地域" in question:
+                return "SELECT region, SUM(revenue) AS revenue FROM sales GROUP BY region ORDER BY region"
+            raise Exception("model unavailable")
+        
+        def answer(con, question, prompt_builder):
+            return answer_question(con, question, prompt_builder, generate=fake_generate)
+        
+        warmup = Warmup(conn, answer=answer)
+        assert warmup.summary().startswith("Warm-up running: 0/"), "Unexpected initial state"
+        warmup.start().join(timeout=60)
+        assert warmup.finished and warmup.done == warmup.total == len(SAMPLE_QUESTIONS) + len(FALLBACKS), warmup.summary()
+        assert warmup.failed == 0, [item.error for item in warmup.items if item.error]
+        
+        # The first real click is served from the caches
+        calls.clear()
+        generated = answer(conn, "地域ごとの売上を教えて", None)
+        assert generated.cached and not calls, "Generated SQL not served from the cache"
+        fallback = answer(conn, "平均単価をチャネル別に分析して", None)
+        assert fallback.cached and fallback.source == "fallback", "Fallback result not served from the cache"
+        assert _fingerprint(generated.df) in _figures and _fingerprint(fallback.df) in _figures, "Figures not cached"
+        print(f"   ✅ {warmup.summary()}; first clicks served from the caches")
+        
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ Warm-up failed: {e}")
+        return False
+
+
+def test_paged_results():
+    """Test server-side paging, sorting and filtering of query results."""
+    print("🔍 Testing paged result table...")
+    
+    try:
+        import duckdb
+        from db import count_rows, query_page, remove_row_cap
+        from llm_sql_openai import enforce_limit
+        
+        con = duckdb.connect()
+        con.execute("CREATE TABLE big AS SELECT i, 'cat' || (i % 7) AS c, (i * 37) % 1000 AS v FROM range(1000000) t(i)")
+        columns = ["i", "c", "v"]
+        
+        # The safety cap is lifted for paging; a LIMIT asked for by the question is kept
+        sql = remove_row_cap(enforce_limit("SELECT i, c, v FROM big ORDER BY i"))
+        assert sql == "SELECT i, c, v FROM big ORDER BY i", f"Cap not removed: {sql}"
+        assert remove_row_cap("SELECT * FROM big LIMIT 3") == "SELECT * FROM big LIMIT 3", "Question LIMIT removed"
+        assert remove_row_cap(enforce_limit("SELECT * FROM big LIMIT 1000")).endswith("LIMIT 1000;"), "Query's own LIMIT 1000 removed"
+        assert remove_row_cap(enforce_limit("SELECT * FROM big LIMIT 5000")) == "SELECT * FROM big", "Lowered LIMIT not removed"
+        
+        assert count_rows(con, sql, columns) == 1_000_000, "Wrong row count"
+        page = query_page(con, sql, columns, page=2, page_size=50)
+        assert page["i"].tolist() == list(range(100, 150)), "Wrong page"
+        
+        page = query_page(con, sql, columns, page=1, page_size=3, sort_by="v", descending=True, search="CAT3")
+        assert (page["c"] == "cat3").all() and (page["v"] == 999).all(), "Sort or filter not applied"
+        assert page["i"].is_monotonic_increasing, "Ties not broken by the other columns"
+        assert count_rows(con, sql, columns, "cat3") == 142_857, "Filtered count wrong"
+        
+        # The filter text is matched literally, wildcards included
+        labels = "SELECT * FROM (VALUES ('50%'), ('500'), ('a_b'), ('axb'), ('c\\d')) AS t(label)"
+        assert count_rows(con, labels, ["label"], "0%") == 1, "% treated as a wildcard"
+        assert query_page(con, labels, ["label"], search="a_b")["label"].tolist() == ["a_b"], "_ treated as a wildcard"
+        assert count_rows(con, labels, ["label"], "c\\d") == 1, "Backslash not matched literally"
+        
+        try:
+            query_page(con, sql, columns, sort_by="i; DROP TABLE big")
+            raise AssertionError("Unknown sort column accepted")
+        except ValueError:
+            pass
+        print(f"   ✅ Paged 1,000,000 rows 50 at a time with server-side sort and filter")
+        
+        return True
+        
+    except Exception as e:
+        print(f"   ❌ Paged results failed: {e}")
+        return False
+
+
 def main():
     """Run all integration tests."""
     print("🚀 Running Sales Data Analysis Chatbot Integration Tests")
@@ -157,7 +1238,29 @@ def main():
         test_fallback_system,
         test_sql_safety,
         test_visualization,
-        test_end_to_end
+        test_end_to_end,
+        test_dashboard_queries,
+        test_incremental_order_metrics,
+        test_fulfillment_latency,
+        test_table_catalog,
+        test_prompt_builder,
+        test_sql_repair,
+        test_query_api,
+        test_batch_mode,
+        test_tracing,
+        test_benchmark_harness,
+        test_synthetic_data,
+        test_fast_startup,
+        test_weather_client,
+        test_multi_city_weather,
+        test_forecast_history,
+        test_insight_engine,
+        test_anomaly_detection,
+        test_enum_columns,
+        test_hot_reload,
+        test_shared_snapshot,
+        test_warmup,
+        test_paged_results
     ]
     
     passed = 0
@@ -0,0 +1,206 @@
+"""
+Request-scoped tracing for chat turns and API requests.
+
+    with start_trace("chat_turn", question=question) as trace:
+        with span("generate_sql") as s:
+            ...
+            s.set(prompt_tokens=120)
+
+Spans nest through contextvars, so concurrent requests do not mix. Outside
+a trace span() is a no-op. When TRACE_EXPORT_PATH is set, finished traces
+are appended to that JSONL file, one span per line, with OpenTelemetry field names (traceId, spanId,
+parentSpanId, startTimeUnixNano, endTimeUnixNano, attributes, status).
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+import pandas as pd
+
+
+# JSONL file for finished traces, e.g. .cache/traces.jsonl. Off by default: the
+# file holds every question asked and is never rotated
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH") or None
+
+
+@dataclass
+class Span:
+    """One timed stage of a trace."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: Optional[int] = None
+    attributes: dict = field(default_factory=dict)
+    status: str = "OK"
+
+    def set(self, **attributes):
+        """Attach attributes (tokens, rows, bytes, ...) to the span."""
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+
+class _NoopSpan:
+    """Returned by span() outside a trace."""
+
+    def set(self, **attributes):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """Spans recorded for one request."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def breakdown(self) -> pd.DataFrame:
+        """
+        Latency breakdown in start order.
+
+        Returns:
+            DataFrame with stage (indented by depth), ms, start_ms (relative to the
+            trace start), status and attributes
+        """
+        spans = sorted(self.spans, key=lambda s: s.start_ns)
+        if not spans:
+            return pd.DataFrame(columns=["stage", "ms", "start_ms", "status", "attributes"])
+
+        parents = {s.span_id: s.parent_id for s in spans}
+
+        def depth(span):
+            level, parent = 0, span.parent_id
+            while parent in parents:
+                level, parent = level + 1, parents[parent]
+            return level
+
+        origin = spans[0].start_ns
+        return pd.DataFrame([{
+            "stage": "  " * depth(s) + s.name,
+            "ms": round(s.duration_ms, 2),
+            "start_ms": round((s.start_ns - origin) / 1e6, 2),
+            "status": s.status,
+            "attributes": ", ".join(f"{key}={value}" for key, value in s.attributes.items()),
+        } for s in spans])
+
+
+_current_trace: ContextVar = ContextVar("current_trace", default=None)
+_current_span: ContextVar = ContextVar("current_span", default=None)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a stage of the current trace.
+
+    Args:
+        name: Stage name (e.g. "generate_sql")
+        **attributes: Initial span attributes
+
+    Yields:
+        The Span (or a no-op object outside a trace)
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield NOOP_SPAN
+        return
+
+    parent = _current_span.get()
+    current = Span(
+        name=name,
+        trace_id=trace.trace_id,
+        span_id=uuid.uuid4().hex[:16],
+        parent_id=parent.span_id if parent else None,
+        start_ns=time.time_ns(),
+        attributes=dict(attributes),
+    )
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "ERROR"
+        current.attributes["error"] = str(e)
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        trace.add(current)
+
+
+@contextmanager
+def start_trace(name: str, export_path: Optional[str] = TRACE_EXPORT_PATH, **attributes):
+    """
+    Start a trace with a root span; the trace is exported when it ends.
+
+    Args:
+        name: Root span name (e.g. "chat_turn")
+        export_path: JSONL file for finished traces (None or "" to disable)
+        **attributes: Root span attributes
+
+    Yields:
+        The Trace
+    """
+    trace = Trace(name)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        with span(name, **attributes):
+            yield trace
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        if export_path:
+            export_jsonl(trace, export_path)
+
+
+def dataframe_stats(df: pd.DataFrame) -> dict:
+    """Row count and in-memory size of a result, for span attributes."""
+    return {"rows": len(df), "bytes": int(df.memory_usage(deep=True).sum())}
+
+
+def export_jsonl(trace: Trace, path: str):
+    """
+    Append the spans of a finished trace to a JSONL file.
+
+    Args:
+        trace: Finished trace
+        path: Output file path
+    """
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            for s in sorted(trace.spans, key=lambda s: s.start_ns):
+                f.write(json.dumps({
+                    "traceId": s.trace_id,
+                    "spanId": s.span_id,
+                    "parentSpanId": s.parent_id,
+                    "name": s.name,
+                    "startTimeUnixNano": s.start_ns,
+                    "endTimeUnixNano": s.end_ns,
+                    "attributes": s.attributes,
+                    "status": s.status,
+                }, ensure_ascii=False, default=str) + "\n")
+    except OSError:
+        pass
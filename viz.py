@@ -2,11 +2,57 @@
 Visualization module for automatic chart generation based on data patterns.
 """
 
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+
 import pandas as pd
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Optional
+
+from db import count_rows, query_page, remove_row_cap
+
+# plotly is imported inside the chart functions on first use to keep app startup fast
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+
+PAGE_SIZES = [50, 100, 500]
+QUERY_ORDER = "(query order)"
+
+# month is a DATE (first day of the month); it is shown without the day
+MONTH_FORMAT = "%Y-%m"
+
+# Figures of recent results, keyed by their content (see build_chart)
+FIGURE_CACHE_SIZE = 128
+_figures = OrderedDict()
+_figures_lock = threading.Lock()
+
+
+def _time_columns(df: pd.DataFrame) -> list:
+    """Datetime columns (e.g. month stored as DATE) and text columns named month/date."""
+    time_cols = df.select_dtypes(include=['datetime', 'datetimetz']).columns.tolist()
+    for col in df.select_dtypes(include=['object', 'category']).columns:
+        if col.lower() in ['month', 'date']:
+            time_cols.append(col)
+    return time_cols
+
+
+def _is_month(df: pd.DataFrame, col: str) -> bool:
+    name = str(col).lower()
+    return (name == "month" or name.endswith("_month")) and pd.api.types.is_datetime64_any_dtype(df[col])
+
+
+def format_months(df: pd.DataFrame) -> pd.DataFrame:
+    """Copy of ``df`` with month date columns as YYYY-MM text, for tables."""
+    month_cols = [col for col in df.columns if _is_month(df, col)]
+    if not month_cols:
+        return df
+    df = df.copy()
+    for col in month_cols:
+        df[col] = df[col].dt.strftime(MONTH_FORMAT)
+    return df
 
 
 def detect_chart_type(df: pd.DataFrame) -> str:
@@ -26,11 +72,8 @@ def detect_chart_type(df: pd.DataFrame) -> str:
     numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
     categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
     
-    # Handle month column as time series
-    time_cols = []
-    for col in categorical_cols:
-        if col.lower() in ['month', 'date'] or df[col].dtype == 'datetime64[ns]':
-            time_cols.append(col)
+    # Handle month/date columns as time series
+    time_cols = _time_columns(df)
     
     # Remove time columns from categorical
     categorical_cols = [col for col in categorical_cols if col not in time_cols]
@@ -54,7 +97,7 @@ def detect_chart_type(df: pd.DataFrame) -> str:
     return 'bar'  # Default to bar chart
 
 
-def create_bar_chart(df: pd.DataFrame) -> Optional[go.Figure]:
+def create_bar_chart(df: pd.DataFrame) -> Optional["go.Figure"]:
     """
     Create a bar chart from DataFrame.
     
@@ -64,6 +107,8 @@ def create_bar_chart(df: pd.DataFrame) -> Optional[go.Figure]:
     Returns:
         Plotly figure or None if creation fails
     """
+    import plotly.express as px
+    
     try:
         numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
         categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
@@ -91,7 +136,7 @@ def create_bar_chart(df: pd.DataFrame) -> Optional[go.Figure]:
         return None
 
 
-def create_line_chart(df: pd.DataFrame) -> Optional[go.Figure]:
+def create_line_chart(df: pd.DataFrame) -> Optional["go.Figure"]:
     """
     Create a line chart from DataFrame.
     
@@ -101,16 +146,15 @@ def create_line_chart(df: pd.DataFrame) -> Optional[go.Figure]:
     Returns:
         Plotly figure or None if creation fails
     """
+    import plotly.express as px
+    
     try:
         numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
         categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
         
         # Find time column
-        time_col = None
-        for col in categorical_cols:
-            if col.lower() in ['month', 'date']:
-                time_col = col
-                break
+        time_cols = _time_columns(df)
+        time_col = time_cols[0] if time_cols else None
         
         if not time_col or not numeric_cols:
             return None
@@ -133,6 +177,8 @@ def create_line_chart(df: pd.DataFrame) -> Optional[go.Figure]:
                          markers=True)
         
         fig.update_layout(xaxis_tickangle=-45)
+        if _is_month(df, time_col):
+            fig.update_xaxes(tickformat=MONTH_FORMAT, hoverformat=MONTH_FORMAT, dtick="M1")
         return fig
         
     except Exception as e:
@@ -140,7 +186,7 @@ def create_line_chart(df: pd.DataFrame) -> Optional[go.Figure]:
         return None
 
 
-def create_pie_chart(df: pd.DataFrame) -> Optional[go.Figure]:
+def create_pie_chart(df: pd.DataFrame) -> Optional["go.Figure"]:
     """
     Create a pie chart from DataFrame.
     
@@ -150,6 +196,8 @@ def create_pie_chart(df: pd.DataFrame) -> Optional[go.Figure]:
     Returns:
         Plotly figure or None if creation fails
     """
+    import plotly.express as px
+    
     try:
         numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
         categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
@@ -170,7 +218,7 @@ def create_pie_chart(df: pd.DataFrame) -> Optional[go.Figure]:
         return None
 
 
-def create_scatter_plot(df: pd.DataFrame) -> Optional[go.Figure]:
+def create_scatter_plot(df: pd.DataFrame) -> Optional["go.Figure"]:
     """
     Create a scatter plot from DataFrame.
     
@@ -180,6 +228,8 @@ def create_scatter_plot(df: pd.DataFrame) -> Optional[go.Figure]:
     Returns:
         Plotly figure or None if creation fails
     """
+    import plotly.express as px
+    
     try:
         numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
         categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
@@ -207,27 +257,39 @@ def create_scatter_plot(df: pd.DataFrame) -> Optional[go.Figure]:
         return None
 
 
-def auto_chart(df: pd.DataFrame) -> None:
+def _fingerprint(df: pd.DataFrame) -> str:
+    digest = hashlib.sha1(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def build_chart(df: pd.DataFrame) -> tuple:
     """
-    Automatically generate and display appropriate chart for the DataFrame.
+    Detect the chart type of a DataFrame and build its figure.
+    
+    Figures are cached by the DataFrame's content, so the same result (e.g.
+    a sample question warmed up at startup) is only charted once. Results
+    with unhashable values (LIST or STRUCT columns) are charted uncached.
     
     Args:
         df: DataFrame to visualize
+        
+    Returns:
+        Tuple of (chart type, Plotly figure or None)
     """
-    if df.empty:
-        st.warning("No data to visualize.")
-        return
+    try:
+        key = _fingerprint(df)
+    except TypeError:
+        # LIST and STRUCT values cannot be hashed; chart them uncached
+        key = None
+    if key is not None:
+        with _figures_lock:
+            if key in _figures:
+                _figures.move_to_end(key)
+                return _figures[key]
     
-    # Detect chart type
     chart_type = detect_chart_type(df)
-    
-    if chart_type == 'none':
-        st.info("No suitable chart type detected for this data.")
-        return
-    
-    # Create appropriate chart
     fig = None
-    
     if chart_type == 'bar':
         fig = create_bar_chart(df)
     elif chart_type == 'line':
@@ -237,6 +299,32 @@ def auto_chart(df: pd.DataFrame) -> None:
     elif chart_type == 'scatter':
         fig = create_scatter_plot(df)
     
+    if key is not None and (fig is not None or chart_type == 'none'):
+        with _figures_lock:
+            _figures[key] = (chart_type, fig)
+            while len(_figures) > FIGURE_CACHE_SIZE:
+                _figures.popitem(last=False)
+    return chart_type, fig
+
+
+def auto_chart(df: pd.DataFrame) -> None:
+    """
+    Automatically generate and display appropriate chart for the DataFrame.
+    
+    Args:
+        df: DataFrame to visualize
+    """
+    if df.empty:
+        st.warning("No data to visualize.")
+        return
+    
+    # Detect chart type and create the chart (cached by content)
+    chart_type, fig = build_chart(df)
+    
+    if chart_type == 'none':
+        st.info("No suitable chart type detected for this data.")
+        return
+    
     # Display chart
     if fig:
         st.plotly_chart(fig, use_container_width=True)
@@ -244,13 +332,61 @@ def auto_chart(df: pd.DataFrame) -> None:
         st.info(f"Could not create {chart_type} chart for this data.")
 
 
-def display_data_with_chart(df: pd.DataFrame, title: str = "Results") -> None:
+@st.cache_data(max_entries=256, show_spinner=False)
+def _cached_count(_con: Any, data_version: str, sql: str, columns: tuple, search: str) -> int:
+    return count_rows(_con, sql, list(columns), search or None)
+
+
+@st.fragment
+def display_paged_table(con: Any, sql: str, columns: list) -> None:
+    """
+    Table of a query's full result, fetched one page at a time from DuckDB.
+    
+    Sorting and filtering run in DuckDB as well, so the browser and the
+    Python process only ever hold one page. Runs as a fragment: paging
+    reruns only the table, not the page it is on.
+    
+    Args:
+        con: DuckDB connection object
+        sql: SELECT query (the safety LIMIT of enforce_limit is lifted)
+        columns: Result columns
+    """
+    sql = remove_row_cap(sql)
+    key = "table_" + hashlib.sha1(sql.encode()).hexdigest()[:12]
+    
+    filter_col, sort_col, order_col, size_col = st.columns([3, 2, 1, 1])
+    search = filter_col.text_input("🔎 Filter rows", key=f"{key}_search", placeholder="Text in any column")
+    sort_by = sort_col.selectbox("Sort by", [QUERY_ORDER] + list(columns), key=f"{key}_sort")
+    descending = order_col.toggle("Desc", key=f"{key}_desc", disabled=sort_by == QUERY_ORDER)
+    page_size = size_col.selectbox("Rows", PAGE_SIZES, index=1, key=f"{key}_size")
+    
+    # Counts are cached per data version; the page itself is always fetched
+    data_version = getattr(con, "data_key", None) or str(id(con))
+    total = _cached_count(con, data_version, sql, tuple(columns), search)
+    pages = max(1, math.ceil(total / page_size))
+    page = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, value=1, key=f"{key}_page_{pages}")
+    
+    df = query_page(con, sql, list(columns), page=page - 1, page_size=page_size,
+                    sort_by=None if sort_by == QUERY_ORDER else sort_by, descending=descending,
+                    search=search or None)
+    st.dataframe(format_months(df), use_container_width=True, hide_index=True)
+    first = (page - 1) * page_size
+    st.caption(f"Rows {first + 1 if total else 0:,}–{first + len(df):,} of {total:,}")
+
+
+def display_data_with_chart(df: pd.DataFrame, title: str = "Results", con: Any = None,
+                            sql: Optional[str] = None) -> None:
     """
     Display DataFrame and automatically generated chart.
     
+    With a connection and the query, the table pages through the full result
+    in DuckDB (see display_paged_table); the chart uses ``df``.
+    
     Args:
-        df: DataFrame to display
+        df: DataFrame to display (and chart)
         title: Title for the data display
+        con: DuckDB connection object the query runs on
+        sql: Query that produced ``df``
     """
     if df.empty:
         st.warning("No data to display.")
@@ -258,7 +394,10 @@ def display_data_with_chart(df: pd.DataFrame, title: str = "Results") -> None:
     
     # Display the data table
     st.subheader(f"📊 {title}")
-    st.dataframe(df, use_container_width=True)
+    if con is not None and sql:
+        display_paged_table(con, sql, [str(column) for column in df.columns])
+    else:
+        st.dataframe(format_months(df), use_container_width=True)
     
     # Display chart if data is suitable
     if len(df) > 0:
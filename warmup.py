@@ -0,0 +1,128 @@
+"""
+Startup warm-up of the questions new users ask first.
+
+After the data loads, the sidebar sample questions (fallbacks.SAMPLE_QUESTIONS)
+are answered through the pipeline and every query in fallbacks.FALLBACKS is
+run, in a background thread. This fills the SQL and result caches
+(shared_cache.py) and the figure cache (viz.build_chart), so the first click
+on a sample question is served from the caches instead of paying for the
+model call, the query, the insights and the chart.
+
+Progress and per-item timings are kept on the Warmup object for the UI.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from fallbacks import FALLBACKS, SAMPLE_QUESTIONS
+from pipeline import answer_question, run_cached_query
+from prompt_builder import PromptBuilder
+from viz import build_chart
+
+
+# Set CHATBOT_WARMUP=0 to skip the warm-up (e.g. to save model calls in development)
+WARMUP_ENABLED = os.getenv("CHATBOT_WARMUP", "1") != "0"
+
+
+@dataclass
+class WarmupItem:
+    """Timing of one warmed-up question or fallback query."""
+
+    kind: str  # "question" or "fallback"
+    name: str
+    seconds: float = 0.0
+    source: Optional[str] = None
+    error: Optional[str] = None
+
+
+class Warmup:
+    """Answers the sample questions and fallback queries ahead of time."""
+
+    def __init__(self, con: Any, prompt_builder: Optional[PromptBuilder] = None,
+                 questions: Optional[list] = None, fallbacks: Optional[dict] = None,
+                 answer: Callable = answer_question):
+        """
+        Args:
+            con: DuckDB connection object (a LiveConnection, so results are cached per data version)
+            prompt_builder: Builds a schema-aware prompt from the live catalog
+            questions: Questions to answer (defaults to SAMPLE_QUESTIONS)
+            fallbacks: Fallback name -> SQL to run (defaults to FALLBACKS)
+            answer: Callable (con, question, prompt_builder) -> PipelineResult
+        """
+        self.con = con
+        self.prompt_builder = prompt_builder
+        self.questions = list(SAMPLE_QUESTIONS if questions is None else questions)
+        self.fallbacks = dict(FALLBACKS if fallbacks is None else fallbacks)
+        self.answer = answer
+        self.items = []
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def total(self) -> int:
+        return len(self.questions) + len(self.fallbacks)
+
+    @property
+    def done(self) -> int:
+        return len(self.items)
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def seconds(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def failed(self) -> int:
+        return sum(1 for item in self.items if item.error)
+
+    def start(self) -> threading.Thread:
+        """Run the warm-up in a daemon thread."""
+        thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def run(self):
+        """Warm up every sample question, then every fallback query."""
+        self.started_at = time.monotonic()
+        for question in self.questions:
+            self._warm("question", question, lambda q=question: self._question(q))
+        for name, sql in self.fallbacks.items():
+            # find_best_fallback returns stripped SQL; cache keys must match it
+            self._warm("fallback", name, lambda s=sql.strip(), n=name: self._fallback(n, s))
+        self.finished_at = time.monotonic()
+
+    def _warm(self, kind: str, name: str, work: Callable[[], Optional[str]]):
+        item = WarmupItem(kind, name)
+        start = time.monotonic()
+        try:
+            item.source = work()
+        except Exception as e:
+            item.error = str(e)
+        item.seconds = time.monotonic() - start
+        self.items.append(item)
+
+    def _question(self, question: str) -> str:
+        result = self.answer(self.con, question, self.prompt_builder)
+        if not result.df.empty:
+            build_chart(result.df)
+        return result.source
+
+    def _fallback(self, name: str, sql: str) -> str:
+        df, _, _ = run_cached_query(self.con, sql, name)
+        if not df.empty:
+            build_chart(df)
+        return "fallback"
+
+    def summary(self) -> str:
+        """One-line progress report."""
+        state = "done" if self.finished else "running"
+        failed = f", {self.failed} failed" if self.failed else ""
+        return f"Warm-up {state}: {self.done}/{self.total} queries in {self.seconds:.1f}s{failed}"
@@ -0,0 +1,243 @@
+"""
+Open-Meteo client for the weather dashboard.
+
+One pooled requests.Session (keep-alive, retries, timeouts) is shared by all
+calls; its transport adapter is the only place requests are retried.
+Geocoding results are cached on disk because they do not change; forecasts
+are cached in memory per (lat, lon, hour) with a TTL. The API base
+URLs can be overridden (constructor or WEATHER_GEOCODING_URL /
+WEATHER_FORECAST_URL) to run against a local stand-in server.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+GEOCODING_URL = os.getenv("WEATHER_GEOCODING_URL", "https://geocoding-api.open-meteo.com/v1/search")
+FORECAST_URL = os.getenv("WEATHER_FORECAST_URL", "https://api.open-meteo.com/v1/forecast")
+GEOCODE_CACHE_PATH = ".cache/geocode_cache.json"
+
+# (connect, read) timeouts in seconds
+TIMEOUT = (3.05, 10)
+# Forecasts are refreshed at most once per hour per location
+FORECAST_TTL = 3600
+POOL_SIZE = 10
+TIMEZONE = "Asia/Tokyo"
+
+# Retries for connection errors and 429/5xx responses, and their base backoff in seconds
+RETRIES = 2
+BACKOFF = 0.3
+# Cities fetched in parallel by fetch_many
+BULK_CONCURRENCY = 8
+
+
+class WeatherClient:
+    """Pooled, cached access to the Open-Meteo geocoding and forecast APIs."""
+
+    def __init__(self, geocoding_url: str = GEOCODING_URL, forecast_url: str = FORECAST_URL,
+                 geocode_cache_path: Optional[str] = GEOCODE_CACHE_PATH,
+                 forecast_ttl: float = FORECAST_TTL, timeout: tuple = TIMEOUT,
+                 pool_size: int = POOL_SIZE, retries: int = RETRIES, backoff: float = BACKOFF):
+        """
+        Args:
+            geocoding_url: Geocoding search endpoint
+            forecast_url: Forecast endpoint
+            geocode_cache_path: JSON file for geocoding results (None keeps them in memory only)
+            forecast_ttl: Seconds a forecast stays cached
+            timeout: (connect, read) timeout in seconds
+            pool_size: Connections kept alive per host
+            retries: Retries for connection errors and 429/5xx responses
+            backoff: Base backoff in seconds between retries (doubled per retry)
+        """
+        self.geocoding_url = geocoding_url
+        self.forecast_url = forecast_url
+        self.geocode_cache_path = geocode_cache_path
+        self.forecast_ttl = forecast_ttl
+        self.timeout = timeout
+        self.pool_size = pool_size
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(total=retries, backoff_factor=backoff,
+                              status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"]),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._geocodes = self._load_geocodes()
+        self._forecasts = {}
+
+    def _load_geocodes(self) -> dict:
+        if not self.geocode_cache_path or not os.path.exists(self.geocode_cache_path):
+            return {}
+        try:
+            with open(self.geocode_cache_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_geocodes(self):
+        if not self.geocode_cache_path:
+            return
+        os.makedirs(os.path.dirname(self.geocode_cache_path) or ".", exist_ok=True)
+        tmp_path = f"{self.geocode_cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._geocodes, f, ensure_ascii=False)
+        os.replace(tmp_path, self.geocode_cache_path)
+
+    def _get_json(self, url: str, params: dict) -> dict:
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def geocode(self, city_name: str, language: str = "ja") -> tuple:
+        """
+        Look up the coordinates of a city (cached on disk).
+
+        Args:
+            city_name: City name
+            language: Language of the search
+
+        Returns:
+            Tuple of (latitude, longitude)
+        """
+        key = f"{language}:{city_name.strip().lower()}"
+        with self._lock:
+            if key in self._geocodes:
+                return tuple(self._geocodes[key])
+
+        geo = self._get_json(self.geocoding_url,
+                             {"name": city_name, "count": 1, "language": language, "format": "json"})
+        if not geo.get("results"):
+            raise ValueError(f"City not found: {city_name}")
+        location = (geo["results"][0]["latitude"], geo["results"][0]["longitude"])
+
+        with self._lock:
+            self._geocodes[key] = list(location)
+            self._save_geocodes()
+        return location
+
+    def prefetch_geocodes(self, city_names: list) -> dict:
+        """
+        Geocode several cities concurrently over the shared connection pool.
+
+        Args:
+            city_names: City names
+
+        Returns:
+            Dictionary of city name -> (latitude, longitude) or the exception raised
+        """
+        def lookup(city_name):
+            try:
+                return self.geocode(city_name)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=min(self.pool_size, max(1, len(city_names)))) as pool:
+            return dict(zip(city_names, pool.map(lookup, city_names)))
+
+    def forecast(self, latitude: float, longitude: float, hourly: str = "temperature_2m") -> dict:
+        """
+        Fetch the hourly forecast for a location (cached per location and hour).
+
+        Args:
+            latitude: Latitude
+            longitude: Longitude
+            hourly: Hourly variables to request
+
+        Returns:
+            Forecast JSON
+        """
+        now = time.time()
+        key = (round(latitude, 4), round(longitude, 4), hourly, int(now // 3600))
+        with self._lock:
+            cached = self._forecasts.get(key)
+            if cached and cached[0] > now:
+                return cached[1]
+
+        data = self._get_json(self.forecast_url, {
+            "latitude": latitude, "longitude": longitude, "hourly": hourly, "timezone": TIMEZONE,
+        })
+
+        with self._lock:
+            # Drop expired entries so the cache does not grow without bound
+            self._forecasts = {k: v for k, v in self._forecasts.items() if v[0] > now}
+            self._forecasts[key] = (now + self.forecast_ttl, data)
+        return data
+
+    def get_weather_data(self, city_name: str = "Tokyo") -> tuple:
+        """
+        Hourly temperature forecast for a city.
+
+        Args:
+            city_name: City name
+
+        Returns:
+            Tuple of (times, temperatures)
+        """
+        latitude, longitude = self.geocode(city_name)
+        forecast = self.forecast(latitude, longitude)
+        return forecast["hourly"]["time"], forecast["hourly"]["temperature_2m"]
+
+    async def fetch_many_async(self, city_names: list, concurrency: int = BULK_CONCURRENCY) -> pd.DataFrame:
+        """
+        Fetch the hourly forecasts of many cities concurrently.
+
+        Each city is geocoded and then forecast; at most `concurrency` cities are
+        in flight at once. Requests run on worker threads over the shared
+        connection pool, so the caches and retries above apply.
+
+        Args:
+            city_names: City names
+            concurrency: Cities fetched at the same time
+
+        Returns:
+            Long DataFrame with city, time and temperature columns; cities that
+            failed are listed in df.attrs["errors"] (city -> message)
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(city_name):
+            async with semaphore:
+                latitude, longitude = await asyncio.to_thread(self.geocode, city_name)
+                forecast = await asyncio.to_thread(self.forecast, latitude, longitude)
+                return forecast["hourly"]["time"], forecast["hourly"]["temperature_2m"]
+
+        city_names = list(dict.fromkeys(city_names))
+        results = await asyncio.gather(*(fetch(city_name) for city_name in city_names), return_exceptions=True)
+
+        names, times, temperatures, errors = [], [], [], {}
+        for city_name, result in zip(city_names, results):
+            if isinstance(result, BaseException):
+                errors[city_name] = str(result)
+                continue
+            names.append(city_name)
+            times.append(result[0])
+            temperatures.append(result[1])
+
+        # Build the columns once instead of concatenating per-city frames
+        df = pd.DataFrame({
+            "city": pd.Categorical(np.repeat(names, [len(t) for t in times]), categories=names),
+            "time": pd.to_datetime(np.concatenate(times) if times else []),
+            "temperature": np.concatenate(temperatures).astype(float) if temperatures else np.array([], dtype=float),
+        })
+        df.attrs["errors"] = errors
+        return df
+
+    def fetch_many(self, city_names: list, **kwargs) -> pd.DataFrame:
+        """Synchronous wrapper around fetch_many_async (for Streamlit scripts)."""
+        return asyncio.run(self.fetch_many_async(city_names, **kwargs))